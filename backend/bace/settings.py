@@ -114,6 +114,20 @@ CORS_ALLOW_ALL_ORIGINS = True
 SESSION_COOKIE_AGE = 10000  # 2 soat (sekundda)
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True  # Brauzer yopilganda session tugaydi
 
+# Imtihon boshlanishida bir vaqtda yangi urinish yaratayotgan so'rovlar byudjeti (main/exam_queue.py)
+EXAM_ADMISSION_PER_TEST = 30
+EXAM_ADMISSION_PER_SERVER = 60
+# Test biriktirilganda oldindan tayyorlanadigan varaqa variantlari soni (main/variants.py)
+EXAM_VARIANT_COUNT = 20
+# True bo'lsa fon vazifalari (main/background.py) so'rov ichida sinxron bajariladi
+BACKGROUND_TASKS_SYNC = False
+# Fon eksportlari (main/export_jobs.py) MEDIA_ROOT/exports/ da shuncha kun saqlanadi
+EXPORT_JOB_RETENTION_DAYS = 7
+# QR tasdiq (main/pdf_verification.py): audit jurnali (PdfVerification) yoziladimi (fon oqimida, commitdan keyin)
+PDF_VERIFICATION_AUDIT = True
+# Imzolangan token javobi o'zgarmaydi – tasdiq sahifasi shuncha soniya ommaviy keshlanadi
+PDF_VERIFY_CACHE_SECONDS = 86400
+
 
 ROOT_URLCONF = 'bace.urls'
 
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bace.settings')
 
 application = get_wsgi_application()
+
+# Server ishga tushganda jarayon qulashi sababli baholanmay qolgan topshiriqlarni va eksportlarni fon oqimida qayta bajaramiz
+from main import export_jobs  # noqa: E402
+from main.background import run_in_background  # noqa: E402
+from main.submissions import replay_pending  # noqa: E402
+
+run_in_background(replay_pending)
+run_in_background(export_jobs.replay_pending)
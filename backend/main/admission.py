@@ -0,0 +1,105 @@
+"""Imtihonga kirish (admission) tekshiruvi.
+
+"Talaba bu testni topshira oladimi va qaysi urinish (StudentTest) davom ettiriladi?"
+degan savolga bitta (test.group bo'lmasa – ikkita) indekslangan so'rov bilan javob beradi.
+testapi_test va talaba dashboardi shu natijadan foydalanadi. REST
+StudentTestViewSet.perform_create esa avvalgidek (guruh, fan, semestr) kombinatsiyasi
+bo'yicha tekshiradi – admit_new_attempt.
+"""
+from django.db.models import Q
+
+from .models import StudentTest
+
+
+class Admission:
+    """Kirish tekshiruvi natijasi.
+
+    allowed – topshirish mumkinmi; reason – rad etilgan bo'lsa sababi ('participated');
+    attempt – davom ettiriladigan yakunlanmagan StudentTest (yo'q bo'lsa None);
+    group_id – urinishga yoziladigan effektiv guruh.
+    """
+
+    def __init__(self, allowed, attempt=None, group_id=None, reason=None):
+        self.allowed = allowed
+        self.attempt = attempt
+        self.group_id = group_id
+        self.reason = reason
+
+    def __bool__(self):
+        return self.allowed
+
+
+def effective_group_id(user, test, in_test_groups=None):
+    """test.group bo'lmasa va talabaning guruhi test.groups ichida bo'lsa – talaba guruhi.
+
+    in_test_groups oldindan ma'lum bo'lsa (masalan dashboard so'rovi shu bo'yicha filtrlangan) so'rov yuborilmaydi.
+    """
+    if test.group_id:
+        return test.group_id
+    student_group_id = getattr(user, 'group_id', None)
+    if not student_group_id:
+        return None
+    if in_test_groups is None:
+        in_test_groups = test.groups.filter(id=student_group_id).exists()
+    return student_group_id if in_test_groups else None
+
+
+def _blocks(row, test, group_id):
+    # Yakunlangan va qayta topshirishga ruxsat berilmagan urinish: shu test yoki (guruh, fan, semestr) kombinatsiyasi
+    if not row.completed or row.can_retake:
+        return False
+    if row.test_id == test.id:
+        return True
+    return (row.group_id == group_id and row.subject_id == test.subject_id
+            and row.semester_id == test.semester_id)
+
+
+def _decide(rows, test, group_id):
+    attempt = None
+    for row in rows:
+        if _blocks(row, test, group_id):
+            return Admission(False, group_id=group_id, reason='participated')
+        if not row.completed and row.test_id == test.id and attempt is None:
+            attempt = row
+    return Admission(True, attempt=attempt, group_id=group_id)
+
+
+def _relevant_attempts(user, tests_with_groups):
+    cond = Q()
+    for test, group_id in tests_with_groups:
+        cond |= Q(test_id=test.id)
+        cond |= Q(completed=True, can_retake=False, subject_id=test.subject_id,
+                  semester_id=test.semester_id, group_id=group_id)
+    return StudentTest.objects.filter(student=user).filter(cond).select_related('variant').order_by('-start_time')
+
+
+def admit(user, test):
+    """Bitta test uchun kirish tekshiruvi."""
+    group_id = effective_group_id(user, test)
+    rows = list(_relevant_attempts(user, [(test, group_id)]))
+    return _decide(rows, test, group_id)
+
+
+def admit_new_attempt(user, test, semester_id):
+    """REST orqali yangi urinish ochish uchun tekshiruv (StudentTestViewSet.perform_create).
+
+    Bu yo'l (test.group, fan, semestr) kombinatsiyasiga qaraydi: shu kombinatsiyada yakunlanmagan
+    urinish yoki qayta topshirishga ruxsat berilmagan yakunlangan urinish bo'lsa – boshqa test bo'lsa ham –
+    rad etiladi. Semestr GroupSubject'dan olinadi, shuning uchun chaqiruvchi uzatadi. Bitta so'rov.
+    """
+    blocked = StudentTest.objects.filter(
+        student=user, group_id=test.group_id, subject_id=test.subject_id, semester_id=semester_id,
+    ).filter(Q(completed=False) | Q(completed=True, can_retake=False)).exists()
+    if blocked:
+        return Admission(False, group_id=test.group_id, reason='participated')
+    return Admission(True, group_id=test.group_id)
+
+
+def admit_many(user, tests, in_test_groups=None):
+    """Bir nechta test uchun {test_id: Admission} – barcha urinishlar bitta so'rovda olinadi."""
+    tests = list(tests)
+    if not tests:
+        return {}
+    pairs = [(t, effective_group_id(user, t, in_test_groups)) for t in tests]
+    rows = list(_relevant_attempts(user, pairs))
+    return {t.id: _decide(rows, t, gid) for t, gid in pairs}
@@ -0,0 +1,93 @@
+"""Test uchun oldindan kompilyatsiya qilingan (versiyalangan) javob kaliti.
+
+Kalit har bir savol uchun to'g'ri variant id lari, normallashtirilgan matnlar,
+matching juftliklari, sentence_ordering so'zlari va TestQuestion.score ni saqlaydi.
+Kesh kaliti Test.updated_at va Test.answer_key_version ga bog'langan: TestQuestion,
+AnswerOption yoki Question o'zgarganda signal versiyani oshiradi va barcha
+worker lar keyingi so'rovda kalitni qayta quradi.
+"""
+from django.core.cache import cache
+from django.db.models import F, prefetch_related_objects
+
+from .models import Test, TestQuestion
+from .scoring import build_question_key, grade_answer
+
+
+CACHE_TIMEOUT = 60 * 60 * 6
+
+
+class CompiledAnswerKey:
+    def __init__(self, test_id, version, questions):
+        self.test_id = test_id
+        self.version = version
+        # {question_id: build_question_key(...) lug'ati}
+        self.questions = questions
+
+    def get(self, question_id):
+        return self.questions.get(question_id)
+
+    def entry_for(self, question):
+        """Savol testda bo'lmasa (keyin olib tashlangan bo'lishi mumkin) kalitni joyida quradi."""
+        entry = self.questions.get(question.id)
+        if entry is None:
+            entry = build_question_key(question, 0)
+        return entry
+
+    def grade(self, question_id, post):
+        return grade_answer(question_id, self.questions[question_id], post)
+
+    def correct_answer(self, question):
+        """Natija sahifalari va eksportlar uchun to'g'ri javob matni."""
+        return self.entry_for(question)['correct_display']
+
+
+def _version_token(test):
+    updated = int(test.updated_at.timestamp()) if test.updated_at else 0
+    return f"{updated}.{test.answer_key_version}"
+
+
+def _cache_key(test_id, version):
+    return f"answer_key:{test_id}:{version}"
+
+
+def compile_answer_key(test):
+    tqs = list(TestQuestion.objects.filter(test=test).select_related('question'))
+    questions = [tq.question for tq in tqs]
+    prefetch_related_objects(questions, 'answer_options')
+    scores = {tq.question_id: tq.score for tq in tqs}
+    return CompiledAnswerKey(
+        test.id,
+        _version_token(test),
+        {q.id: build_question_key(q, scores.get(q.id, 0)) for q in questions},
+    )
+
+
+def get_answer_key(test):
+    """Test uchun keshdagi javob kalitini qaytaradi, versiya eskirgan bo'lsa qayta quradi."""
+    key = _cache_key(test.id, _version_token(test))
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_answer_key(test)
+        cache.set(key, compiled, CACHE_TIMEOUT)
+    return compiled
+
+
+class AnswerKeyRegistry(dict):
+    """Bitta so'rov ichida bir nechta test kalitlarini qayta-qayta keshdan o'qimaslik uchun."""
+
+    def for_test(self, test):
+        if test.id not in self:
+            self[test.id] = get_answer_key(test)
+        return self[test.id]
+
+
+def bump_answer_key_version(test_ids):
+    test_ids = list(test_ids)
+    if test_ids:
+        Test.objects.filter(id__in=test_ids).update(answer_key_version=F('answer_key_version') + 1)
+
+
+def bump_answer_key_version_for_question(question_id):
+    bump_answer_key_version(
+        TestQuestion.objects.filter(question_id=question_id).values_list('test_id', flat=True).distinct()
+    )
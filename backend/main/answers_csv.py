@@ -0,0 +1,93 @@
+"""Javob darajasidagi xom ma'lumotlar (har StudentAnswer – bitta qator) CSV eksporti.
+
+Tahlil uchun: formatlashsiz, model obyektlarisiz. Qatorlar bitta so'rovda values_list bilan
+olinadi va .iterator(chunk_size=...) orqali bo'laklab o'qiladi, shuning uchun xotira
+qatorlar soniga bog'liq emas. View ham, management buyrug'i ham shu oqimdan foydalanadi.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .export_jobs import track_progress
+from .models import StudentAnswer
+
+
+CHUNK_SIZE = 5000
+
+ANSWER_CSV_HEADERS = [
+    'answer_id', 'student_test_id', 'student_id', 'username', 'last_name', 'first_name', 'role', 'group',
+    'subject', 'semester', 'test_id', 'question_id', 'question_type', 'is_correct', 'score', 'started_at',
+]
+
+FILTER_FIELDS = ('test', 'subject', 'semester', 'date_from', 'date_to')
+
+
+def parse_filters(query):
+    """GET parametrlari yoki buyruq argumentlaridan filtr lug'ati; noto'g'ri qiymatda ValueError.
+
+    test/subject – ID, semester – semestr raqami, date_from/date_to – YYYY-MM-DD (ikkalasi ham kiradi).
+    """
+    filters = {}
+    for name in ('test', 'subject', 'semester'):
+        value = str(query.get(name) or '').strip()
+        if value:
+            if not value.isdigit():
+                raise ValueError(f"{name} butun son bo'lishi kerak")
+            filters[name] = int(value)
+    for name in ('date_from', 'date_to'):
+        value = str(query.get(name) or '').strip()
+        if value:
+            parsed = parse_date(value)
+            if parsed is None:
+                raise ValueError(f"{name} YYYY-MM-DD formatida bo'lishi kerak")
+            filters[name] = parsed
+    return filters
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def answer_queryset(filters):
+    """Yakunlangan urinishlardagi javoblar: bitta JOINli so'rov, id bo'yicha tartib (indeks bo'yicha o'qiladi)."""
+    qs = StudentAnswer.objects.filter(student_test__completed=True)
+    if 'test' in filters:
+        qs = qs.filter(student_test__test_id=filters['test'])
+    if 'subject' in filters:
+        qs = qs.filter(student_test__test__subject_id=filters['subject'])
+    if 'semester' in filters:
+        qs = qs.filter(Q(student_test__semester__number=filters['semester'])
+                       | Q(student_test__semester__isnull=True, student_test__test__semester__number=filters['semester']))
+    # Sana chegaralari mahalliy vaqt bo'yicha; yarim ochiq oraliq start_time indeksidan foydalanadi
+    if 'date_from' in filters:
+        qs = qs.filter(student_test__start_time__gte=_day_start(filters['date_from']))
+    if 'date_to' in filters:
+        qs = qs.filter(student_test__start_time__lt=_day_start(filters['date_to'] + timedelta(days=1)))
+    return qs.annotate(
+        group_name=Coalesce('student_test__group__name', 'student_test__test__group__name',
+                            'student_test__student__group__name'),
+        subject_name=Coalesce('student_test__subject__name', 'student_test__test__subject__name'),
+        semester_number=Coalesce('student_test__semester__number', 'student_test__test__semester__number'),
+    ).order_by('id')
+
+
+def answer_rows(filters, chunk_size=CHUNK_SIZE):
+    """ANSWER_CSV_HEADERS tartibidagi kortejlar (tuple) oqimi."""
+    answers = answer_queryset(filters)
+    rows = answers.values_list(
+        'id', 'student_test_id', 'student_test__student_id', 'student_test__student__username',
+        'student_test__student__last_name', 'student_test__student__first_name', 'student_test__student__role',
+        'group_name', 'subject_name', 'semester_number', 'student_test__test_id', 'question_id',
+        'question__question_type', 'is_correct', 'score', 'student_test__start_time',
+    )
+    for row in track_progress(rows.iterator(chunk_size=chunk_size), answers.count):
+        started = row[-1]
+        yield row[:13] + (int(row[13]), row[14], timezone.localtime(started).isoformat() if started else '')
+
+
+def export_filename(filters):
+    parts = ['javoblar'] + [f"{name}-{filters[name]}" for name in FILTER_FIELDS if name in filters]
+    return '_'.join(parts) + '.csv'
@@ -0,0 +1,34 @@
+"""Og'ir ishlarni so'rovdan tashqarida (fon oqimida) bajarish.
+
+Loyihada alohida navbat (Celery va h.k.) yo'q, shuning uchun vazifa joriy tranzaksiya
+commit bo'lgach daemon oqimda ishga tushiriladi. BACKGROUND_TASKS_SYNC=True bo'lsa
+(testlar, management buyruqlari) vazifa shu joyning o'zida bajariladi.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+logger = logging.getLogger('api')
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('BACKGROUND_TASK_FAILED task=%s', getattr(func, '__name__', func))
+    finally:
+        # Oqimga tegishli DB ulanishini yopamiz
+        connection.close()
+
+
+def run_in_background(func, *args, **kwargs):
+    """func(*args, **kwargs) ni commitdan keyin fon oqimida ishga tushiradi."""
+    def start():
+        if getattr(settings, 'BACKGROUND_TASKS_SYNC', False):
+            func(*args, **kwargs)
+            return
+        threading.Thread(target=_run, args=(func, args, kwargs), daemon=True).start()
+    transaction.on_commit(start)
@@ -0,0 +1,145 @@
+"""Imtihon boshlanishida kirishni cheklash (admission control) va navbat.
+
+Yangi urinish (varaqa yaratish + StudentTest insert) bir vaqtda faqat belgilangan
+miqdordagi so'rovlarga ruxsat etiladi: test bo'yicha EXAM_ADMISSION_PER_TEST va
+server (host) bo'yicha EXAM_ADMISSION_PER_SERVER. Byudjetdan oshgan talabaga navbat
+raqami (ticket) beriladi; kutish sahifasi testapi_queue_status ni so'rab turadi va
+navbati kelganda test sahifasini qayta ochadi.
+
+Navbat va slotlar ExamQueueEntry jadvalida – barcha gunicorn workerlari bitta tartib va
+bitta byudjetni ko'radi. Slot yozuvi so'rov oxirida o'chiriladi; worker qulab o'chirmasa,
+SLOT_TTL dan keyin hisobga olinmaydi. Navbat raqami egasi har so'rovda heartbeat ni
+yangilaydi: TICKET_TIMEOUT davomida so'ramagan (tab yopilgan, sessiya yo'qolgan) raqam
+tashlab ketilgan hisoblanadi va keyingilarni ushlab turmaydi.
+"""
+import socket
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import ExamQueueEntry
+
+
+SLOT_TTL = 60
+QUEUE_TTL = 60 * 60
+POLL_INTERVAL = 3
+# Shuncha vaqt heartbeat kelmasa navbat raqami tashlab ketilgan (bir nechta o'tkazib yuborilgan so'rovga chidaydi)
+TICKET_TIMEOUT = POLL_INTERVAL * 5
+
+WAITING = 'waiting'
+ENTERING = 'entering'
+
+_HOST = socket.gethostname()
+
+
+def per_test_limit():
+    return getattr(settings, 'EXAM_ADMISSION_PER_TEST', 30)
+
+
+def per_server_limit():
+    return getattr(settings, 'EXAM_ADMISSION_PER_SERVER', 60)
+
+
+def _since(seconds):
+    return timezone.now() - timedelta(seconds=seconds)
+
+
+def _waiting(test_id):
+    return ExamQueueEntry.objects.filter(test_id=test_id, status=WAITING, heartbeat__gte=_since(TICKET_TIMEOUT))
+
+
+def _active_slots(test_id, upto=None):
+    """(test bo'yicha, server bo'yicha) band slotlar – bitta so'rov; upto – shu id gacha (o'zi ham)."""
+    qs = ExamQueueEntry.objects.filter(status=ENTERING, heartbeat__gte=_since(SLOT_TTL))
+    if upto is not None:
+        qs = qs.filter(id__lte=upto)
+    counts = qs.aggregate(test=Count('id', filter=Q(test_id=test_id)), server=Count('id', filter=Q(host=_HOST)))
+    return counts['test'], counts['server']
+
+
+def free_slots(test_id):
+    test_active, server_active = _active_slots(test_id)
+    return max(0, min(per_test_limit() - test_active, per_server_limit() - server_active))
+
+
+def _acquire_slot(test_id):
+    """Slot yozuvini qo'yadi va o'zidan oldingilar bilan byudjetga sig'ishini tekshiradi.
+
+    Oldin yozib keyin sanash poygada byudjetdan oshirmaydi: bir vaqtda kelgan so'rovlardan
+    id si kichigi ustun. Sig'sa slot id si, aks holda None qaytadi.
+    """
+    entry = ExamQueueEntry.objects.create(test_id=test_id, status=ENTERING, host=_HOST)
+    test_active, server_active = _active_slots(test_id, upto=entry.id)
+    if test_active > per_test_limit() or server_active > per_server_limit():
+        entry.delete()
+        return None
+    return entry.id
+
+
+def release_slot(slot_id):
+    ExamQueueEntry.objects.filter(id=slot_id).delete()
+
+
+def take_ticket(test_id):
+    # Eski (tashlab ketilgan) yozuvlar vaqti-vaqti bilan tozalanadi
+    ExamQueueEntry.objects.filter(test_id=test_id, heartbeat__lt=_since(QUEUE_TTL)).delete()
+    return ExamQueueEntry.objects.create(test_id=test_id, status=WAITING, host=_HOST).id
+
+
+def heartbeat(ticket):
+    """Navbat raqami egasi hali kutyapti; raqam muddati o'tgan yoki yo'q bo'lsa False."""
+    return bool(ExamQueueEntry.objects.filter(id=ticket, status=WAITING, heartbeat__gte=_since(TICKET_TIMEOUT))
+                .update(heartbeat=timezone.now()))
+
+
+def queue_position(test_id, ticket):
+    """Navbatda oldinda turganlar soni (faqat heartbeat i tirik raqamlar)."""
+    return _waiting(test_id).filter(id__lt=ticket).count()
+
+
+def is_ready(test_id, ticket):
+    """Navbat raqami bo'sh slotlar oynasiga kirdimi (oldindagilar soni < bo'sh slotlar)."""
+    return queue_position(test_id, ticket) < free_slots(test_id)
+
+
+def try_enter(request, test_id):
+    """Yangi urinish boshlash uchun slot olishga harakat qiladi.
+
+    Muvaffaqiyatli bo'lsa True qaytaradi va slot so'rov oxirida (release_exam_slot) qaytariladi.
+    Aks holda talabaga navbat raqami beriladi (sessiyada saqlanadi) va False qaytariladi.
+    """
+    session_key = f'examq_ticket_{test_id}'
+    ticket = request.session.get(session_key)
+    if ticket is None or not heartbeat(ticket):
+        # Navbat bo'lsa yangi kelgan talaba navbatni chetlab o'tmaydi; muddati o'tgan raqam egasi oxiriga turadi
+        if ticket is None and not _waiting(test_id).exists():
+            slot = _acquire_slot(test_id)
+            if slot is not None:
+                request._exam_slot = slot
+                return True
+        request.session[session_key] = take_ticket(test_id)
+        return False
+    if is_ready(test_id, ticket):
+        slot = _acquire_slot(test_id)
+        if slot is not None:
+            request._exam_slot = slot
+            request.session.pop(session_key, None)
+            ExamQueueEntry.objects.filter(id=ticket).delete()
+            return True
+    return False
+
+
+def release_exam_slot(view):
+    """View yakunida (xato bo'lsa ham) try_enter olgan slotni qaytaradi."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            slot_id = getattr(request, '_exam_slot', None)
+            if slot_id is not None:
+                release_slot(slot_id)
+    return wrapper
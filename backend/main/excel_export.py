@@ -0,0 +1,143 @@
+"""Doimiy xotirali Excel eksporti.
+
+Workbook openpyxl write-only rejimida tuziladi: qatorlar to'g'ridan-to'g'ri vaqtinchalik
+faylga yoziladi, sarlavha uslubi bitta nomlangan uslub (NamedStyle) sifatida qayta
+ishlatiladi, querysetlar .iterator() bilan bo'laklab o'qiladi va tayyor fayl
+FileResponse orqali oqim (stream) bilan yuboriladi. Shu sababli xotira qatorlar soniga
+bog'liq emas.
+"""
+import tempfile
+from collections import defaultdict
+from itertools import islice
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+
+from .answer_key import AnswerKeyRegistry
+from .models import Question, StudentAnswer
+from .scoring import build_question_key
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+HEADER_STYLE = 'export_header'
+CHUNK_SIZE = 2000
+# Batafsil (har javob) eksportlarda javoblar shuncha urinish uchun bitta so'rovda olinadi
+ANSWER_BATCH = 500
+
+
+def _header_style():
+    return NamedStyle(
+        name=HEADER_STYLE,
+        font=Font(bold=True, color="FFFFFF"),
+        fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+        alignment=Alignment(horizontal="center", vertical="center"),
+    )
+
+
+def sheet_title(title):
+    """Excel varaq nomi: 31 belgidan oshmasin va taqiqlangan belgilar bo'lmasin."""
+    for ch in '[]:*?/\\':
+        title = title.replace(ch, ' ')
+    return title[:31] or 'Sheet'
+
+
+def write_xlsx(fileobj, title, headers, rows, column_widths=(), header_style=True):
+    """Write-only workbook: sarlavha + rows iteratoridagi qatorlar fileobj ga yoziladi."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title(title))
+    # Write-only rejimda ustun kengliklari birinchi qatordan oldin berilishi kerak
+    for col, width in enumerate(column_widths, 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+    if header_style:
+        wb.add_named_style(_header_style())
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.style = HEADER_STYLE
+            header_cells.append(cell)
+        ws.append(header_cells)
+    else:
+        ws.append(list(headers))
+    for row in rows:
+        ws.append(row)
+    wb.save(fileobj)
+
+
+def xlsx_response(filename, title, headers, rows, column_widths=(), header_style=True):
+    """Workbookni vaqtinchalik faylga yozib, FileResponse bilan bo'laklab yuboradi (fayl yopilganda o'chadi)."""
+    tmp = tempfile.TemporaryFile()
+    write_xlsx(tmp, title, headers, rows, column_widths, header_style)
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _user_answer(qtype, option_texts, text_answer):
+    if qtype == 'single_choice':
+        return option_texts[0] if option_texts else ""
+    if qtype == 'multiple_choice':
+        return ", ".join(option_texts)
+    if qtype in ('fill_in_blank', 'true_false', 'sentence_ordering'):
+        return text_answer or ""
+    if qtype == 'matching':
+        return "Moslashtirish javobi"
+    return ""
+
+
+def iter_answer_details(student_tests):
+    """(stest, answers) juftliklari; answers – varaqadagi javoblar lug'atlari ro'yxati.
+
+    Urinishlar .iterator() bilan o'qiladi, javoblar va tanlangan variant matnlari esa har
+    ANSWER_BATCH ta urinish uchun bittadan so'rov bilan olinadi (urinish boshiga so'rov yo'q).
+    """
+    answer_keys = AnswerKeyRegistry()
+    Through = StudentAnswer.answer_option.through
+    for batch in _batched(student_tests.iterator(chunk_size=CHUNK_SIZE), ANSWER_BATCH):
+        stest_ids = [st.id for st in batch]
+        answers_by_stest = defaultdict(list)
+        answer_rows = list(
+            StudentAnswer.objects.filter(student_test_id__in=stest_ids)
+            .order_by('student_test_id', 'id')
+            .values_list('id', 'student_test_id', 'question_id', 'question__text', 'question__question_type',
+                         'text_answer', 'is_correct', 'score')
+        )
+        option_texts = defaultdict(list)
+        for answer_id, text in (Through.objects.filter(studentanswer__student_test_id__in=stest_ids)
+                                .order_by('answeroption_id').values_list('studentanswer_id', 'answeroption__text')):
+            option_texts[answer_id].append(text)
+        for answer_id, stest_id, qid, qtext, qtype, text_answer, is_correct, score in answer_rows:
+            answers_by_stest[stest_id].append({
+                'question_id': qid,
+                'question': qtext,
+                'user_answer': _user_answer(qtype, option_texts[answer_id], text_answer),
+                'is_correct': is_correct,
+                'score': score,
+            })
+        keys = {st.id: answer_keys.for_test(st.test) for st in batch}
+        # Testdan keyin olib tashlangan savollar kalitda yo'q – ular bitta so'rov bilan yuklanadi
+        missing = {r[2] for r in answer_rows if keys[r[1]].get(r[2]) is None}
+        removed = {}
+        if missing:
+            questions = list(Question.objects.filter(id__in=missing).prefetch_related('answer_options'))
+            removed = {q.id: build_question_key(q, 0)['correct_display'] for q in questions}
+        for stest in batch:
+            key = keys[stest.id]
+            answers = answers_by_stest.pop(stest.id, [])
+            if stest.question_ids:
+                paper = set(stest.question_ids)
+                answers = [a for a in answers if a['question_id'] in paper]
+            for answer in answers:
+                entry = key.get(answer['question_id'])
+                answer['correct_answer'] = entry['correct_display'] if entry else removed.get(answer['question_id'], "")
+            yield stest, answers
@@ -0,0 +1,257 @@
+"""Eksport navbati: og'ir PDF/Excel/Word eksportlari so'rov ichida emas, fon oqimida tayyorlanadi.
+
+Controller eksportni filtrlar bilan navbatga qo'yadi (ExportJob), worker mavjud eksport
+viewini shu foydalanuvchi nomidan chaqiradi va natijani MEDIA_ROOT/exports/ ga yozadi,
+UI esa holatni so'rab turadi va fayl tayyor bo'lgach yuklab oladi.
+
+Barmoq izi (fingerprint) = tur + filtrlar + ma'lumotlar holati. Ma'lumotlar o'zgarmagan
+bo'lsa bir xil so'rov uchun yangi fayl tuzilmaydi – tayyor (yoki tayyorlanayotgan) job
+qaytariladi.
+
+Bajarilish foizi (ExportJob.progress) yozuvchilarning qator sikllaridan track_progress orqali
+yangilanadi: job oqimida har PROGRESS_STEP foizda bitta UPDATE, oddiy HTTP eksportida esa
+hech narsa qilinmaydi.
+"""
+import hashlib
+import json
+import logging
+import re
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.files import File
+from django.db.models import Count, Max, Q, Sum
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .background import run_in_background
+from .models import ExportJob, Group, StudentTest, StudentTestModification, Test, User
+
+
+logger = logging.getLogger('api')
+
+# Tayyorlanish shu muddatdan oshsa (worker qulagan) job boshqa worker tomonidan qayta olinadi
+CLAIM_TIMEOUT = timedelta(minutes=15)
+# progress shuncha foizga o'sganda yoziladi (har qatorda UPDATE bo'lmasin)
+PROGRESS_STEP = 5
+
+# Joriy oqimda bajarilayotgan job (run_export_job o'rnatadi)
+_current = threading.local()
+
+
+def track_progress(rows, total):
+    """rows ni o'zgarishsiz qaytaradi; fon jobi ichida ExportJob.progress ni yangilab boradi.
+
+    total – qatorlar soni yoki uni qaytaruvchi funksiya (faqat job ichida chaqiriladi, oddiy
+    eksportda qo'shimcha so'rov yo'q). Ichma-ich sikllarda faqat tashqisi hisoblanadi.
+    """
+    job_id = getattr(_current, 'job_id', None)
+    if job_id is None or getattr(_current, 'tracking', False):
+        yield from rows
+        return
+    _current.tracking = True
+    try:
+        total = total() if callable(total) else total
+        reported = 0
+        for done, row in enumerate(rows, 1):
+            yield row
+            percent = min(99, done * 100 // total) if total else 0
+            if percent >= reported + PROGRESS_STEP:
+                reported = percent
+                ExportJob.objects.filter(id=job_id).update(progress=percent)
+    finally:
+        _current.tracking = False
+
+
+def _results_token():
+    """Natijalar holati: urinishlar, override/qayta baholash, test sozlamalari va guruhlar o'zgarsa o'zgaradi."""
+    stats = StudentTest.objects.aggregate(
+        attempts=Count('id'),
+        last_id=Max('id'),
+        ended=Max('end_time'),
+        overridden=Max('overridden_at'),
+        score=Sum('total_score'),
+        correct=Sum('correct_count'),
+        answered=Sum('answered_count'),
+        completed=Count('id', filter=Q(completed=True)),
+        retakes=Count('id', filter=Q(can_retake=True)),
+    )
+    stats['modification'] = StudentTestModification.objects.aggregate(last=Max('id'))['last']
+    stats['tests'] = Test.objects.aggregate(updated=Max('updated_at'), count=Count('id'))
+    stats['groups'] = Group.objects.aggregate(last=Max('id'), count=Count('id'))
+    return stats
+
+
+def _users_token():
+    """Foydalanuvchilar ro'yxati holati: qo'shish/o'chirish (Count, Max id) va har qanday tahrir (updated_at)."""
+    return User.objects.aggregate(count=Count('id'), last_id=Max('id'), updated=Max('updated_at'))
+
+
+# tur -> (view, URL argumentlari, ma'lumotlar holati manbalari, nom).
+# Faylda talaba ismi/logini chiqadigan har bir turda _users_token ham bo'lishi kerak – aks holda
+# foydalanuvchi qayta nomlansa yoki guruhi o'zgarsa eski ismli fayl qayta beriladi.
+EXPORT_KINDS = {
+    'subject_results_pdf': ('main.views_test_api.export_subject_results_pdf', ('subject_name',), (_results_token, _users_token), "Fan natijalari (PDF)"),
+    'subject_results_zip': ('main.views_test_api.subject_results_zip_file', (), (_results_token, _users_token), "Fanlar hisobotlari (ZIP)"),
+    'all_results_excel': ('main.views_test_api.export_all_results_excel', (), (_results_token, _users_token), "Barcha natijalar (Excel)"),
+    'group_results_excel': ('main.views_test_api.export_group_results_excel', ('group_id',), (_results_token, _users_token), "Guruh natijalari (Excel)"),
+    'students_by_group_excel': ('main.views_test_api.export_students_by_group_excel', ('group_id',), (_results_token, _users_token), "Talabalar natijalari (Excel)"),
+    'tutors_by_kafedra_excel': ('main.views_test_api.export_tutors_by_kafedra_excel', ('kafedra_id',), (_results_token, _users_token), "Tutorlar natijalari (Excel)"),
+    'employees_by_bulim_excel': ('main.views_test_api.export_employees_by_bulim_excel', ('bulim_id',), (_results_token, _users_token), "Xodimlar natijalari (Excel)"),
+    'results_export': ('main.views_test_api.export_results', (), (_results_token, _users_token), "Natijalar (Excel/CSV/PDF)"),
+    'answers_csv': ('main.views_test_api.export_answers_csv', (), (_results_token, _users_token), "Javoblar (CSV)"),
+    'failed_pdf': ('main.views_participated.export_failed_pdf', (), (_results_token, _users_token), "Yiqilganlar/qatnashmaganlar (PDF)"),
+    'users_excel': ('main.views_controller_panel.export_users_excel', (), (_users_token,), "Foydalanuvchilar (Excel)"),
+    'users_word': ('main.views_controller_panel.export_users_word', (), (_users_token,), "Foydalanuvchilar (Word)"),
+    'users_pdf': ('main.views_controller_panel.export_users_pdf', (), (_users_token,), "Foydalanuvchilar (PDF)"),
+}
+
+
+def normalize_params(kind, query, kwargs):
+    """{'kwargs': {...}, 'query': {kalit: [qiymatlar]}} – bo'sh qiymatlar tashlanadi, kalitlar tartiblanadi."""
+    arg_names = EXPORT_KINDS[kind][1]
+    missing = [name for name in arg_names if not str(kwargs.get(name, '')).strip()]
+    if missing:
+        raise ValueError(f"Majburiy parametr yo'q: {', '.join(missing)}")
+    clean_query = {}
+    for key in sorted(query):
+        if key in arg_names or key in ('kind', 'csrfmiddlewaretoken'):
+            continue
+        values = [v for v in query.getlist(key) if v != ''] if hasattr(query, 'getlist') else list(query[key])
+        if values:
+            clean_query[key] = values
+    return {'kwargs': {name: str(kwargs[name]) for name in arg_names}, 'query': clean_query}
+
+
+def fingerprint(kind, params, user):
+    """Natija foydalanuvchi roliga bog'liq (masalan, superuser override ustunlarini ko'radi)."""
+    tokens = [source() for source in EXPORT_KINDS[kind][2]]
+    audience = [getattr(user, 'role', None), bool(getattr(user, 'is_superuser', False)), getattr(user, 'group_id', None)]
+    payload = json.dumps([kind, params, audience, tokens], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def is_export_admin(user):
+    return user.is_superuser or getattr(user, 'role', None) in ('admin', 'controller')
+
+
+def can_access(user, job):
+    """Job fayli: so'ragan foydalanuvchi yoki admin/controller (bir xil barmoq izli job ular o'rtasida umumiy)."""
+    return user.is_authenticated and (job.created_by_id == user.id or is_export_admin(user))
+
+
+def request_export(user, kind, query, kwargs=None, host='localhost', secure=False):
+    """Eksportni navbatga qo'yadi. (job, reused) qaytaradi: reused=True – tayyor yoki tayyorlanayotgan job."""
+    if kind not in EXPORT_KINDS:
+        raise ValueError("Noma'lum eksport turi")
+    params = normalize_params(kind, query, kwargs or {})
+    fp = fingerprint(kind, params, user)
+    candidates = ExportJob.objects.filter(fingerprint=fp, status__in=('pending', 'running', 'done'))
+    if not is_export_admin(user):
+        candidates = candidates.filter(created_by=user)
+    for job in candidates.order_by('-created_at'):
+        if job.status != 'done' or (job.file and job.file.storage.exists(job.file.name)):
+            return job, True
+    params['origin'] = {'host': host, 'secure': secure}
+    job = ExportJob.objects.create(kind=kind, params=params, fingerprint=fp, created_by=user)
+    run_in_background(run_export_job, job.id)
+    return job, False
+
+
+class _JobRequest(HttpRequest):
+    """Eksport viewini fon oqimida chaqirish uchun so'rov (QR havolalar uchun asl host saqlanadi)."""
+
+    def __init__(self, job):
+        super().__init__()
+        origin = job.params.get('origin', {})
+        self.method = 'GET'
+        self.path = '/'
+        query = QueryDict(mutable=True)
+        for key, values in job.params.get('query', {}).items():
+            query.setlist(key, values)
+        self.GET = query
+        self.user = job.created_by or AnonymousUser()
+        self.META = {'HTTP_HOST': origin.get('host', 'localhost'), 'SERVER_NAME': 'localhost', 'SERVER_PORT': '80'}
+        self._secure = origin.get('secure', False)
+
+    def _get_scheme(self):
+        return 'https' if self._secure else 'http'
+
+
+def _response_filename(response, default):
+    disposition = response.get('Content-Disposition', '')
+    match = re.search(r"filename\*=utf-8''([^;]+)", disposition, re.IGNORECASE)
+    if match:
+        return unquote(match.group(1))
+    match = re.search(r'filename="?([^";]+)"?', disposition)
+    return match.group(1) if match else default
+
+
+def _claim(job_id):
+    now = timezone.now()
+    return ExportJob.objects.filter(id=job_id).filter(
+        Q(status='pending') | Q(status='running', started_at__lt=now - CLAIM_TIMEOUT)
+    ).update(status='running', started_at=now, error='', progress=0)
+
+
+def run_export_job(job_id):
+    """Navbatdagi jobni bajaradi. Boshqa worker olgan yoki tugagan bo'lsa hech narsa qilmaydi."""
+    if not _claim(job_id):
+        return False
+    job = ExportJob.objects.select_related('created_by').get(id=job_id)
+    view_path = EXPORT_KINDS[job.kind][0]
+    _current.job_id = job_id
+    try:
+        view = import_string(view_path)
+        response = view(_JobRequest(job), **job.params.get('kwargs', {}))
+        if response.status_code != 200 or not response.has_header('Content-Disposition'):
+            # Ruxsat yo'q (redirect/403) yoki noto'g'ri filtr – view javobi xato sifatida saqlanadi
+            content = b'' if response.streaming else response.content
+            raise ValueError(content.decode('utf-8', 'replace')[:500] or f"HTTP {response.status_code}")
+        filename = _response_filename(response, f"{job.kind}.bin")
+        with tempfile.TemporaryFile() as tmp:
+            chunks = response.streaming_content if response.streaming else [response.content]
+            for chunk in chunks:
+                tmp.write(chunk)
+            response.close()
+            tmp.seek(0)
+            # /media/ ochiq bo'lishi mumkin – fayl nomi taxmin qilinmasin (access kodlar bor)
+            job.file.save(f"{uuid.uuid4().hex}/{filename}", File(tmp), save=False)
+        job.filename = filename
+        job.content_type = response.get('Content-Type', '')
+        job.status = 'done'
+        job.progress = 100
+        job.finished_at = timezone.now()
+        job.save(update_fields=['file', 'filename', 'content_type', 'status', 'progress', 'finished_at'])
+    except Exception as exc:
+        logger.exception('EXPORT_JOB_FAILED job=%s kind=%s', job_id, job.kind)
+        ExportJob.objects.filter(id=job_id).update(status='failed', error=str(exc)[:2000], finished_at=timezone.now())
+        return False
+    finally:
+        _current.job_id = None
+    return True
+
+
+def replay_pending():
+    """Jarayon qulashi sababli tayyorlanmay qolgan joblarni bajaradi; bajarilganlar sonini qaytaradi."""
+    ids = list(ExportJob.objects.filter(status__in=('pending', 'running')).order_by('id').values_list('id', flat=True))
+    return sum(1 for job_id in ids if run_export_job(job_id))
+
+
+def purge_expired(days=None):
+    """Muddati o'tgan eksport fayllari va yozuvlarini o'chiradi; o'chirilganlar sonini qaytaradi."""
+    days = getattr(settings, 'EXPORT_JOB_RETENTION_DAYS', 7) if days is None else days
+    expired = ExportJob.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).exclude(status='running')
+    count = 0
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
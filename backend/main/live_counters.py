@@ -0,0 +1,108 @@
+"""Imtihon jarayonining jonli hisoblagichlari (StudentTest maydonlaridan).
+
+Live monitor har yangilanishda StudentAnswer bo'yicha JOIN + COUNT qilmasligi uchun imtihon
+yozish yo'li urinish qatorining o'zini yangilaydi: autosave shu urinish javoblaridan
+answered_count/correct_count ni qayta hisoblaydi (qayta saqlash ustidan yozadi – takroriy so'rov
+hisobni buzmaydi), baholash yakuniy sonlarni yozadi, har o'zgarishda last_activity qo'yiladi.
+
+Test va test × guruh hisoblagichlari (started, questions, answered, correct, completed,
+last_activity) shu maydonlardan bitta agregat so'rov bilan olinadi. Hammasi bazada – barcha
+gunicorn workerlari bir xil sonlarni ko'radi, kesh kerak emas.
+
+Yozish yo'lini chetlab o'tgan o'zgarishlar (javobni qo'lda tuzatish, REST orqali yozilgan
+javoblar) reconcile() bilan StudentAnswer dan qayta hisoblanadi – reconcile_live_counters
+buyrug'i (cron).
+"""
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .models import StudentTest, Test
+from .rollups import refresh_rollups
+from .scoring import refresh_result_counters
+
+
+COUNTER_FIELDS = ('started', 'questions', 'answered', 'correct', 'completed')
+# Reconcile urinishlarni shu o'lchamdagi bo'laklarda o'qiydi
+LOAD_BATCH = 500
+RECONCILE_FIELDS = ('id', 'test_id', 'question_ids', 'answered_count', 'correct_count', 'percent', 'completed')
+
+
+def _timestamp(value):
+    return value.timestamp() if value else None
+
+
+def answers_saved(stest):
+    """Autosave: urinish hisoblagichlari shu urinish javoblaridan (varaqadagi savollar) qayta hisoblanadi."""
+    refresh_result_counters([stest], save=False)
+    StudentTest.objects.filter(id=stest.id).update(
+        answered_count=stest.answered_count, correct_count=stest.correct_count, percent=stest.percent,
+        last_activity=timezone.now(),
+    )
+
+
+def paper_sizes(test_ids):
+    """Test bo'yicha varaqa hajmi – ensure_paper kabi: question_count, lekin havzadagi savollardan ko'p emas."""
+    rows = (Test.objects.filter(id__in=list(test_ids)).values('id', 'question_count')
+            .annotate(pool=Count('test_questions')).values_list('id', 'question_count', 'pool').order_by())
+    return {test_id: min(count, pool) for test_id, count, pool in rows}
+
+
+def _empty():
+    return {**dict.fromkeys(COUNTER_FIELDS, 0), 'last_activity': None}
+
+
+def many_counters(test_ids, sizes=None):
+    """{(test_id, None): test hisoblagichlari, (test_id, group_id): guruh kesimi} – bitta agregat so'rov.
+
+    sizes – {test_id: varaqa hajmi}; berilmasa paper_sizes dan olinadi. Urinishi yo'q guruhlar natijada bo'lmaydi.
+    """
+    test_ids = list(test_ids)
+    sizes = paper_sizes(test_ids) if sizes is None else sizes
+    result = {(test_id, None): _empty() for test_id in test_ids}
+    rows = (StudentTest.objects.filter(test_id__in=test_ids).values('test_id', 'group_id')
+            .annotate(started=Count('id'), answered=Sum('answered_count'), correct=Sum('correct_count'),
+                      completed=Count('id', filter=Q(completed=True)), last_activity=Max('last_activity'))
+            .order_by())
+    for row in rows:
+        counts = {
+            'started': row['started'],
+            'questions': row['started'] * sizes.get(row['test_id'], 0),
+            'answered': row['answered'] or 0,
+            'correct': row['correct'] or 0,
+            'completed': row['completed'],
+            'last_activity': _timestamp(row['last_activity']),
+        }
+        total = result[(row['test_id'], None)]
+        for field in COUNTER_FIELDS:
+            total[field] += counts[field]
+        if counts['last_activity'] and (total['last_activity'] or 0) < counts['last_activity']:
+            total['last_activity'] = counts['last_activity']
+        if row['group_id'] is not None:
+            result[(row['test_id'], row['group_id'])] = counts
+    return result
+
+
+def test_counters(test_id):
+    return many_counters([test_id])[(test_id, None)]
+
+
+def reconcile(test_id):
+    """Test urinishlari hisoblagichlarini StudentAnswer dan qayta hisoblaydi; farq qilgan urinish id lari.
+
+    Farq qilganlarning last_activity si yangilanadi – live monitor ularni qayta yuboradi.
+    """
+    attempts = StudentTest.objects.filter(test_id=test_id).only(*RECONCILE_FIELDS).order_by('id')
+    drifted = []
+    for start in range(0, attempts.count(), LOAD_BATCH):
+        drifted += refresh_result_counters(attempts[start:start + LOAD_BATCH])
+    if drifted:
+        StudentTest.objects.filter(id__in=[st.id for st in drifted]).update(last_activity=timezone.now())
+        # Yakunlangan urinish foizi o'zgargan bo'lsa natijalar xulosasi ham
+        refresh_rollups([st for st in drifted if st.completed])
+    return [st.id for st in drifted]
+
+
+def live_test_ids():
+    """Reconcile qilinadigan testlar: faol testlar va yakunlanmagan urinishi borlari."""
+    return list(Test.objects.filter(Q(active=True) | Q(student_tests__completed=False))
+                .values_list('id', flat=True).distinct().order_by('id'))
@@ -0,0 +1,235 @@
+"""Live monitor: bitta snapshot, keyin faqat o'zgargan qatorlar (kursorli short-poll).
+
+Oldin sahifa har bir necha soniyada butun test bo'yicha Count('answers') so'rovini qayta
+ishlatar va barcha qatorlarni qayta yuborar edi. Endi imtihon yozish yo'li (urinish boshlanishi,
+autosave, topshirish va fon baholash) urinishning StudentTest.last_activity sini yangilaydi.
+Sahifa har MONITOR_POLL_INTERVAL soniyada kursor (ms) bilan so'raydi, server indeksli bitta
+so'rov bilan kursordan keyin o'zgargan qatorlarni oladi va darhol qaytaradi – ochiq ulanish
+yo'q, sync worker band qilib turilmaydi. O'zgarishlar bazadan olingani uchun barcha gunicorn
+workerlari bir xil javob beradi. Javoblar soni va to'g'rilari StudentAnswer dan emas, urinish
+qatoridagi hisoblagichlardan (main/live_counters.py) olinadi.
+
+Imtihon kuni sahifasi (overview) barcha faol testlarni bir nechta so'rov bilan beradi: test va
+guruhlar ro'yxati, so'ng test × guruh hisoblagichlari StudentTest bo'yicha bitta agregat so'rov.
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count
+from django.utils import timezone
+
+from . import live_counters
+from .models import StudentTest, Test, User
+
+
+logger = logging.getLogger('api')
+
+# Kursordan shuncha oldingi o'zgarishlar ham qayta o'qiladi: last_activity commitdan oldin yoziladi,
+# kechroq commit bo'lgan tranzaksiya kursordan o'tib ketmasin
+CURSOR_OVERLAP = timedelta(seconds=2)
+# Kursor shundan eski bo'lsa davom ettirilmaydi – to'liq snapshot qaytariladi
+RESUME_WINDOW = timedelta(minutes=5)
+# Live monitor sahifasi o'zgarishlarni shuncha soniyada so'raydi (har so'rov indeksli bitta so'rov)
+MONITOR_POLL_INTERVAL = 3
+# Imtihon kuni sahifasi: ortda qolish chegarasi (foiz punkti)
+LAG_GAP = 15
+# Sahifa ma'lumotni shuncha soniyada yangilaydi (indeksli agregat so'rovlar, arzon)
+OVERVIEW_POLL_INTERVAL = 5
+
+
+def cursor_id(moment):
+    """Kursor: vaqt, millisekundlarda."""
+    return int(moment.timestamp() * 1000)
+
+
+def cursor_time(event_id):
+    return datetime.fromtimestamp(event_id / 1000, tz=dt_timezone.utc)
+
+
+def attempt_row(st, answered, correct, minutes, now=None):
+    """Monitor jadvalidagi bitta qator (st – student, group, student__group bilan)."""
+    now = now or timezone.now()
+    total_q = len(st.question_ids or [])
+    remaining = None
+    if st.start_time:
+        elapsed = max(0, int((now - st.start_time).total_seconds()))
+        remaining = max(0, minutes * 60 - elapsed)
+    status = 'completed' if st.completed or (remaining is not None and remaining <= 0) else 'active'
+    return {
+        'id': st.id,
+        'student_id': st.student_id,
+        'student': st.student.get_full_name() or st.student.username,
+        'group': st.group.name if st.group else (getattr(st.student.group, 'name', None) or '-'),
+        'start_time': st.start_time.isoformat() if st.start_time else None,
+        'end_time': st.end_time.isoformat() if st.end_time else None,
+        'answers_count': answered,
+        'correct_count': correct,
+        'total_questions': total_q,
+        'percent': int(round((answered / total_q) * 100)) if total_q else 0,
+        'remaining_seconds': remaining,
+        'completed': bool(st.completed),
+        'status': status,
+        'last_activity': st.last_activity.isoformat() if st.last_activity else None,
+    }
+
+
+def _attempts(test_id):
+    return StudentTest.objects.filter(test_id=test_id).select_related('student', 'group', 'student__group')
+
+
+def _minutes(test):
+    return getattr(test, 'minutes', 30) or 30
+
+
+def snapshot(test):
+    """Testning to'liq holati (live_monitor_data va short-poll ning birinchi javobi)."""
+    # Kursor so'rovdan oldin olinadi: oradagi o'zgarishlar keyin qayta yuborilsa ham zarari yo'q
+    now = timezone.now()
+    minutes = _minutes(test)
+    attempts = _attempts(test.id).order_by('start_time')
+    rows = [attempt_row(st, st.answered_count, st.correct_count, minutes, now) for st in attempts]
+    active_rows = [r for r in rows if r['status'] == 'active']
+    completed_rows = sorted((r for r in rows if r['status'] != 'active'),
+                            key=lambda r: r['end_time'] or r['start_time'] or '', reverse=True)
+    total = len(rows)
+    return {
+        'test': {
+            'id': test.id,
+            'subject': test.subject.name,
+            'group': test.group.name if test.group else None,
+            'minutes': getattr(test, 'minutes', 30),
+            'active': test.active,
+        },
+        'summary': {
+            'participants': total,
+            'active': len(active_rows),
+            'completed': len(completed_rows),
+            'avg_progress': int(round(sum(r['percent'] for r in rows) / total)) if total else 0,
+        },
+        'students': active_rows + completed_rows,
+        'active_students': active_rows,
+        'completed_students': completed_rows,
+        'counters': live_counters.test_counters(test.id),
+        'server_time': now.isoformat(),
+        'cursor': cursor_id(now),
+    }
+
+
+def _overview_structure():
+    """Faol testlar (varaqa hajmi bilan), ularning guruhlari va guruhlardagi talabalar soni – uchta so'rov."""
+    tests = list(Test.objects.filter(active=True).select_related('subject', 'group')
+                 .annotate(pool=Count('test_questions')).order_by('-created_at'))
+    groups = {test.id: {} for test in tests}
+    for test in tests:
+        if test.group_id:
+            groups[test.id][test.group_id] = test.group.name
+    for test_id, group_id, name in (Test.groups.through.objects.filter(test_id__in=list(groups))
+                                    .values_list('test_id', 'group_id', 'group__name')):
+        groups[test_id][group_id] = name
+    group_ids = {group_id for test_groups in groups.values() for group_id in test_groups}
+    sizes = dict(User.objects.filter(role='student', group_id__in=group_ids)
+                 .values('group_id').annotate(n=Count('id')).values_list('group_id', 'n'))
+    return [{
+        'id': test.id,
+        'subject': test.subject.name,
+        'group': test.group.name if test.group else None,
+        'minutes': _minutes(test),
+        'paper_size': min(test.question_count, test.pool),
+        'groups': [{'id': group_id, 'name': name, 'students': sizes.get(group_id, 0)}
+                   for group_id, name in sorted(groups[test.id].items(), key=lambda item: item[1])],
+    } for test in tests]
+
+
+def _percent(part, whole):
+    return int(round(part * 100 / whole)) if whole else 0
+
+
+def overview():
+    """Imtihon kuni: barcha faol testlar bo'yicha jonli hisoblagichlar va ortda qolayotgan guruhlar.
+
+    Sonlar snapshot bilan bir xil manbadan – StudentTest hisoblagichlaridan test × guruh kesimida
+    bitta agregat so'rov (live_counters.many_counters); StudentAnswer o'qilmaydi, kesh ishlatilmaydi.
+    """
+    structure = _overview_structure()
+    sizes = {test['id']: test.pop('paper_size') for test in structure}
+    counters = live_counters.many_counters(list(sizes), sizes=sizes)
+    rows = []
+    for test in structure:
+        total = {field: value or 0 for field, value in counters[(test['id'], None)].items()}
+        row = {
+            **test,
+            'participants': total['started'],
+            'in_progress': total['started'] - total['completed'],
+            'completed': total['completed'],
+            'avg_progress': _percent(total['answered'], total['questions']),
+            'last_activity': total['last_activity'] or None,
+        }
+        students = sum(group['students'] for group in test['groups'])
+        row['participation'] = _percent(total['started'], students)
+        groups = []
+        for group in test['groups']:
+            counts = counters.get((test['id'], group['id'])) or dict.fromkeys(live_counters.COUNTER_FIELDS, 0)
+            groups.append({
+                **group,
+                'participants': counts['started'],
+                'in_progress': counts['started'] - counts['completed'],
+                'completed': counts['completed'],
+                'avg_progress': _percent(counts['answered'], counts['questions']),
+                'participation': _percent(counts['started'], group['students']),
+            })
+        row['groups'] = groups
+        # Ortda qolish: qatnashish yoki progress test o'rtachasidan LAG_GAP foizdan ko'proq past
+        row['lagging'] = sorted(
+            (g for g in groups if row['participants'] and (
+                row['participation'] - g['participation'] > LAG_GAP
+                or (g['participants'] and row['avg_progress'] - g['avg_progress'] > LAG_GAP))),
+            key=lambda g: (g['participation'], g['avg_progress']),
+        )
+        rows.append(row)
+    rows.sort(key=lambda r: (-r['in_progress'], -(r['last_activity'] or 0)))
+    return {
+        'summary': {
+            'tests': len(rows),
+            'running': sum(1 for r in rows if r['in_progress']),
+            'participants': sum(r['participants'] for r in rows),
+            'in_progress': sum(r['in_progress'] for r in rows),
+            'completed': sum(r['completed'] for r in rows),
+        },
+        'tests': rows,
+        'server_time': timezone.now().isoformat(),
+    }
+
+
+def reconcile(test_id):
+    """Hisoblagichlarni StudentAnswer dan tuzatadi; farq qilgan qatorlar kuzatuvchilarga qayta yuboriladi."""
+    drifted = live_counters.reconcile(test_id)
+    if drifted:
+        logger.warning('LIVE_COUNTERS_DRIFT test=%s attempts=%s', test_id, len(drifted))
+    return drifted
+
+
+def changed_rows(test, since):
+    """since dan keyin o'zgargan urinishlar qatorlari – (test, last_activity) indeksi bo'yicha bitta so'rov."""
+    minutes = _minutes(test)
+    now = timezone.now()
+    return [attempt_row(st, st.answered_count, st.correct_count, minutes, now)
+            for st in _attempts(test.id).filter(last_activity__gt=since)]
+
+
+def changes(test, cursor=None):
+    """Short-poll javobi: kursordan keyin o'zgargan qatorlar yoki (kursor yo'q/eski) to'liq snapshot.
+
+    Delta – (test, last_activity) indeksi bo'yicha bitta so'rov, so'rov darhol qaytadi (worker band
+    qilinmaydi). Javobdagi cursor keyingi so'rovga beriladi; ustma-ust o'qilgan qatorlar brauzerda
+    id bo'yicha almashtiriladi.
+    """
+    now = timezone.now()
+    since = cursor_time(cursor) if cursor is not None else None
+    if since is None or not now - RESUME_WINDOW <= since <= now:
+        return {'type': 'snapshot', **snapshot(test)}
+    return {
+        'type': 'delta',
+        'rows': changed_rows(test, since - CURSOR_OVERLAP),
+        'server_time': now.isoformat(),
+        'cursor': cursor_id(now),
+    }
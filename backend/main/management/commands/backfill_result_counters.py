@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from main.models import StudentTest
+from main.scoring import refresh_result_counters
+
+
+class Command(BaseCommand):
+    help = "StudentTest natija hisoblagichlarini (answered_count, correct_count, percent) javoblardan qayta hisoblaydi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=1000, help="Bir martada qayta ishlanadigan urinishlar soni")
+
+    def handle(self, *args, **options):
+        chunk = options['chunk']
+        qs = StudentTest.objects.filter(completed=True).order_by('id').only('id', 'question_ids', 'answered_count', 'correct_count', 'percent')
+        last_id = 0
+        checked = updated = 0
+        while True:
+            batch = list(qs.filter(id__gt=last_id)[:chunk])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            checked += len(batch)
+            updated += len(refresh_result_counters(batch))
+        self.stdout.write(self.style.SUCCESS(f"Tekshirildi: {checked}, yangilandi: {updated}"))
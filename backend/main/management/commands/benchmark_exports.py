@@ -0,0 +1,101 @@
+import io
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Font, PatternFill
+
+from main.excel_export import write_xlsx
+from main.results_export import ResultExport
+from main.models import StudentTest, Subject, Test, User
+
+
+def legacy_export(student_tests, fileobj):
+    """Eski usul (to'liq xotiradagi Workbook, har katak uchun yangi uslub obyektlari) – faqat taqqoslash uchun."""
+    wb = Workbook()
+    ws = wb.active
+    for col, header in enumerate(ResultExport(student_tests).headers, 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+    row = 2
+    for stest in list(student_tests):
+        subject = stest.test.subject.name if stest.test.subject else "-"
+        data = [f"{stest.student.first_name} {stest.student.last_name}", stest.student.username, subject, subject,
+                stest.start_time.strftime("%d.%m.%Y %H:%M"), stest.answered_count, stest.correct_count,
+                stest.incorrect_count, stest.total_score, stest.test.total_score, f"{int(stest.percent)}%"]
+        for col, value in enumerate(data, 1):
+            ws.cell(row=row, column=col, value=value)
+        row += 1
+    wb.save(fileobj)
+
+
+def streaming_export(student_tests, fileobj):
+    export = ResultExport(student_tests)
+    write_xlsx(fileobj, 'Natijalar', export.headers, export.rows(), export.widths)
+
+
+def max_rss_mb():
+    # Linux da ru_maxrss kilobaytlarda
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = ("Excel eksport: eski (xotiradagi Workbook) va write-only oqimli usulni vaqt, Python xotira cho'qqisi "
+            "va jarayon RSS cho'qqisi bo'yicha taqqoslash")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000],
+                            help="Natija qatorlari soni (default: 10000 100000)")
+        parser.add_argument('--skip-legacy', action='store_true', help="Eski usulni o'lchamaslik (katta hajmlar uchun)")
+
+    def measure(self, func, student_tests):
+        tracemalloc.start()
+        started = time.perf_counter()
+        with tempfile.TemporaryFile() as tmp:
+            target = io.BytesIO() if func is legacy_export else tmp
+            func(student_tests, target)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak / (1024 * 1024)
+
+    def handle(self, *args, **options):
+        # Barcha sintetik ma'lumotlar tranzaksiya oxirida bekor qilinadi
+        with transaction.atomic():
+            subject = Subject.objects.create(name='__bench__')
+            test = Test.objects.create(subject=subject, question_count=20, total_score=20,
+                                       duration=timedelta(minutes=30), minutes=30)
+            students = User.objects.bulk_create([
+                User(username=f'__bench_{i}__', role='student', first_name='Talaba', last_name=str(i))
+                for i in range(1000)
+            ])
+            created = 0
+            for size in sorted(options['rows']):
+                batch = [
+                    StudentTest(student=students[i % len(students)], test=test, completed=True,
+                                total_score=i % 21, answered_count=20, correct_count=i % 21, percent=(i % 21) * 5)
+                    for i in range(created, size)
+                ]
+                StudentTest.objects.bulk_create(batch, batch_size=2000)
+                created = size
+                qs = (StudentTest.objects.filter(test=test).select_related('student', 'test', 'test__subject')
+                      .order_by('student__username', '-start_time'))
+                modes = [('stream', streaming_export)]
+                if not options['skip_legacy']:
+                    modes.append(('legacy', legacy_export))
+                # Oqimli usul birinchi: RSS cho'qqisi monoton, eski usul uni keyin oshiradi
+                for label, func in modes:
+                    elapsed, peak = self.measure(func, qs)
+                    self.stdout.write(
+                        f"{size:>7} qator {label:>6}: {elapsed:.2f} s, Python xotira cho'qqisi {peak:.1f} MB, "
+                        f"jarayon RSS cho'qqisi {max_rss_mb():.0f} MB"
+                    )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Tayyor."))
@@ -0,0 +1,109 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from main.models import Subject, Question, AnswerOption, Test, TestQuestion, StudentTest, StudentAnswer, User
+from main.scoring import build_answer_key, grade_submission
+
+
+def legacy_grade(stest, questions, selected_tqs, post):
+    """Eski usul (har savol uchun alohida so'rovlar) – faqat taqqoslash uchun."""
+    for q in questions:
+        is_correct = False
+        score = 0
+        tq = next((tq for tq in selected_tqs if tq.question.id == q.id), None)
+        if q.question_type == 'single_choice':
+            option = AnswerOption.objects.filter(id=post.get(f'question_{q.id}')).first()
+            sa = StudentAnswer.objects.create(student_test=stest, question=q)
+            if option:
+                sa.answer_option.add(option)
+                if option.is_correct:
+                    is_correct = True
+                    score = tq.score if tq else 0
+            sa.is_correct = is_correct
+            sa.score = score
+            sa.save()
+        elif q.question_type == 'multiple_choice':
+            selected = [opt for opt in q.answer_options.all() if post.get(f'question_{q.id}_{opt.id}')]
+            correct_options = list(q.answer_options.filter(is_correct=True))
+            sa = StudentAnswer.objects.create(student_test=stest, question=q)
+            for opt in selected:
+                sa.answer_option.add(opt)
+            if set(selected) == set(correct_options):
+                is_correct = True
+                score = tq.score if tq else 0
+            sa.is_correct = is_correct
+            sa.score = score
+            sa.save()
+        elif q.question_type == 'fill_in_blank':
+            txt = post.get(f'question_{q.id}', '').strip().lower()
+            correct_option = q.answer_options.filter(is_correct=True).first()
+            if correct_option and txt == correct_option.text.strip().lower():
+                is_correct = True
+                score = tq.score if tq else 0
+            StudentAnswer.objects.create(student_test=stest, question=q, text_answer=txt, is_correct=is_correct, score=score)
+    return sum(a.score for a in StudentAnswer.objects.filter(student_test=stest))
+
+
+class Command(BaseCommand):
+    help = "Imtihon topshirishni baholash: eski (har savolga so'rov) va bulk usulni so'rovlar soni va vaqt bo'yicha taqqoslash"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=50, help='Savollar soni (default: 50)')
+        parser.add_argument('--repeat', type=int, default=5, help='Takrorlashlar soni (default: 5)')
+
+    def handle(self, *args, **options):
+        n = options['questions']
+        repeat = options['repeat']
+        # Barcha sintetik ma'lumotlar tranzaksiya oxirida bekor qilinadi
+        with transaction.atomic():
+            student = User.objects.create(username='__bench_student__', role='student')
+            subject = Subject.objects.create(name='__bench__')
+            test = Test.objects.create(subject=subject, question_count=n, total_score=n,
+                                       duration=timedelta(minutes=30), minutes=30)
+            post = {}
+            types = ('single_choice', 'multiple_choice', 'fill_in_blank')
+            for i in range(n):
+                qtype = types[i % len(types)]
+                q = Question.objects.create(subject=subject, text=f'Savol {i}', question_type=qtype)
+                opts = [AnswerOption.objects.create(question=q, text=f'v{j}', is_correct=(j == 0)) for j in range(4)]
+                if qtype == 'single_choice':
+                    post[f'question_{q.id}'] = str(opts[0].id)
+                elif qtype == 'multiple_choice':
+                    post[f'question_{q.id}_{opts[0].id}'] = 'on'
+                else:
+                    post[f'question_{q.id}'] = 'v0'
+                TestQuestion.objects.create(test=test, question=q, score=1)
+
+            results = {}
+            for label in ('legacy', 'bulk'):
+                total_time = 0.0
+                queries = 0
+                total = None
+                for _ in range(repeat):
+                    stest = StudentTest.objects.create(student=student, test=test)
+                    tqs = list(TestQuestion.objects.filter(test=test))
+                    questions = [tq.question for tq in tqs]
+                    with CaptureQueriesContext(connection) as ctx:
+                        started = time.perf_counter()
+                        if label == 'legacy':
+                            total = legacy_grade(stest, questions, tqs, post)
+                        else:
+                            key = build_answer_key(questions, {tq.question_id: tq.score for tq in tqs})
+                            total = sum(sa.score for sa in grade_submission(stest, key, post))
+                        total_time += time.perf_counter() - started
+                    queries = len(ctx.captured_queries)
+                results[label] = (queries, total_time / repeat * 1000, total)
+                self.stdout.write(f"{label:>6}: {queries} ta so'rov, {total_time / repeat * 1000:.1f} ms, ball={total}")
+            transaction.set_rollback(True)
+
+        if results['legacy'][2] != results['bulk'][2]:
+            self.stdout.write(self.style.ERROR("Ballar mos kelmadi!"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"So'rovlar: {results['legacy'][0]} -> {results['bulk'][0]}, "
+                f"vaqt: {results['legacy'][1]:.1f} ms -> {results['bulk'][1]:.1f} ms"
+            ))
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.answers_csv import ANSWER_CSV_HEADERS, answer_rows, parse_filters
+from main.results_export import iter_csv
+
+
+class Command(BaseCommand):
+    help = ("Yakunlangan urinishlardagi barcha javoblarni (har StudentAnswer – bitta qator) CSV ga oqim bilan yozadi. "
+            "Xotira qatorlar soniga bog'liq emas.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', help="Test ID")
+        parser.add_argument('--subject', help="Fan ID")
+        parser.add_argument('--semester', help="Semestr raqami")
+        parser.add_argument('--from', dest='date_from', help="Boshlanish sanasi (YYYY-MM-DD, kiradi)")
+        parser.add_argument('--to', dest='date_to', help="Tugash sanasi (YYYY-MM-DD, kiradi)")
+        parser.add_argument('--output', '-o', default='-', help="Fayl yo'li ('-' – stdout)")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Bazadan bir martada o'qiladigan qatorlar")
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_filters(options)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        rows = answer_rows(filters, chunk_size=options['chunk_size'])
+        if options['output'] == '-':
+            count = self.write(sys.stdout, rows, bom=False)
+        else:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as fh:
+                count = self.write(fh, rows, bom=True)
+            self.stdout.write(self.style.SUCCESS(f"{count} ta javob yozildi: {options['output']}"))
+
+    def write(self, fh, rows, bom):
+        count = 0
+
+        def counted():
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        for line in iter_csv(ANSWER_CSV_HEADERS, counted(), bom=bom):
+            fh.write(line)
+        return count
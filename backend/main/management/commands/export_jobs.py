@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from main.export_jobs import purge_expired, replay_pending
+
+
+class Command(BaseCommand):
+    help = "Eksport navbati: tayyorlanmay qolgan joblarni bajaradi va muddati o'tgan fayllarni o'chiradi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--purge', action='store_true', help="Muddati o'tgan eksportlarni o'chirish")
+        parser.add_argument('--days', type=int, default=None, help="Saqlash muddati (standart: EXPORT_JOB_RETENTION_DAYS)")
+
+    def handle(self, *args, **options):
+        done = replay_pending()
+        self.stdout.write(f"{done} ta eksport tayyorlandi.")
+        if options['purge']:
+            removed = purge_expired(options['days'])
+            self.stdout.write(f"{removed} ta eski eksport o'chirildi.")
+        self.stdout.write(self.style.SUCCESS("Tayyor."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Test
+from main.variants import generate_variants
+
+
+class Command(BaseCommand):
+    help = "Testlar uchun varaqa variantlarini (qayta) tuzadi. Test ID berilmasa barcha faol testlar."
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', type=int)
+        parser.add_argument('--count', type=int, default=None, help="Variantlar soni (standart: EXAM_VARIANT_COUNT)")
+
+    def handle(self, *args, **options):
+        test_ids = options['test_ids'] or list(Test.objects.filter(active=True).values_list('id', flat=True))
+        for test_id in test_ids:
+            created = generate_variants(test_id, options['count'])
+            self.stdout.write(f"Test ID={test_id}: {created} ta variant")
+        self.stdout.write(self.style.SUCCESS("Tayyor."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from main.models import ResultRollup
+from main.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Natijalar xulosasi (ResultRollup) jadvalini yakunlangan urinishlardan noldan quradi."
+
+    def handle(self, *args, **options):
+        before = ResultRollup.objects.count()
+        created = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Oldin: {before} qator, endi: {created} qator"))
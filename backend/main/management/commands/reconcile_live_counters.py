@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.live_counters import live_test_ids
+from main.live_monitor import reconcile
+
+
+class Command(BaseCommand):
+    help = ("Live monitor hisoblagichlarini (StudentTest.answered_count/correct_count) javoblardan qayta hisoblaydi. "
+            "Imtihon kunlari cron orqali har bir necha daqiqada ishga tushiring.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, action='append', dest='tests', help="Faqat shu test(lar) (standart: faol testlar)")
+
+    def handle(self, *args, **options):
+        test_ids = options['tests'] or live_test_ids()
+        drifted = sum(len(reconcile(test_id)) for test_id in test_ids)
+        self.stdout.write(self.style.SUCCESS(f"{len(test_ids)} ta test tekshirildi, {drifted} ta urinish tuzatildi."))
@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import Question, Test
+from main.regrade import regrade
+
+
+class Command(BaseCommand):
+    help = "Javob kaliti tuzatilgandan keyin test yoki savol bo'yicha javoblarni qayta baholaydi (--dry-run: faqat hisobot)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, help="Test ID")
+        parser.add_argument('--question', type=int, help="Savol ID (barcha testlar bo'yicha)")
+        parser.add_argument('--dry-run', action='store_true', help="Bazaga yozmasdan farqlar hisobotini chiqarish")
+        parser.add_argument('--reason', default='', help="StudentTestModification uchun sabab")
+        parser.add_argument('--csv', help="Farqlar hisobotini CSV faylga yozish ('-' – stdout)")
+
+    def handle(self, *args, **options):
+        if not options['test'] and not options['question']:
+            raise CommandError("--test yoki --question berilishi kerak")
+        try:
+            test = Test.objects.get(id=options['test']) if options['test'] else None
+            question = Question.objects.get(id=options['question']) if options['question'] else None
+        except (Test.DoesNotExist, Question.DoesNotExist) as exc:
+            raise CommandError(str(exc))
+        report = regrade(test=test, question=question, dry_run=options['dry_run'], reason=options['reason'])
+        if options['csv'] == '-':
+            report.write_csv(sys.stdout)
+        elif options['csv']:
+            with open(options['csv'], 'w', newline='', encoding='utf-8') as fh:
+                report.write_csv(fh)
+        prefix = "[DRY RUN] " if report.dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Tekshirildi: {report.answers_checked}, o'zgardi: {report.answers_changed}, "
+            f"o'tkazib yuborildi: {report.answers_skipped}, natijalar: {len(report.rows)}"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main.submissions import replay_pending
+
+
+class Command(BaseCommand):
+    help = "Jurnaldagi baholanmay qolgan topshiriqlarni (Submission) qayta baholaydi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help="Xatolik bilan tugaganlarni ham qayta baholash")
+
+    def handle(self, *args, **options):
+        graded = replay_pending(include_failed=options['failed'])
+        self.stdout.write(self.style.SUCCESS(f"{graded} ta topshiriq baholandi."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_alter_test_pass_percent_dalolatnoma'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='answer_key_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Javob kaliti versiyasi'),
+        ),
+    ]
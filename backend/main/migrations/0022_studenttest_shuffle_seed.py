@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_test_answer_key_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studenttest',
+            name='shuffle_seed',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Aralashtirish seed'),
+        ),
+    ]
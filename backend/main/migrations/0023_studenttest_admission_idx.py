@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_studenttest_shuffle_seed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studenttest',
+            index=models.Index(fields=['student', 'test', 'completed'], name='studenttest_admission_idx'),
+        ),
+    ]
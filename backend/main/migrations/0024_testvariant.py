@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_studenttest_admission_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Variant raqami')),
+                ('source_version', models.PositiveIntegerField(default=0, verbose_name='Manba versiyasi')),
+                ('question_ids', models.JSONField(default=list, verbose_name='Savollar ID')),
+                ('option_orders', models.JSONField(blank=True, default=dict, verbose_name='Variantlar tartibi')),
+                ('matching_orders', models.JSONField(blank=True, default=dict, verbose_name='Moslashtirish tartibi')),
+                ('tf_orders', models.JSONField(blank=True, default=dict, verbose_name="To'g'ri/Noto'g'ri tartibi")),
+                ('fragments', models.JSONField(blank=True, default=dict, verbose_name="HTML bo'laklar")),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan sana')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='main.test', verbose_name='Test')),
+            ],
+            options={
+                'verbose_name': 'Test varianti',
+                'verbose_name_plural': 'Test variantlari',
+            },
+        ),
+        migrations.AddField(
+            model_name='studenttest',
+            name='variant',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='student_tests', to='main.testvariant', verbose_name='Varaqa varianti'),
+        ),
+        migrations.AddConstraint(
+            model_name='testvariant',
+            constraint=models.UniqueConstraint(fields=('test', 'number'), name='unique_test_variant_number'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_testvariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(default=dict, verbose_name='Yuborilgan javoblar (POST)')),
+                ('question_ids', models.JSONField(default=list, verbose_name='Savollar ID')),
+                ('autosave_mode', models.BooleanField(default=False, verbose_name='Autosave rejimi')),
+                ('status', models.CharField(choices=[('pending', 'Baholanmoqda'), ('graded', 'Baholangan'), ('failed', 'Xatolik')], db_index=True, default='pending', max_length=10, verbose_name='Holat')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Xatolik matni')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yuborilgan vaqt')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='Baholash boshlangan vaqt')),
+                ('graded_at', models.DateTimeField(blank=True, null=True, verbose_name='Baholangan vaqt')),
+                ('student_test', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='submission', to='main.studenttest', verbose_name='Talaba testi')),
+            ],
+            options={
+                'verbose_name': 'Topshiriq jurnali',
+                'verbose_name_plural': 'Topshiriqlar jurnali',
+            },
+        ),
+    ]
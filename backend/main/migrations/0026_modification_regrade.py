@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_submission'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studenttestmodification',
+            name='change_type',
+            field=models.CharField(choices=[('override', 'Override'), ('revert', 'Revert'), ('regrade', 'Regrade')], max_length=20, verbose_name="O'zgarish turi"),
+        ),
+    ]
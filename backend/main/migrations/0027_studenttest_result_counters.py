@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_modification_regrade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studenttest',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Javoblar soni'),
+        ),
+        migrations.AddField(
+            model_name='studenttest',
+            name='correct_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name="To'g'ri javoblar soni"),
+        ),
+        migrations.AddField(
+            model_name='studenttest',
+            name='percent',
+            field=models.FloatField(default=0, editable=False, verbose_name="To'g'ri javoblar foizi"),
+        ),
+    ]
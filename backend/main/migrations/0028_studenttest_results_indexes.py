@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0027_studenttest_result_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studenttest',
+            index=models.Index(fields=['completed', 'test', 'group'], name='studenttest_results_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studenttest',
+            index=models.Index(fields=['test', 'completed', 'percent'], name='studenttest_percent_idx'),
+        ),
+    ]
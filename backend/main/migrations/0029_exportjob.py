@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0028_studenttest_results_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='Eksport turi')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Filtrlar')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Barmoq izi')),
+                ('status', models.CharField(choices=[('pending', 'Navbatda'), ('running', 'Tayyorlanmoqda'), ('done', 'Tayyor'), ('failed', 'Xatolik')], default='pending', max_length=10, verbose_name='Holat')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Bajarilish (%)')),
+                ('file', models.FileField(blank=True, upload_to='exports/', verbose_name='Fayl')),
+                ('filename', models.CharField(blank=True, default='', max_length=255, verbose_name='Fayl nomi')),
+                ('content_type', models.CharField(blank=True, default='', max_length=100, verbose_name='Fayl turi')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Xatolik matni')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan vaqt')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Boshlangan vaqt')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Tugagan vaqt')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name="Kim so'radi")),
+            ],
+            options={
+                'verbose_name': 'Eksport',
+                'verbose_name_plural': 'Eksportlar',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['fingerprint', 'status'], name='exportjob_fingerprint_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0029_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('participants', models.PositiveIntegerField(default=0, verbose_name='Qatnashgan talabalar')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Urinishlar')),
+                ('passed', models.PositiveIntegerField(default=0, verbose_name="O'tgan urinishlar")),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Yiqilgan urinishlar')),
+                ('avg_percent', models.FloatField(default=0, verbose_name="O'rtacha foiz")),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Yangilangan vaqt')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='main.group', verbose_name='Guruh')),
+                ('semester', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='main.semester', verbose_name='Semestr')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='main.subject', verbose_name='Fan')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='main.test', verbose_name='Test')),
+            ],
+            options={
+                'verbose_name': 'Natijalar xulosasi',
+                'verbose_name_plural': 'Natijalar xulosalari',
+                'constraints': [models.UniqueConstraint(fields=('test', 'subject', 'group', 'semester'), name='resultrollup_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0030_resultrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamQueueEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('waiting', 'Navbatda'), ('entering', 'Kirmoqda')], max_length=10, verbose_name='Holat')),
+                ('host', models.CharField(blank=True, default='', max_length=255, verbose_name='Server')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan vaqt')),
+                ('heartbeat', models.DateTimeField(default=django.utils.timezone.now, verbose_name="Oxirgi so'rov vaqti")),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_entries', to='main.test', verbose_name='Test')),
+            ],
+            options={
+                'verbose_name': 'Imtihon navbati',
+                'verbose_name_plural': 'Imtihon navbati',
+                'indexes': [models.Index(fields=['test', 'status', 'heartbeat'], name='examqueue_test_idx'), models.Index(fields=['status', 'host', 'heartbeat'], name='examqueue_host_idx')],
+            },
+        ),
+    ]
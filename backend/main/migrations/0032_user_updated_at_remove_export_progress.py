@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0031_examqueueentry'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='exportjob',
+            name='progress',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Yangilangan sana'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+from django.db.models import Avg, Case, Count, Exists, F, IntegerField, OuterRef, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def backfill_rollups(apps, schema_editor):
+    # Mavjud urinishlar uchun xulosa jadvalini to'ldirish (0030 da jadval bo'sh yaratilgan).
+    # Tarixiy modellar bilan yozilgan – main.rollups keyingi model o'zgarishlariga bog'liq bo'lmasin;
+    # kalit va o'tish sharti main/rollups.py va main/results_query.py dagi bilan bir xil.
+    StudentTest = apps.get_model('main', 'StudentTest')
+    Test = apps.get_model('main', 'Test')
+    ResultRollup = apps.get_model('main', 'ResultRollup')
+    completed = StudentTest.objects.filter(completed=True)
+    if not completed.exists():
+        return
+    final_score = Coalesce('overridden_score', 'total_score')
+    in_test_groups = Exists(Test.groups.through.objects.filter(
+        test_id=OuterRef('test_id'), group_id=OuterRef('student__group_id')))
+    rows = (
+        completed
+        .annotate(final_score_value=final_score, final_percent=final_score * 100.0 / F('test__total_score'))
+        .annotate(
+            passed_flag=Case(
+                When(pass_override=True, then=Value(1)),
+                When(test__total_score__gt=0, final_percent__gte=F('test__pass_percent'), then=Value(1)),
+                When(test__total_score=0, final_score_value__gt=0, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            rollup_subject=Coalesce('subject_id', 'test__subject_id'),
+            rollup_group=Coalesce('group_id', Case(When(in_test_groups, then=F('student__group_id')),
+                                                   output_field=IntegerField())),
+            rollup_semester=Coalesce('semester_id', 'test__semester_id'),
+        )
+        .filter(rollup_subject__isnull=False, rollup_group__isnull=False)
+        .values('test_id', 'rollup_subject', 'rollup_group', 'rollup_semester')
+        .annotate(
+            n_attempts=Count('id'),
+            n_participants=Count('student_id', distinct=True),
+            n_passed=Sum('passed_flag'),
+            mean_percent=Avg('percent'),
+        )
+        .order_by()
+    )
+    ResultRollup.objects.all().delete()
+    ResultRollup.objects.bulk_create([
+        ResultRollup(
+            test_id=row['test_id'], subject_id=row['rollup_subject'], group_id=row['rollup_group'],
+            semester_id=row['rollup_semester'], participants=row['n_participants'], attempts=row['n_attempts'],
+            passed=row['n_passed'] or 0, failed=row['n_attempts'] - (row['n_passed'] or 0),
+            avg_percent=row['mean_percent'] or 0,
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0032_user_updated_at_remove_export_progress'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:45
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_last_activity(apps, schema_editor):
+    StudentTest = apps.get_model('main', 'StudentTest')
+    StudentTest.objects.filter(last_activity__isnull=True).update(last_activity=Coalesce('end_time', 'start_time'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0033_backfill_result_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studenttest',
+            name='last_activity',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Oxirgi faollik'),
+        ),
+        migrations.AddIndex(
+            model_name='studenttest',
+            index=models.Index(fields=['test', 'last_activity'], name='studenttest_activity_idx'),
+        ),
+        migrations.RunPython(backfill_last_activity, migrations.RunPython.noop),
+    ]
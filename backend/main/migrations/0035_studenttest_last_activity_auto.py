@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0034_studenttest_last_activity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studenttest',
+            name='last_activity',
+            field=models.DateTimeField(auto_now=True, null=True, verbose_name='Oxirgi faollik'),
+        ),
+    ]
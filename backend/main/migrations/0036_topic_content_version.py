@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0035_studenttest_last_activity_auto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Savollar versiyasi'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0036_topic_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Baholash urinishlari'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0037_submission_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Bajarilish (%)'),
+        ),
+    ]
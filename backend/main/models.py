@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 import random
 
 
@@ -23,6 +24,8 @@ class User(AbstractUser):
     kafedra = models.ForeignKey('Kafedra', on_delete=models.SET_NULL, null=True, blank=True, related_name='tutors', verbose_name='Kafedra')
     # Employee uchun bo'lim
     bulim = models.ForeignKey('Bulim', on_delete=models.SET_NULL, null=True, blank=True, related_name='employees', verbose_name="Bo'lim")
+    # Eksport barmoq izi uchun: foydalanuvchilar ro'yxati o'zgarganini arzon aniqlash (Max + Count)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Yangilangan sana')
 
     # groups va user_permissions uchun related_name qo‘shish
     groups = models.ManyToManyField(
@@ -272,6 +275,8 @@ class Test(models.Model):
     start_time = models.DateTimeField(auto_now_add=True, verbose_name="Boshlanish vaqti", blank=True, null=True)
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Yangilangan sana")
     updated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='updated_tests', verbose_name='Kim yangiladi')
+    # Javob kaliti keshi versiyasi (TestQuestion/AnswerOption o'zgarganda signal orqali oshiriladi)
+    answer_key_version = models.PositiveIntegerField(default=0, editable=False, verbose_name='Javob kaliti versiyasi')
 
     class Meta:
         verbose_name = "Test"
@@ -310,6 +315,32 @@ class TestQuestion(models.Model):
 
 
 
+class TestVariant(models.Model):
+    """Test biriktirilganda oldindan tayyorlab qo'yiladigan varaqa varianti (main/variants.py)."""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='variants', verbose_name='Test')
+    number = models.PositiveIntegerField(verbose_name='Variant raqami')
+    # Variant qaysi javob kaliti versiyasi bo'yicha tuzilgan (savollar o'zgarsa eskiradi)
+    source_version = models.PositiveIntegerField(default=0, verbose_name='Manba versiyasi')
+    question_ids = models.JSONField(default=list, verbose_name='Savollar ID')
+    # {question_id: [option_id, ...]} – single/multiple choice va matching (right) tartiblari
+    option_orders = models.JSONField(default=dict, blank=True, verbose_name='Variantlar tartibi')
+    matching_orders = models.JSONField(default=dict, blank=True, verbose_name='Moslashtirish tartibi')
+    tf_orders = models.JSONField(default=dict, blank=True, verbose_name="To'g'ri/Noto'g'ri tartibi")
+    # {question_id: {'text', 'image', 'options': {option_id: html}}} – oldindan render qilingan bo'laklar
+    fragments = models.JSONField(default=dict, blank=True, verbose_name="HTML bo'laklar")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan sana')
+
+    class Meta:
+        verbose_name = 'Test varianti'
+        verbose_name_plural = 'Test variantlari'
+        constraints = [
+            models.UniqueConstraint(fields=['test', 'number'], name='unique_test_variant_number')
+        ]
+
+    def __str__(self):
+        return f"{self.test} – variant {self.number}"
+
+
 # 10
 class StudentTest(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='student_tests', verbose_name="Talaba")
@@ -322,6 +353,15 @@ class StudentTest(models.Model):
     total_score = models.FloatField(default=0, verbose_name="Umumiy ball")
     completed = models.BooleanField(default=False, verbose_name="Tugatilganmi")
     question_ids = models.JSONField(default=list, blank=True, verbose_name="Tanlangan savollar ID")
+    # Varaqa seed i: savollar tanlovi va variantlar tartibi shundan deterministik hisoblanadi (main/paper.py)
+    shuffle_seed = models.BigIntegerField(null=True, blank=True, editable=False, verbose_name="Aralashtirish seed")
+    variant = models.ForeignKey('TestVariant', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='student_tests', verbose_name='Varaqa varianti')
+    # Natija hisoblagichlari (hisobotlar uchun): baholash, qayta baholash va javob tuzatishda yangilanadi (scoring.refresh_result_counters)
+    answered_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Javoblar soni')
+    correct_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="To'g'ri javoblar soni")
+    percent = models.FloatField(default=0, editable=False, verbose_name="To'g'ri javoblar foizi")
+    # Live monitor (main/live_monitor.py): har save() da (boshlash, topshirish, baholash) va autosave'da yangilanadi
+    last_activity = models.DateTimeField(auto_now=True, null=True, verbose_name="Oxirgi faollik")
     can_retake = models.BooleanField(default=False, verbose_name="Qayta topshirishga ruxsat (controller)")
     # --- Override bilan bog'liq maydonlar (faqat superuser ko'radi) ---
     overridden_score = models.FloatField(null=True, blank=True, verbose_name="Qo'lda o'zgartirilgan ball")
@@ -340,6 +380,15 @@ class StudentTest(models.Model):
                 name='unique_student_group_subject_semester_once'
             )
         ]
+        indexes = [
+            # Kirish tekshiruvi (main/admission.py): talabaning shu test bo'yicha urinishlari
+            models.Index(fields=['student', 'test', 'completed'], name='studenttest_admission_idx'),
+            # Natijalar explorer (main/views_results_explorer.py): test/guruh tugunlari va foiz bo'yicha saralash
+            models.Index(fields=['completed', 'test', 'group'], name='studenttest_results_idx'),
+            models.Index(fields=['test', 'completed', 'percent'], name='studenttest_percent_idx'),
+            # Live monitor o'zgarishlar oqimi: test bo'yicha last_activity > kursor
+            models.Index(fields=['test', 'last_activity'], name='studenttest_activity_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.subject.name if self.subject else ''} ({self.semester})"
@@ -348,6 +397,10 @@ class StudentTest(models.Model):
     def final_score(self):
         return self.overridden_score if self.overridden_score is not None else self.total_score
 
+    @property
+    def incorrect_count(self):
+        return self.answered_count - self.correct_count
+
     @property
     def is_overridden(self):
         return (self.overridden_score is not None) or self.pass_override
@@ -368,6 +421,34 @@ class StudentTest(models.Model):
 
 
 
+class Submission(models.Model):
+    """Imtihon topshirig'i jurnali: POST avval shu yerga yoziladi, baholash esa fon oqimida (main/submissions.py)."""
+    STATUS_CHOICES = (
+        ('pending', 'Baholanmoqda'),
+        ('graded', 'Baholangan'),
+        ('failed', 'Xatolik'),
+    )
+    student_test = models.OneToOneField(StudentTest, on_delete=models.CASCADE, related_name='submission', verbose_name='Talaba testi')
+    payload = models.JSONField(default=dict, verbose_name="Yuborilgan javoblar (POST)")
+    question_ids = models.JSONField(default=list, verbose_name='Savollar ID')
+    autosave_mode = models.BooleanField(default=False, verbose_name='Autosave rejimi')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name='Holat')
+    error = models.TextField(blank=True, default='', verbose_name='Xatolik matni')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Yuborilgan vaqt')
+    # Bir nechta worker bir yozuvni bir vaqtda baholamasligi uchun (muddati o'tsa qayta olinadi)
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name='Baholash boshlangan vaqt')
+    # Baholash necha marta boshlangan (vaqtinchalik baza xatolarida qayta urinishlar chegarasi)
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Baholash urinishlari')
+    graded_at = models.DateTimeField(null=True, blank=True, verbose_name='Baholangan vaqt')
+
+    class Meta:
+        verbose_name = 'Topshiriq jurnali'
+        verbose_name_plural = 'Topshiriqlar jurnali'
+
+    def __str__(self):
+        return f"Submission #{self.id} ({self.status})"
+
+
 # 11
 class StudentAnswer(models.Model):
     student_test = models.ForeignKey(StudentTest, on_delete=models.CASCADE, related_name='answers', verbose_name="Talaba testi")
@@ -416,6 +497,7 @@ class StudentTestModification(models.Model):
     change_type = models.CharField(max_length=20, choices=(
         ('override', 'Override'),
         ('revert', 'Revert'),
+        ('regrade', 'Regrade'),
     ), verbose_name="O'zgarish turi")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Yaratilgan vaqt")
 
@@ -468,6 +550,99 @@ class Dalolatnoma(models.Model):
         return f"Dalolatnoma: {fio} / {self.test.subject.name if self.test and self.test.subject else 'Test'} / {self.created_at:%Y-%m-%d %H:%M}"
 
 
+
+# --- Eksport navbati: og'ir PDF/Excel/Word fayllar fon oqimida tayyorlanadi (main/export_jobs.py) ---
+class ExportJob(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Navbatda'),
+        ('running', 'Tayyorlanmoqda'),
+        ('done', 'Tayyor'),
+        ('failed', 'Xatolik'),
+    )
+    kind = models.CharField(max_length=50, verbose_name='Eksport turi')
+    params = models.JSONField(default=dict, blank=True, verbose_name='Filtrlar')
+    # Tur + filtrlar + ma'lumotlar holati xeshi: bir xil so'rov o'zgarmagan ma'lumotda tayyor faylni qayta ishlatadi
+    fingerprint = models.CharField(max_length=64, verbose_name='Barmoq izi')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='Holat')
+    # Yozuvchilarning qator sikllaridan yangilanadi (main.export_jobs.track_progress)
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='Bajarilish (%)')
+    file = models.FileField(upload_to='exports/', blank=True, verbose_name='Fayl')
+    filename = models.CharField(max_length=255, blank=True, default='', verbose_name='Fayl nomi')
+    content_type = models.CharField(max_length=100, blank=True, default='', verbose_name='Fayl turi')
+    error = models.TextField(blank=True, default='', verbose_name='Xatolik matni')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs', verbose_name="Kim so'radi")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan vaqt')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Boshlangan vaqt')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Tugagan vaqt')
+
+    class Meta:
+        verbose_name = 'Eksport'
+        verbose_name_plural = 'Eksportlar'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['fingerprint', 'status'], name='exportjob_fingerprint_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class ResultRollup(models.Model):
+    """(test, fan, guruh, semestr) bo'yicha yakunlangan urinishlar xulosasi.
+
+    main.rollups tomonidan topshirish, override, qayta baholash va o'chirish hodisalarida
+    yangilanadi; to'liq qayta qurish – rebuild_rollups buyrug'i.
+    """
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='rollups', verbose_name='Test')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='rollups', verbose_name='Fan')
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='rollups', verbose_name='Guruh')
+    semester = models.ForeignKey(Semester, on_delete=models.CASCADE, null=True, blank=True, related_name='rollups', verbose_name='Semestr')
+    participants = models.PositiveIntegerField(default=0, verbose_name='Qatnashgan talabalar')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Urinishlar')
+    passed = models.PositiveIntegerField(default=0, verbose_name="O'tgan urinishlar")
+    failed = models.PositiveIntegerField(default=0, verbose_name='Yiqilgan urinishlar')
+    avg_percent = models.FloatField(default=0, verbose_name="O'rtacha foiz")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Yangilangan vaqt')
+
+    class Meta:
+        verbose_name = 'Natijalar xulosasi'
+        verbose_name_plural = 'Natijalar xulosalari'
+        constraints = [
+            models.UniqueConstraint(fields=['test', 'subject', 'group', 'semester'], name='resultrollup_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} / {self.group} / test #{self.test_id}"
+
+
+class ExamQueueEntry(models.Model):
+    """Imtihon boshlanishidagi navbat (main/exam_queue.py).
+
+    'waiting' – navbat raqami (tartib id bo'yicha), kutish sahifasi heartbeat ni yangilab turadi;
+    'entering' – varaqasi yaratilayotgan so'rov (byudjetdagi slot), so'rov oxirida o'chiriladi.
+    Barcha workerlar bitta jadvalga qaraydi.
+    """
+    STATUS_CHOICES = (
+        ('waiting', 'Navbatda'),
+        ('entering', 'Kirmoqda'),
+    )
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='queue_entries', verbose_name='Test')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name='Holat')
+    host = models.CharField(max_length=255, blank=True, default='', verbose_name='Server')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan vaqt')
+    heartbeat = models.DateTimeField(default=timezone.now, verbose_name="Oxirgi so'rov vaqti")
+
+    class Meta:
+        verbose_name = 'Imtihon navbati'
+        verbose_name_plural = 'Imtihon navbati'
+        indexes = [
+            models.Index(fields=['test', 'status', 'heartbeat'], name='examqueue_test_idx'),
+            models.Index(fields=['status', 'host', 'heartbeat'], name='examqueue_host_idx'),
+        ]
+
+    def __str__(self):
+        return f"test #{self.test_id} / {self.status} #{self.id}"
+
 # =============================
 #  TOPIC-BASED (Teacher-only) MINI TEST SYSTEM (isolated)
 #  (No semester, only group + subject; questions reused per topic)
@@ -483,6 +658,8 @@ class Topic(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True, verbose_name='Faol')
+    # Savollar to'plami va javob kaliti keshi versiyasi (TopicQuestion/TopicAnswerOption o'zgarganda signal orqali oshiriladi)
+    content_version = models.PositiveIntegerField(default=0, editable=False, verbose_name='Savollar versiyasi')
 
     class Meta:
         verbose_name = 'Mavzu'
@@ -0,0 +1,55 @@
+"""Talaba varaqasini (savollar tanlovi va variantlar tartibi) seed orqali hisoblash.
+
+Seed StudentTest id va test uchun maxfiy kalit (SECRET_KEY dan olingan HMAC) dan
+hosil qilinadi va StudentTest.shuffle_seed ga bir marta yoziladi. Bir xil seed
+bilan istalgan worker sessiyaga murojaat qilmasdan aynan bir xil varaqani qayta
+hisoblaydi.
+"""
+import random
+
+from django.utils.crypto import salted_hmac
+
+
+def paper_seed(test_id, student_test_id):
+    digest = salted_hmac('main.paper.seed', f"{test_id}:{student_test_id}").hexdigest()
+    return int(digest[:15], 16)
+
+
+def _rng(seed, *parts):
+    return random.Random(':'.join(str(p) for p in (seed,) + parts))
+
+
+def select_question_ids(seed, pool_ids, count):
+    pool = sorted(pool_ids)
+    return _rng(seed, 'questions').sample(pool, min(count, len(pool)))
+
+
+def shuffled(seed, question_id, items, salt='options'):
+    """items ni (savolga xos) barqaror tartibda aralashtirilgan yangi ro'yxat sifatida qaytaradi."""
+    items = list(items)
+    _rng(seed, salt, question_id).shuffle(items)
+    return items
+
+
+def tf_order(seed, question_id):
+    return shuffled(seed, question_id, ['true', 'false'], salt='tf')
+
+
+def ensure_paper(stest, pool_ids, count):
+    """StudentTest uchun seed va savollar ro'yxatini kerak bo'lsa hosil qilib, bir marta saqlaydi.
+
+    Saqlangan savollar test havzasida bo'lmasa yoki soni mos kelmasa (test tahrirlangan) qayta tanlanadi.
+    """
+    pool = set(pool_ids)
+    expected = min(count, len(pool))
+    fields = []
+    if stest.shuffle_seed is None:
+        stest.shuffle_seed = paper_seed(stest.test_id, stest.id)
+        fields.append('shuffle_seed')
+    ids = stest.question_ids or []
+    if len(ids) != expected or not pool.issuperset(ids):
+        stest.question_ids = select_question_ids(stest.shuffle_seed, pool, count)
+        fields.append('question_ids')
+    if fields:
+        stest.save(update_fields=fields)
+    return stest.question_ids
@@ -0,0 +1,114 @@
+"""PDF hisobotlarning o'zgarmas qismlari: paragraf uslublari, shrift va QR ustidagi "RTTM" belgisi.
+
+Bular har so'rovda qayta qurilmaydi – jarayon (process) ichida bir marta tayyorlanib keshda
+saqlanadi. QR kodning o'zi har hujjatda boshqa (tasdiq havolasi), shuning uchun faqat belgi
+qatlamlari (gradient, niqob, soya) rasm o'lchami bo'yicha keshlanadi.
+"""
+import io
+from functools import lru_cache
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+from qrcode.constants import ERROR_CORRECT_H
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+
+
+BADGE_TEXT = "RTTM"
+QR_MODULE_COLOR = (19, 46, 120)      # chuqur ko'k
+QR_BACKGROUND = (255, 255, 255)
+BADGE_START = (37, 99, 235)          # gradient: ko'k -> binafsha
+BADGE_END = (147, 51, 234)
+
+
+@lru_cache(maxsize=1)
+def report_styles():
+    """Natijalar hisobotining paragraf uslublari (nom -> ParagraphStyle)."""
+    styles = getSampleStyleSheet()
+    left = ParagraphStyle('left', parent=styles['Normal'], alignment=TA_LEFT, fontSize=11)
+    return {
+        'title': ParagraphStyle('title', parent=styles['Title'], alignment=TA_CENTER, fontSize=16, spaceAfter=8),
+        'subtitle': ParagraphStyle('subtitle', parent=styles['Normal'], alignment=TA_CENTER, fontSize=13, spaceAfter=8),
+        'normal': ParagraphStyle('normal', parent=styles['Normal'], fontSize=11, spaceAfter=4),
+        'right': ParagraphStyle('right', parent=styles['Normal'], alignment=TA_RIGHT, fontSize=11),
+        'left': left,
+        'wrap': ParagraphStyle('tdwrap', parent=styles['Normal'], alignment=TA_LEFT, fontSize=10, leading=11),
+        'header': ParagraphStyle('header', parent=styles['Normal'], alignment=TA_CENTER, fontSize=14, spaceAfter=0,
+                                 leading=16),
+        'subject': ParagraphStyle('subj', parent=styles['Normal'], fontSize=11, alignment=TA_LEFT, spaceAfter=2),
+        'date': ParagraphStyle('dateHead', parent=styles['Normal'], fontSize=9, alignment=TA_LEFT),
+        'th': ParagraphStyle('th', alignment=TA_CENTER, fontSize=10),
+        'td': ParagraphStyle('td', alignment=TA_LEFT, fontSize=10),
+        'sig_mid': ParagraphStyle('sigmid', parent=left, alignment=TA_CENTER, fontSize=10, spaceAfter=0),
+        'sig_left': ParagraphStyle('sigleft', parent=left, fontSize=10, spaceAfter=0),
+        'sig_name': ParagraphStyle('signame', parent=left, fontSize=10, spaceAfter=0),
+    }
+
+
+@lru_cache(maxsize=8)
+def badge_font(size):
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=8)
+def _badge_layers(width, height):
+    """QR rasm o'lchami bo'yicha belgi qatlamlari: (shrift, matn joyi, gradient, niqob, soya, gradient joyi)."""
+    font = badge_font(int(width * 0.18))
+    tb = ImageDraw.Draw(Image.new('RGBA', (1, 1))).textbbox((0, 0), BADGE_TEXT, font=font)
+    tw, th = tb[2] - tb[0], tb[3] - tb[1]
+    pad_x, pad_y = 8, 6
+    box_x0 = (width - tw) // 2 - pad_x
+    box_y0 = (height - th) // 2 - pad_y
+    grad_w, grad_h = tw + pad_x * 2, th + pad_y * 2
+    # Gradient bir marta quriladi: bitta qator hisoblanib, balandlik bo'yicha cho'ziladi
+    row = Image.new('RGBA', (grad_w, 1))
+    for x in range(grad_w):
+        t = x / max(1, grad_w - 1)
+        row.putpixel((x, 0), tuple(int(s + (e - s) * t) for s, e in zip(BADGE_START, BADGE_END)) + (235,))
+    gradient = row.resize((grad_w, grad_h), Image.NEAREST)
+    mask = Image.new('L', (grad_w, grad_h), 0)
+    mask_draw = ImageDraw.Draw(mask)
+    try:
+        mask_draw.rounded_rectangle([0, 0, grad_w, grad_h], radius=10, fill=255)
+    except Exception:
+        mask_draw.rectangle([0, 0, grad_w, grad_h], fill=255)
+    shadow = Image.new('RGBA', (grad_w + 6, grad_h + 6), (0, 0, 0, 0))
+    ImageDraw.Draw(shadow).ellipse([3, 3, grad_w + 3, grad_h + 3], fill=(0, 0, 0, 60))
+    text_pos = ((width - tw) // 2, (height - th) // 2)
+    return font, text_pos, gradient, mask, shadow, (box_x0, box_y0)
+
+
+def apply_badge(img):
+    """QR rasm markaziga "RTTM" belgisini qo'yadi (qatlamlar keshdan olinadi)."""
+    font, (text_x, text_y), gradient, mask, shadow, (box_x0, box_y0) = _badge_layers(*img.size)
+    img.alpha_composite(shadow, (box_x0 - 3, box_y0 - 3))
+    img.paste(gradient, (box_x0, box_y0), mask)
+    draw = ImageDraw.Draw(img)
+    draw.text((text_x + 1, text_y + 1), BADGE_TEXT, font=font, fill=(0, 0, 0, 90))
+    draw.text((text_x, text_y), BADGE_TEXT, font=font, fill=(255, 255, 255, 240))
+    return img
+
+
+def verification_qr_png(url):
+    """Tasdiq havolasi uchun belgili QR (PNG baytlari). Yuqori xatolik tuzatish (H) belgi uchun joy qoldiradi."""
+    qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECT_H, box_size=4, border=2)
+    qr.add_data(url)
+    qr.make(fit=True)
+    img = apply_badge(qr.make_image(fill_color=QR_MODULE_COLOR, back_color=QR_BACKGROUND).convert('RGBA'))
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def qr_footer(qr_png, padding=3 * mm, size=25 * mm):
+    """doc.build(onFirstPage=..., onLaterPages=...) uchun: QR har sahifaning o'ng pastki burchagida."""
+    def footer(c, doc):
+        x = doc.pagesize[0] - doc.rightMargin - size
+        y = max(padding, doc.bottomMargin - size - padding)
+        c.drawImage(ImageReader(io.BytesIO(qr_png)), x, y, size, size, preserveAspectRatio=True, mask='auto')
+    return footer
@@ -0,0 +1,115 @@
+"""PDF hisobotlardagi QR tasdiq tokeni.
+
+QR havolasi endi ma'lumotning o'zini olib yuradi: token = base64(JSON [fan, qatorlar soni,
+vaqt]) + "." + HMAC imzosi (SECRET_KEY dan salted_hmac, 16 bayt). Tekshirish uchun bazaga
+murojaat kerak emas – imzo to'g'ri bo'lsa ma'lumot haqiqiy, javob esa o'zgarmas bo'lgani uchun
+keshlanadi (verify_qr). Oldin chop etilgan 32 belgili hash'lar PdfVerification jadvalidan
+tekshiriladi (natija keshda saqlanadi).
+
+PdfVerification endi faqat ixtiyoriy audit jurnali: bitta PDF (yoki batch ZIP) yozuvlari
+tranzaksiya commit bo'lgach fon oqimida bitta bulk_create bilan yoziladi – so'rov kutmaydi,
+yozuvlar jarayon xotirasida qolib ketmaydi.
+"""
+import base64
+import hashlib
+import json
+import re
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .background import run_in_background
+from .models import PdfVerification
+
+
+TOKEN_SALT = 'main.pdf_verification'
+SIGNATURE_BYTES = 16
+LEGACY_HASH_RE = re.compile(r'^[0-9a-f]{32}$')
+LEGACY_CACHE_SECONDS = 3600
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(body):
+    return _b64encode(salted_hmac(TOKEN_SALT, body, algorithm='sha256').digest()[:SIGNATURE_BYTES])
+
+
+def payload_text(subject_name, record_count, issued_at):
+    """Audit jadvali va tasdiq sahifasidagi asl ko'rinish (eski PDF'lar bilan bir xil)."""
+    return f"SUBJECT={subject_name};COUNT={record_count};TS={issued_at}"
+
+
+def issue_token(subject_name, record_count, issued_at=None):
+    issued_at = int(time.time()) if issued_at is None else int(issued_at)
+    body = _b64encode(json.dumps([subject_name, record_count, issued_at], ensure_ascii=False,
+                                 separators=(',', ':')).encode('utf-8'))
+    return f"{body}.{_signature(body)}"
+
+
+def read_token(token):
+    """Imzo to'g'ri bo'lsa {'subject', 'count', 'issued_at'}, aks holda None. Bazaga murojaat qilmaydi."""
+    body, _, signature = (token or '').partition('.')
+    if not body or not signature or not constant_time_compare(signature, _signature(body)):
+        return None
+    try:
+        subject_name, record_count, issued_at = json.loads(_b64decode(body).decode('utf-8'))
+    except (ValueError, TypeError):
+        return None
+    return {
+        'subject': subject_name,
+        'count': record_count,
+        'created_at': datetime.fromtimestamp(issued_at, tz=dt_timezone.utc),
+        'payload': payload_text(subject_name, record_count, issued_at),
+    }
+
+
+def read_legacy(hash_code):
+    """Eski (token'gacha chop etilgan) QR hash'i – PdfVerification dan, natija keshlanadi."""
+    if not LEGACY_HASH_RE.match(hash_code or ''):
+        return None
+    key = f'pdfverify:legacy:{hash_code}'
+    data = cache.get(key)
+    if data is None:
+        obj = PdfVerification.objects.filter(hash_code=hash_code).first()
+        data = {'subject': obj.subject_name, 'count': obj.record_count, 'created_at': obj.created_at,
+                'payload': obj.payload} if obj else {}
+        cache.set(key, data, LEGACY_CACHE_SECONDS)
+    return data or None
+
+
+def verify(code):
+    return read_token(code) or read_legacy(code)
+
+
+def audit_entry(token, user_id=None):
+    """Audit yozuvi uchun lug'at (jarayonlar orasida uzatish mumkin)."""
+    data = read_token(token)
+    return {
+        'hash_code': hashlib.sha256(token.encode()).hexdigest()[:32],
+        'subject_name': data['subject'],
+        'record_count': data['count'],
+        'payload': data['payload'],
+        'generated_by_id': user_id,
+    }
+
+
+def write_audit(entries):
+    """Audit yozuvlarini bitta so'rov bilan yozadi; yozilganlar sonini qaytaradi."""
+    PdfVerification.objects.bulk_create([PdfVerification(**entry) for entry in entries], ignore_conflicts=True)
+    return len(entries)
+
+
+def record_issued(entries):
+    """Audit yozuvlarini commitdan keyin fon oqimida yozadi (main/background.py)."""
+    if not entries or not getattr(settings, 'PDF_VERIFICATION_AUDIT', True):
+        return
+    run_in_background(write_audit, list(entries))
@@ -0,0 +1,56 @@
+"""Imtihon sahifasi uchun oldindan render qilingan savol bo'laklari (fragment).
+
+Savol matni (LaTeX o'ralgan), rasm tegi va variantlar HTML i bir marta render
+qilinadi va (savol id, updated_at) kaliti bilan keshlanadi. Har bir talaba sahifasi
+faqat shu bo'laklarni o'z aralashtirilgan tartibida yig'adi.
+AnswerOption o'zgarganda signal Question.updated_at ni yangilaydi, shuning uchun
+kesh kaliti ham o'zgaradi.
+"""
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+
+CACHE_TIMEOUT = 60 * 60 * 12
+
+
+def _cache_key(question):
+    updated = int(question.updated_at.timestamp() * 1000000) if question.updated_at else 0
+    return f"qfrag:{question.id}:{updated}"
+
+
+def render_question_fragment(question):
+    """Bitta savol bo'laklarini render qiladi (question.answer_options oldindan yuklangan bo'lishi kerak)."""
+    return {
+        'text': render_to_string('test_api/partials/_question_text.html', {'question': question}).strip(),
+        'image': render_to_string('test_api/partials/_question_image.html', {'question': question}),
+        'options': {
+            opt.id: render_to_string('test_api/partials/_choice_option.html', {'option': opt})
+            for opt in question.answer_options.all()
+            if question.question_type in ('single_choice', 'multiple_choice')
+        },
+    }
+
+
+def attach_question_fragments(questions):
+    """Savollar va ularning variantlariga keshdagi HTML bo'laklarini biriktiradi.
+
+    question.fragment = {'text', 'image', 'options'}, option.fragment_html = variant HTML i.
+    Keshda yo'q bo'laklar render qilinib, barchasi bitta set_many bilan yoziladi.
+    """
+    keys = {q.id: _cache_key(q) for q in questions}
+    cached = cache.get_many(list(keys.values()))
+    missing = {}
+    for q in questions:
+        fragment = cached.get(keys[q.id])
+        if fragment is None:
+            fragment = render_question_fragment(q)
+            missing[keys[q.id]] = fragment
+        q.fragment = fragment
+        for opt in q.answer_options.all():
+            opt.fragment_html = fragment['options'].get(opt.id)
+            if opt.fragment_html is None and q.question_type in ('single_choice', 'multiple_choice'):
+                # Kesh yaratilgandan keyin qo'shilgan variant (updated_at yangilanmagan holat)
+                opt.fragment_html = render_to_string('test_api/partials/_choice_option.html', {'option': opt})
+    if missing:
+        cache.set_many(missing, CACHE_TIMEOUT)
+    return questions
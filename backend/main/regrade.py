@@ -0,0 +1,142 @@
+"""Javob kaliti tuzatilgandan keyin mavjud javoblarni ommaviy qayta baholash.
+
+Test yoki bitta savol (barcha testlarda) bo'yicha yakunlangan urinishlardagi
+StudentAnswer qatorlari id bo'yicha bo'laklab (chunk) o'qiladi, joriy javob kaliti
+bo'yicha xotirada qayta baholanadi va faqat o'zgarganlari bulk_update qilinadi.
+StudentTest.total_score farq (delta) bo'yicha yangilanadi va har bir o'zgargan
+natija uchun StudentTestModification (change_type='regrade') yoziladi.
+dry_run=True bo'lsa bazaga hech narsa yozilmaydi – faqat hisobot qaytadi.
+"""
+import csv
+from collections import defaultdict
+
+from django.db import transaction
+
+from .answer_key import AnswerKeyRegistry
+from .models import Log, StudentAnswer, StudentTest, StudentTestModification, Test
+from .rollups import refresh_rollups
+from .scoring import grade_answer, post_from_answer, refresh_result_counters
+
+
+CHUNK_SIZE = 2000
+
+
+class RegradeReport:
+    """Qayta baholash natijasi: umumiy hisoblagichlar va har bir o'zgargan urinish bo'yicha farq."""
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.answers_checked = 0
+        self.answers_changed = 0
+        # Matching javoblari va testdan olib tashlangan savollar qayta baholanmaydi
+        self.answers_skipped = 0
+        self.rows = []
+
+    def as_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'answers_checked': self.answers_checked,
+            'answers_changed': self.answers_changed,
+            'answers_skipped': self.answers_skipped,
+            'student_tests_changed': len(self.rows),
+            'rows': self.rows,
+        }
+
+    def write_csv(self, fileobj):
+        writer = csv.writer(fileobj)
+        writer.writerow(['StudentTest ID', 'Talaba', 'Test ID', "O'zgargan javoblar", 'Oldingi ball', 'Yangi ball'])
+        for row in self.rows:
+            writer.writerow([row['student_test_id'], row['student'], row['test_id'], row['changed_answers'],
+                             row['previous_score'], row['new_score']])
+
+
+def _selected_options(answer_ids):
+    Through = StudentAnswer.answer_option.through
+    selected = defaultdict(list)
+    pairs = (Through.objects.filter(studentanswer_id__in=answer_ids)
+             .order_by('answeroption_id').values_list('studentanswer_id', 'answeroption_id'))
+    for answer_id, option_id in pairs:
+        selected[answer_id].append(option_id)
+    return selected
+
+
+def regrade(test=None, question=None, dry_run=False, changed_by=None, reason='', chunk_size=CHUNK_SIZE):
+    """Test yoki savol bo'yicha javoblarni qayta baholaydi va RegradeReport qaytaradi."""
+    if test is None and question is None:
+        raise ValueError("test yoki question berilishi kerak")
+    report = RegradeReport(dry_run)
+    qs = StudentAnswer.objects.filter(student_test__completed=True)
+    if test is not None:
+        qs = qs.filter(student_test__test=test)
+    if question is not None:
+        qs = qs.filter(question=question)
+    qs = qs.order_by('id').values_list(
+        'id', 'student_test_id', 'student_test__test_id', 'question_id', 'text_answer', 'is_correct', 'score',
+    )
+
+    registry = AnswerKeyRegistry()
+    tests = {}
+    deltas = defaultdict(float)
+    changed = defaultdict(int)
+    with transaction.atomic():
+        last_id = 0
+        while True:
+            chunk = list(qs.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            selected = _selected_options([row[0] for row in chunk])
+            missing = {row[2] for row in chunk} - tests.keys()
+            if missing:
+                tests.update(Test.objects.in_bulk(missing))
+            updates = []
+            for answer_id, stest_id, test_id, qid, text_answer, old_correct, old_score in chunk:
+                report.answers_checked += 1
+                key = registry.for_test(tests[test_id]).questions.get(qid)
+                post = post_from_answer(qid, key['type'], selected[answer_id], text_answer) if key else None
+                if post is None:
+                    report.answers_skipped += 1
+                    continue
+                _, _, is_correct, score = grade_answer(qid, key, post)
+                if is_correct == old_correct and score == (old_score or 0):
+                    continue
+                updates.append(StudentAnswer(id=answer_id, is_correct=is_correct, score=score))
+                deltas[stest_id] += score - (old_score or 0)
+                changed[stest_id] += 1
+            report.answers_changed += len(updates)
+            if updates and not dry_run:
+                StudentAnswer.objects.bulk_update(updates, ['is_correct', 'score'], batch_size=500)
+
+        stests = StudentTest.objects.filter(id__in=list(changed)).select_related('student').order_by('id')
+        modifications = []
+        for st in stests:
+            previous = st.total_score
+            st.total_score = previous + deltas[st.id]
+            report.rows.append({
+                'student_test_id': st.id,
+                'student': st.student.username,
+                'test_id': st.test_id,
+                'changed_answers': changed[st.id],
+                'previous_score': previous,
+                'new_score': st.total_score,
+            })
+            modifications.append(StudentTestModification(
+                student_test=st,
+                previous_score=previous,
+                new_score=st.total_score,
+                previous_pass_override=st.pass_override,
+                new_pass_override=st.pass_override,
+                reason=reason or "Javob kaliti tuzatildi (qayta baholash)",
+                changed_by=changed_by,
+                change_type='regrade',
+            ))
+        if not dry_run and modifications:
+            changed_tests = [m.student_test for m in modifications]
+            for start in range(0, len(changed_tests), chunk_size):
+                refresh_result_counters(changed_tests[start:start + chunk_size], save=False)
+            StudentTest.objects.bulk_update(changed_tests, ['total_score', 'answered_count', 'correct_count', 'percent'], batch_size=500)
+            refresh_rollups(changed_tests)
+            StudentTestModification.objects.bulk_create(modifications, batch_size=500)
+            target = f"test={test.id}" if test is not None else f"question={question.id}"
+            Log.objects.create(user=changed_by, action=f"REGRADE {target} answers={report.answers_changed} student_tests={len(modifications)}")
+    return report
@@ -0,0 +1,244 @@
+"""Natijalar eksporti uchun yagona quvur (pipeline).
+
+Filtr spetsifikatsiyasi (ResultFilter) -> bitta so'rov rejasi (result_queryset) -> qatorlar
+oqimi (ResultExport.rows) -> Excel / CSV / PDF rendereri. Guruh, kafedra, bo'lim va umumiy natija
+eksportlari shu quvurdan foydalanadi, shuning uchun ular faqat filtr va ustunlar bilan farq
+qiladi.
+
+So'rovlar soni urinishlar soniga bog'liq emas: urinishlar select_related bilan bitta
+so'rovda .iterator() orqali o'qiladi, batafsil (har javob) rejimda javoblar va variant
+matnlari har ANSWER_BATCH ta urinish uchun bittadan so'rov bilan olinadi
+(excel_export.iter_answer_details).
+"""
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+from .excel_export import CHUNK_SIZE, iter_answer_details, xlsx_response
+from .export_jobs import track_progress
+from .models import StudentTest
+
+
+FORMATS = ('xlsx', 'csv', 'pdf')
+
+
+class ResultFilter:
+    """Eksport filtri. Barcha maydonlar ixtiyoriy; berilganlari AND bilan birlashtiriladi.
+
+    group – talabaning guruhi, test_group – test biriktirilgan guruh, kafedra/bulim –
+    foydalanuvchining kafedrasi/bo'limi, subject – test fani, semester – urinish semestri,
+    role – ishtirokchi roli (student/tutor/employee).
+    """
+
+    FIELDS = ('group', 'test_group', 'kafedra', 'bulim', 'subject', 'semester', 'role')
+
+    def __init__(self, **values):
+        unknown = set(values) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Noma'lum filtr: {', '.join(sorted(unknown))}")
+        for name in self.FIELDS:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def from_query(cls, query):
+        """GET parametrlaridan filtr; id maydonlar butun son bo'lishi kerak."""
+        values = {}
+        for name in cls.FIELDS:
+            value = (query.get(name) or '').strip()
+            if not value:
+                continue
+            if name != 'role':
+                if not value.isdigit():
+                    raise ValueError(f"{name} butun son bo'lishi kerak")
+                value = int(value)
+            values[name] = value
+        return cls(**values)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS if getattr(self, name) is not None}
+
+
+def scope_filter(spec, user):
+    """Foydalanuvchi roli bo'yicha filtrni toraytiradi; ruxsat bo'lmasa None.
+
+    admin/controller – cheklovsiz, xodim – faqat o'z guruhi testlari, tutor – faqat o'z fani.
+    """
+    role = getattr(user, 'role', None)
+    if role in ('admin', 'controller') or user.is_superuser:
+        return spec
+    values = spec.as_dict()
+    if role == 'employee' and getattr(user, 'group_id', None):
+        if values.get('test_group') not in (None, user.group_id):
+            return None
+        values['test_group'] = user.group_id
+        return ResultFilter(**values)
+    if role == 'tutor' and getattr(user, 'subject_id', None):
+        if values.get('subject') not in (None, user.subject_id):
+            return None
+        values['subject'] = user.subject_id
+        return ResultFilter(**values)
+    return None
+
+
+def result_queryset(spec, order_by=('test__subject__name', 'test__group__name', 'student__username', '-start_time')):
+    """Yakunlangan urinishlar: filtr + kerakli bog'lanishlar bitta JOIN bilan."""
+    qs = StudentTest.objects.filter(completed=True)
+    lookups = {
+        'group': 'student__group_id',
+        'test_group': 'test__group_id',
+        'kafedra': 'student__kafedra_id',
+        'bulim': 'student__bulim_id',
+        'subject': 'test__subject_id',
+        'semester': 'semester_id',
+        'role': 'student__role',
+    }
+    filters = {lookups[name]: value for name, value in spec.as_dict().items()}
+    return qs.filter(**filters).select_related('student', 'test', 'test__subject', 'test__group').order_by(*order_by)
+
+
+def _percent(stest):
+    return f"{int(stest.percent)}%"
+
+
+# kalit -> (sarlavha, kenglik, qiymat); urinish darajasidagi ustunlar
+COLUMNS = {
+    'fio': ("F.I.Sh.", 22, lambda st: f"{st.student.first_name} {st.student.last_name}"),
+    'username': ("Username", 15, lambda st: st.student.username),
+    'test': ("Test", 20, lambda st: st.test.subject.name if st.test.subject else "-"),
+    'subject': ("Fan", 18, lambda st: st.test.subject.name if st.test.subject else "NOMA'LUM FAN"),
+    'group': ("Guruh", 18, lambda st: st.test.group.name if st.test.group else "NOMA'LUM GURUH"),
+    'date': ("Test sanasi", 18, lambda st: st.start_time.strftime("%d.%m.%Y %H:%M")),
+    'answered': ("Savollar soni", 10, lambda st: st.answered_count),
+    'correct': ("To'g'ri javob", 12, lambda st: st.correct_count),
+    'incorrect': ("Xato javob", 12, lambda st: st.incorrect_count),
+    'score': ("Ball", 10, lambda st: st.total_score),
+    'max_score': ("Maksimal ball", 12, lambda st: st.test.total_score),
+    'percent': ("Foiz", 8, _percent),
+    'final_score': ("Yakuniy ball", 12, lambda st: st.final_score),
+    'final_passed': ("Final o'tdi?", 10, lambda st: "Ha" if st.final_passed else "Yo'q"),
+}
+
+# Batafsil rejimda har javob uchun qo'shiladigan ustunlar
+ANSWER_COLUMNS = {
+    'question': ("Savol", 40, lambda a: (a['question'] or '')[:200]),
+    'user_answer': ("Talaba javobi", 30, lambda a: a['user_answer']),
+    'correct_answer': ("To'g'ri javob", 30, lambda a: a['correct_answer']),
+    'status': ("Holat", 10, lambda a: "To'g'ri" if a['is_correct'] else "Noto'g'ri"),
+    'answer_score': ("Ball (savol)", 8, lambda a: a['score']),
+}
+
+SUMMARY_COLUMNS = ['fio', 'username', 'test', 'subject', 'date', 'answered', 'correct', 'incorrect', 'score',
+                   'max_score', 'percent']
+DETAIL_COLUMNS = ['subject', 'group', 'fio', 'username', 'date', 'answered', 'correct', 'incorrect', 'score',
+                  'max_score', 'percent']
+
+
+class ResultExport:
+    """Bitta eksport: urinishlar querysetidan sarlavha va qatorlar oqimini beradi.
+
+    columns – COLUMNS kalitlari, detail=True bo'lsa har javob alohida qator (ANSWER_COLUMNS
+    qo'shiladi), headers – sarlavhalarni almashtirish uchun {kalit: matn}.
+    """
+
+    def __init__(self, student_tests, columns=SUMMARY_COLUMNS, detail=False, headers=None):
+        self.student_tests = student_tests
+        self.columns = list(columns)
+        self.detail = detail
+        self.answer_columns = list(ANSWER_COLUMNS) if detail else []
+        self.header_overrides = headers or {}
+
+    @property
+    def headers(self):
+        return ([self.header_overrides.get(key, COLUMNS[key][0]) for key in self.columns]
+                + [self.header_overrides.get(key, ANSWER_COLUMNS[key][0]) for key in self.answer_columns])
+
+    @property
+    def widths(self):
+        return [COLUMNS[key][1] for key in self.columns] + [ANSWER_COLUMNS[key][1] for key in self.answer_columns]
+
+    def rows(self):
+        getters = [COLUMNS[key][2] for key in self.columns]
+        # Fon jobida bajarilish foizi urinishlar bo'yicha
+        total = self.student_tests.count
+        if not self.detail:
+            for stest in track_progress(self.student_tests.iterator(chunk_size=CHUNK_SIZE), total):
+                yield [get(stest) for get in getters]
+            return
+        answer_getters = [ANSWER_COLUMNS[key][2] for key in self.answer_columns]
+        for stest, answers in track_progress(iter_answer_details(self.student_tests), total):
+            base = [get(stest) for get in getters]
+            if not answers:
+                # Javob yo'q – bitta xulosa qatori
+                yield base + ["Javob berilmagan"] + [""] * (len(answer_getters) - 2) + [0]
+                continue
+            for answer in answers:
+                yield base + [get(answer) for get in answer_getters]
+
+
+def render_xlsx(export, filename, title):
+    return xlsx_response(filename, title, export.headers, export.rows(), export.widths)
+
+
+class _Echo:
+    """csv.writer uchun: yozilgan qatorni bufersiz qaytaradi."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(headers, rows, bom=True):
+    """CSV satrlari oqimi; BOM – Excel UTF-8 ni to'g'ri ochishi uchun."""
+    writer = csv.writer(_Echo())
+    if bom:
+        yield '\ufeff'
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def csv_response(filename, headers, rows):
+    """Qatorlar yozilishi bilan yuboriladi (StreamingHttpResponse)."""
+    response = StreamingHttpResponse(iter_csv(headers, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def render_csv(export, filename):
+    return csv_response(filename, export.headers, export.rows())
+
+
+def render_pdf(export, filename, title):
+    """Jadvalli PDF (A4 albom). Hujjat vaqtinchalik faylga yoziladi va oqim bilan yuboriladi."""
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, Spacer
+
+    tmp = tempfile.TemporaryFile()
+    doc = SimpleDocTemplate(tmp, pagesize=landscape(A4), leftMargin=20, rightMargin=20, topMargin=30, bottomMargin=20)
+    total = sum(export.widths) or 1
+    col_widths = [doc.width * w / total for w in export.widths]
+    data = [export.headers] + [['' if v is None else str(v)[:80] for v in row] for row in export.rows()]
+    table = Table(data, repeatRows=1, colWidths=col_widths)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.white]),
+    ]))
+    doc.build([Paragraph(title, getSampleStyleSheet()['Title']), Spacer(1, 8), table])
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=filename, content_type='application/pdf')
+
+
+def render(export, fmt, basename, title):
+    """fmt (xlsx/csv/pdf) bo'yicha javob; basename – kengaytmasiz fayl nomi."""
+    if fmt == 'csv':
+        return render_csv(export, f"{basename}.csv")
+    if fmt == 'pdf':
+        return render_pdf(export, f"{basename}.pdf", title)
+    return render_xlsx(export, f"{basename}.xlsx", title)
@@ -0,0 +1,26 @@
+"""Natijalar bo'yicha umumiy querysetlar (explorer, xulosa jadvali va nazoratchi sahifalari uchun)."""
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import StudentTest
+
+
+def completed_results():
+    """Yakunlangan urinishlar: StudentTest.final_passed ning SQL ko'rinishi passed_flag
+    (agregatlarda ishlatish uchun) bilan."""
+    final_score = Coalesce('overridden_score', 'total_score')
+    passed = Case(
+        When(pass_override=True, then=Value(1)),
+        When(test__total_score__gt=0, final_percent__gte=F('test__pass_percent'), then=Value(1)),
+        When(test__total_score=0, final_score_value__gt=0, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return (
+        StudentTest.objects.filter(completed=True)
+        .annotate(
+            final_score_value=final_score,
+            final_percent=final_score * 100.0 / F('test__total_score'),
+        )
+        .annotate(passed_flag=passed)
+    )
@@ -0,0 +1,122 @@
+"""Fan × guruh × semestr × test bo'yicha natijalar xulosasi (ResultRollup).
+
+Nazoratchi sahifalari har ochilishda barcha urinishlarni Python'da aylanib chiqmasligi uchun
+xulosa jadvali hodisalar bo'yicha yangilanadi: urinish baholanganda, override/revert,
+javob tuzatilganda, qayta baholashda, urinish o'chirilganda, talaba guruhi yoki test
+guruhlari/fani/semestri o'zgarganda (signals.py). Faqat tegilgan kalitlar bitta
+agregat so'rov bilan qayta hisoblanadi (o'sish emas, qayta hisoblash – shuning uchun
+hodisa ikki marta kelsa ham natija to'g'ri). Nomuvofiqlik bo'lsa rebuild_rollups buyrug'i
+jadvalni noldan quradi.
+
+Kalit participated_students_list dagi kabi aniqlanadi: fan – urinish fani, bo'lmasa test fani;
+guruh – urinish guruhi, bo'lmasa talabaning guruhi (agar test shu guruhga biriktirilgan
+bo'lsa); semestr – urinish semestri, bo'lmasa test semestri. Fani yoki guruhi aniqlanmagan
+urinishlar xulosaga kirmaydi.
+"""
+from django.db import transaction
+from django.db.models import Avg, Case, Count, Exists, F, IntegerField, OuterRef, Q, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ResultRollup, StudentTest, Test
+from .results_query import completed_results
+
+
+KEY_FIELDS = ('test_id', 'rollup_subject', 'rollup_group', 'rollup_semester')
+# Qayta baholashda minglab urinish kelishi mumkin – kalitlar shu o'lchamdagi bo'laklarda aniqlanadi
+KEY_BATCH = 500
+
+
+def keyed(qs):
+    """StudentTest querysetiga xulosa kaliti annotatsiyalarini qo'shadi."""
+    in_test_groups = Exists(Test.groups.through.objects.filter(
+        test_id=OuterRef('test_id'), group_id=OuterRef('student__group_id')))
+    return qs.annotate(
+        rollup_subject=Coalesce('subject_id', 'test__subject_id'),
+        rollup_group=Coalesce('group_id', Case(When(in_test_groups, then=F('student__group_id')),
+                                               output_field=IntegerField())),
+        rollup_semester=Coalesce('semester_id', 'test__semester_id'),
+    ).filter(rollup_subject__isnull=False, rollup_group__isnull=False)
+
+
+def _aggregate(qs):
+    return keyed(qs).values(*KEY_FIELDS).annotate(
+        n_attempts=Count('id'),
+        n_participants=Count('student_id', distinct=True),
+        n_passed=Sum('passed_flag'),
+        mean_percent=Avg('percent'),
+    ).order_by()
+
+
+def _key_q(key):
+    test_id, subject_id, group_id, semester_id = key
+    q = Q(test_id=test_id, rollup_subject=subject_id, rollup_group=group_id)
+    return q & (Q(rollup_semester=semester_id) if semester_id is not None else Q(rollup_semester__isnull=True))
+
+
+def _rollup(row):
+    return ResultRollup(
+        test_id=row['test_id'], subject_id=row['rollup_subject'], group_id=row['rollup_group'],
+        semester_id=row['rollup_semester'], participants=row['n_participants'], attempts=row['n_attempts'],
+        passed=row['n_passed'] or 0, failed=row['n_attempts'] - (row['n_passed'] or 0),
+        avg_percent=row['mean_percent'] or 0,
+    )
+
+
+def refresh_rollups(student_tests):
+    """Berilgan urinishlar (obyektlar yoki id lar) tegishli xulosa qatorlarini qayta hisoblaydi."""
+    ids = [getattr(st, 'id', st) for st in student_tests]
+    if not ids:
+        return 0
+    keys = set()
+    for start in range(0, len(ids), KEY_BATCH):
+        batch = StudentTest.objects.filter(id__in=ids[start:start + KEY_BATCH])
+        keys.update(tuple(row[f] for f in KEY_FIELDS) for row in keyed(batch).values(*KEY_FIELDS).distinct())
+    if not keys:
+        return 0
+    key_filter = Q()
+    for key in keys:
+        key_filter |= _key_q(key)
+    rows = {tuple(row[f] for f in KEY_FIELDS): row
+            for row in _aggregate(completed_results().filter(test_id__in={k[0] for k in keys})).filter(key_filter)}
+    with transaction.atomic():
+        for key in keys:
+            test_id, subject_id, group_id, semester_id = key
+            existing = ResultRollup.objects.filter(test_id=test_id, subject_id=subject_id, group_id=group_id,
+                                                   semester_id=semester_id)
+            if key not in rows:
+                existing.delete()
+                continue
+            fresh = _rollup(rows[key])
+            updated = existing.update(
+                participants=fresh.participants, attempts=fresh.attempts, passed=fresh.passed,
+                failed=fresh.failed, avg_percent=fresh.avg_percent, updated_at=timezone.now(),
+            )
+            if not updated:
+                fresh.save()
+    return len(keys)
+
+
+def refresh_test_rollups(test_id):
+    """Bitta testning barcha xulosa qatorlarini qayta quradi (urinish o'chirilganda – eski kalit noma'lum)."""
+    fresh = [_rollup(row) for row in _aggregate(completed_results().filter(test_id=test_id))]
+    with transaction.atomic():
+        ResultRollup.objects.filter(test_id=test_id).delete()
+        ResultRollup.objects.bulk_create(fresh)
+    return len(fresh)
+
+
+def refresh_student_rollups(student_id):
+    """Talaba guruhi o'zgarganda: uning urinishlari bo'lgan testlar qayta quriladi (eski kalit ham tozalanadi)."""
+    test_ids = (StudentTest.objects.filter(student_id=student_id, completed=True)
+                .values_list('test_id', flat=True).distinct().order_by())
+    return sum(refresh_test_rollups(test_id) for test_id in test_ids)
+
+
+def rebuild_rollups():
+    """Butun jadvalni noldan quradi; yaratilgan qatorlar soni."""
+    fresh = [_rollup(row) for row in _aggregate(completed_results())]
+    with transaction.atomic():
+        ResultRollup.objects.all().delete()
+        ResultRollup.objects.bulk_create(fresh, batch_size=500)
+    return len(fresh)
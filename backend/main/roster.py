@@ -0,0 +1,54 @@
+"""Testni hali topshirmaganlar ("qatnashmaganlar") ro'yxati.
+
+Har (fan, guruh) jufti uchun alohida User so'rovi o'rniga bitta anti-join so'rov: guruh
+talabalari guruhga biriktirilgan testlar (Test.groups) orqali fanlar bilan juftlanadi va shu
+fan bo'yicha yakunlangan urinishi bor talabalar NOT EXISTS bilan chiqarib tashlanadi.
+Natija ixcham lug'at: (subject_id, group_id) -> [User]. Qatnashganlar ro'yxati sahifasi,
+yiqilganlar PDF'i va imtihon kuni so'raladigan JSON endpoint shu funksiyadan foydalanadi.
+"""
+from collections import defaultdict
+
+from django.db.models import Exists, F, OuterRef, Q
+
+from .models import StudentTest, User
+
+
+ROSTER_FIELDS = ('id', 'first_name', 'last_name', 'middle_name', 'username', 'access_code', 'group_id')
+
+
+def non_participants(pairs=None, group_ids=None, subject_ids=None, active_only=False):
+    """(subject_id, group_id) -> familiya bo'yicha tartiblangan qatnashmagan talabalar.
+
+    pairs berilsa faqat shu juftlar qaytadi; group_ids/subject_ids so'rovni toraytiradi;
+    active_only=True – faqat faol testlar biriktirilgan fanlar. Hamma qatnashgan juftlar
+    natijada bo'lmaydi.
+    """
+    if pairs is not None:
+        pairs = set(pairs)
+        if not pairs:
+            return {}
+        subject_ids = {subject_id for subject_id, _ in pairs}
+        group_ids = {group_id for _, group_id in pairs}
+    # alias() annotate() dagi JOIN ni qayta ishlatadi: talaba × biriktirilgan test – bitta JOIN
+    qs = User.objects.filter(role='student').annotate(
+        roster_subject=F('group__multi_tests__subject_id'),
+    ).alias(
+        roster_test_active=F('group__multi_tests__active'),
+    ).filter(roster_subject__isnull=False)
+    if group_ids is not None:
+        qs = qs.filter(group_id__in=group_ids)
+    if subject_ids is not None:
+        qs = qs.filter(roster_subject__in=subject_ids)
+    if active_only:
+        qs = qs.filter(roster_test_active=True)
+    taken = StudentTest.objects.filter(student_id=OuterRef('id'), completed=True).filter(
+        Q(subject_id=OuterRef('roster_subject'))
+        | Q(subject__isnull=True, test__subject_id=OuterRef('roster_subject'))
+    )
+    qs = qs.filter(~Exists(taken)).only(*ROSTER_FIELDS).order_by('last_name', 'first_name', 'id').distinct()
+    roster = defaultdict(list)
+    for user in qs:
+        key = (user.roster_subject, user.group_id)
+        if pairs is None or key in pairs:
+            roster[key].append(user)
+    return dict(roster)
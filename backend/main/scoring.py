@@ -0,0 +1,212 @@
+"""Imtihon javoblarini xotirada baholash.
+
+Butun POST bitta oldindan yuklangan javob kaliti bo'yicha baholanadi, so'ng barcha
+StudentAnswer qatorlari va ularning answer_option (M2M) bog'lanishlari bulk_create
+orqali bitta tranzaksiyada yoziladi.
+"""
+from django.db import transaction
+from django.db.models import Sum, prefetch_related_objects
+
+from .models import StudentAnswer, StudentTest
+
+
+TRUE_WORDS = ('to‘g‘ri', 'to‘gri', 'true')
+FALSE_WORDS = ('noto‘g‘ri', 'noto‘gri', 'false')
+
+
+def _norm(text):
+    return (text or '').strip().lower()
+
+
+def _correct_display(qtype, correct):
+    if qtype == 'multiple_choice':
+        return ", ".join(o.text for o in correct)
+    if qtype == 'matching':
+        return "To'g'ri moslashtirish"
+    return correct[0].text if correct else ""
+
+
+def build_question_key(question, score):
+    """Bitta savol uchun javob kalitini tuzadi (question.answer_options oldindan yuklangan bo'lishi kerak)."""
+    options = sorted(question.answer_options.all(), key=lambda o: o.id)
+    correct = [o for o in options if o.is_correct]
+    return {
+        'type': question.question_type,
+        'score': score,
+        'option_ids': [o.id for o in options],
+        'correct_ids': {o.id for o in correct},
+        # .first() pk bo'yicha tartiblaydi – birinchi to'g'ri variant
+        'correct_raw': correct[0].text if correct else None,
+        'correct_text': _norm(correct[0].text) if correct else None,
+        'correct_texts': [_norm(o.text) for o in correct],
+        'correct_display': _correct_display(question.question_type, correct),
+        'ordered_words': [_norm(o.text) for o in correct],
+        # Matching: chap ustun tartibi va har bir variantning (right, image) juftligi
+        'matching_lefts': [(o.right, o.image.name if o.image else '') for o in options if o.left],
+        'matching_rights': {o.id: (o.right, o.image.name if o.image else '') for o in options},
+    }
+
+
+def build_answer_key(questions, tq_scores):
+    """questions ro'yxati uchun {question_id: kalit} lug'atini bitta prefetch bilan quradi."""
+    prefetch_related_objects(questions, 'answer_options')
+    return {q.id: build_question_key(q, tq_scores.get(q.id, 0)) for q in questions}
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def grade_answer(qid, key, post):
+    """Bitta savolni baholaydi: (tanlangan_option_idlar, text_answer, is_correct, score) qaytaradi."""
+    qtype = key['type']
+    option_ids = []
+    text_answer = None
+    is_correct = False
+
+    if qtype == 'single_choice':
+        ans_id = _to_int(post.get(f'question_{qid}'))
+        if ans_id in key['option_ids']:
+            option_ids = [ans_id]
+            is_correct = ans_id in key['correct_ids']
+    elif qtype == 'true_false':
+        text_answer = post.get(f'question_{qid}')
+        correct_text = key['correct_text']
+        if correct_text is not None and (
+            (text_answer == 'true' and correct_text in TRUE_WORDS) or
+            (text_answer == 'false' and correct_text in FALSE_WORDS)
+        ):
+            is_correct = True
+    elif qtype == 'multiple_choice':
+        option_ids = [oid for oid in key['option_ids'] if post.get(f'question_{qid}_{oid}')]
+        is_correct = set(option_ids) == key['correct_ids']
+    elif qtype == 'fill_in_blank':
+        text_answer = _norm(post.get(f'question_{qid}', ''))
+        is_correct = key['correct_text'] is not None and text_answer == key['correct_text']
+    elif qtype == 'matching':
+        is_correct = True
+        rights = key['matching_rights']
+        for idx, (left_right, left_image) in enumerate(key['matching_lefts'], 1):
+            chosen = rights.get(_to_int(post.get(f'matching_{qid}_{idx}')))
+            if not chosen:
+                is_correct = False
+                break
+            right_text, right_image = chosen
+            if left_right and right_text:
+                if left_right != right_text:
+                    is_correct = False
+            elif left_image and right_image:
+                if left_image != right_image:
+                    is_correct = False
+            else:
+                is_correct = False
+    elif qtype == 'sentence_ordering':
+        text_answer = post.get(f'question_{qid}', '').strip()
+        student_words = [w.strip().lower() for w in text_answer.split()]
+        is_correct = student_words == key['ordered_words']
+
+    score = (key['score'] or 0) if is_correct else 0
+    return option_ids, text_answer, is_correct, score
+
+
+def post_from_answer(qid, qtype, option_ids, text_answer):
+    """Saqlangan javobdan (tanlangan variantlar, matn) grade_answer uchun POST ko'rinishini tiklaydi.
+
+    Matching javoblari (juftliklar) bazada saqlanmaydi – ular uchun None qaytariladi.
+    """
+    if qtype == 'single_choice':
+        return {f'question_{qid}': str(option_ids[0])} if option_ids else {}
+    if qtype == 'multiple_choice':
+        return {f'question_{qid}_{oid}': 'on' for oid in option_ids}
+    if qtype in ('true_false', 'fill_in_blank', 'sentence_ordering'):
+        return {f'question_{qid}': text_answer or ''}
+    return None
+
+
+def grade_submission(stest, answer_key, post, question_ids=None):
+    """POST javoblarini xotirada baholab, StudentAnswer va M2M qatorlarini bulk yozadi.
+
+    Yaratilgan StudentAnswer obyektlari ro'yxatini qaytaradi (umumiy ball = ularning score yig'indisi).
+    """
+    question_ids = list(question_ids if question_ids is not None else answer_key.keys())
+    answers = []
+    selected = []
+    for qid in question_ids:
+        key = answer_key.get(qid)
+        if key is None:
+            continue
+        option_ids, text_answer, is_correct, score = grade_answer(qid, key, post)
+        answers.append(StudentAnswer(
+            student_test=stest,
+            question_id=qid,
+            text_answer=text_answer,
+            is_correct=is_correct,
+            score=score,
+        ))
+        selected.append(option_ids)
+
+    Through = StudentAnswer.answer_option.through
+    with transaction.atomic():
+        created = StudentAnswer.objects.bulk_create(answers)
+        links = [
+            Through(studentanswer_id=sa.id, answeroption_id=oid)
+            for sa, option_ids in zip(created, selected)
+            for oid in option_ids
+        ]
+        if links:
+            Through.objects.bulk_create(links)
+    return created
+
+
+def save_answers(stest, answer_key, post, question_ids):
+    """Autosave: berilgan savollar javoblarini upsert qiladi (eski qatorlar o'chirilib, yangilari bulk yoziladi)."""
+    question_ids = [qid for qid in question_ids if qid in answer_key]
+    if not question_ids:
+        return []
+    with transaction.atomic():
+        StudentAnswer.objects.filter(student_test=stest, question_id__in=question_ids).delete()
+        return grade_submission(stest, answer_key, post, question_ids)
+
+
+def finalize_autosaved(stest, answer_key, post, question_ids, pending_ids):
+    """Autosave rejimida yakunlash: faqat hali saqlanmagan (pending) va umuman tegilmagan savollar yoziladi.
+
+    Varaqada yo'q eski javoblar o'chiriladi; umumiy ball saqlangan ballar yig'indisi sifatida qaytariladi.
+    """
+    question_ids = list(question_ids)
+    with transaction.atomic():
+        stest.answers.exclude(question_id__in=question_ids).delete()
+        save_answers(stest, answer_key, post, [qid for qid in pending_ids if qid in question_ids])
+        stored = set(stest.answers.values_list('question_id', flat=True))
+        grade_submission(stest, answer_key, post, [qid for qid in question_ids if qid not in stored])
+        return stest.answers.aggregate(total=Sum('score'))['total'] or 0
+
+
+def refresh_result_counters(stests, save=True):
+    """StudentTest.answered_count/correct_count/percent ni bitta so'rov bilan qayta hisoblaydi.
+
+    Hisobotlardagi kabi question_ids bo'lsa faqat varaqadagi savollar javoblari sanaladi.
+    save=True bo'lsa o'zgargan qatorlar bulk_update qilinadi.
+    """
+    stests = list(stests)
+    counts = {st.id: [0, 0] for st in stests}
+    rows = StudentAnswer.objects.filter(student_test_id__in=list(counts)).values_list('student_test_id', 'question_id', 'is_correct')
+    paper = {st.id: set(st.question_ids) if st.question_ids else None for st in stests}
+    for stest_id, question_id, is_correct in rows:
+        if paper[stest_id] is not None and question_id not in paper[stest_id]:
+            continue
+        counts[stest_id][0] += 1
+        counts[stest_id][1] += 1 if is_correct else 0
+    changed = []
+    for st in stests:
+        answered, correct = counts[st.id]
+        percent = (correct / answered) * 100 if answered else 0
+        if (st.answered_count, st.correct_count, st.percent) != (answered, correct, percent):
+            st.answered_count, st.correct_count, st.percent = answered, correct, percent
+            changed.append(st)
+    if save and changed:
+        StudentTest.objects.bulk_update(changed, ['answered_count', 'correct_count', 'percent'], batch_size=500)
+    return changed
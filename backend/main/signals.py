@@ -26,4 +26,95 @@ def limit_log_count(sender, **kwargs):
     if total > max_logs:
         # Eski loglarni o‘chirish (eng eski yaratilgan sana bo‘yicha)
         to_delete = Log.objects.order_by('created_at')[:total - max_logs]
-        Log.objects.filter(id__in=[l.id for l in to_delete]).delete()
\ No newline at end of file
+        Log.objects.filter(id__in=[l.id for l in to_delete]).delete()
+
+
+# Javob kaliti keshini bekor qilish: test savollari, variantlar yoki savol o'zgarsa versiya oshiriladi
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from main.models import TestQuestion, AnswerOption, Question
+from main.answer_key import bump_answer_key_version, bump_answer_key_version_for_question
+
+@receiver([post_save, post_delete], sender=TestQuestion)
+def invalidate_answer_key_on_test_question(sender, instance, **kwargs):
+    bump_answer_key_version([instance.test_id])
+
+@receiver([post_save, post_delete], sender=AnswerOption)
+def invalidate_answer_key_on_answer_option(sender, instance, **kwargs):
+    bump_answer_key_version_for_question(instance.question_id)
+    # Savol bo'laklari keshi (question_fragments) updated_at ga bog'langan
+    Question.objects.filter(id=instance.question_id).update(updated_at=timezone.now())
+
+@receiver(post_save, sender=Question)
+def invalidate_answer_key_on_question(sender, instance, created, **kwargs):
+    if not created:
+        bump_answer_key_version_for_question(instance.id)
+
+
+# Natijalar xulosasi: urinish o'chirilsa testning xulosa qatorlari qayta quriladi
+from main.models import StudentTest
+from main.rollups import refresh_test_rollups
+
+@receiver(post_delete, sender=StudentTest)
+def refresh_rollups_on_student_test_delete(sender, instance, **kwargs):
+    if instance.completed:
+        refresh_test_rollups(instance.test_id)
+
+
+# Kalit talaba guruhi, test fani/semestri va test.groups ga bog'liq: ular o'zgarsa eski kalit qatorlari ham qayta quriladi
+from django.db.models.signals import m2m_changed, pre_save
+from main.models import Test
+from main.rollups import refresh_student_rollups
+
+ROLLUP_KEY_FIELDS = {User: ('group_id',), Test: ('subject_id', 'semester_id')}
+
+def _touches(update_fields, fields):
+    return update_fields is None or any(f in update_fields or f[:-3] in update_fields for f in fields)
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Test)
+def remember_rollup_key(sender, instance, update_fields=None, **kwargs):
+    fields = ROLLUP_KEY_FIELDS[sender]
+    if instance.pk and _touches(update_fields, fields):
+        instance._rollup_key = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Test)
+def refresh_rollups_on_key_change(sender, instance, created, **kwargs):
+    old = getattr(instance, '_rollup_key', None)
+    if created or old is None:
+        return
+    if old != tuple(getattr(instance, f) for f in ROLLUP_KEY_FIELDS[sender]):
+        if sender is User:
+            refresh_student_rollups(instance.pk)
+        else:
+            refresh_test_rollups(instance.pk)
+    del instance._rollup_key
+
+@receiver(m2m_changed, sender=Test.groups.through)
+def refresh_rollups_on_test_groups(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._rollup_tests = list(instance.multi_tests.values_list('id', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_test_rollups(instance.pk)
+        return
+    test_ids = getattr(instance, '_rollup_tests', []) if action == 'post_clear' else pk_set
+    for test_id in test_ids or ():
+        refresh_test_rollups(test_id)
+
+
+# Mavzu testi savollar to'plami (main/topic_bundle.py): savol yoki variant o'zgarsa mavzu versiyasi yangilanadi
+from main.models import TopicQuestion, TopicAnswerOption
+from main.topic_bundle import bump_topic_version
+
+@receiver([post_save, post_delete], sender=TopicQuestion)
+def invalidate_topic_bundle_on_question(sender, instance, **kwargs):
+    bump_topic_version(instance.topic_id)
+
+@receiver([post_save, post_delete], sender=TopicAnswerOption)
+def invalidate_topic_bundle_on_option(sender, instance, **kwargs):
+    topic_id = TopicQuestion.objects.filter(id=instance.question_id).values_list('topic_id', flat=True).first()
+    if topic_id is not None:
+        bump_topic_version(topic_id)
@@ -0,0 +1,323 @@
+"""Fan bo'yicha yakuniy nazorat natijalari PDF hisoboti va ko'p hisobotli ZIP (paket) rejimi.
+
+Hisobot so'rovdan mustaqil quriladi (fan nomi + filtrlar + foydalanuvchi + sayt manzili),
+shuning uchun uni view ham, paket rejimi (eksport navbati oqimida ketma-ket) ham chaqiradi.
+O'zgarmas bloklar (uslublar, shrift, QR belgisi) main/pdf_blocks.py da keshlanadi.
+"""
+import io
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.text import get_valid_filename
+from django.utils.timezone import localtime
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .export_jobs import track_progress
+from .models import Group, StudentTest, User
+from .pdf_blocks import qr_footer, report_styles, verification_qr_png
+from .pdf_verification import audit_entry, issue_token, record_issued
+
+
+# Hisobot filtrlari (GET parametrlari)
+FILTER_PARAMS = ('group', 'semester', 'attempt_count', 'attempt_gte', 'attempt_min', 'attempt_max', 'attempt_nth',
+                 'kafedra_id', 'bulim_id')
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def select_attempts(subject_name, query):
+    """Filtrlangan urinishlar (har talabadan bittasi), F.I.O bo'yicha tartiblangan."""
+    tests_qs = StudentTest.objects.filter(
+        test__subject__name=subject_name,
+        completed=True
+    ).select_related('student', 'test', 'test__group')
+
+    group_name = query.get('group') or ''
+    semester_number = query.get('semester') or ''
+    if group_name:
+        try:
+            grp_obj = Group.objects.get(name=group_name)
+            tests_qs = tests_qs.filter(Q(group=grp_obj) | Q(student__group=grp_obj))
+        except Group.DoesNotExist:
+            tests_qs = tests_qs.filter(Q(group__name=group_name) | Q(student__group__name=group_name))
+    if semester_number:
+        tests_qs = tests_qs.filter(Q(semester__number=semester_number) | Q(test__semester__number=semester_number))
+    tests_qs = tests_qs.distinct()
+
+    k_id = _to_int(query.get('kafedra_id'))
+    b_id = _to_int(query.get('bulim_id'))
+    if k_id:
+        tests_qs = tests_qs.filter(Q(test__kafedra_id=k_id) | Q(test__kafedralar__id=k_id)).distinct()
+    if b_id:
+        tests_qs = tests_qs.filter(Q(test__bulim_id=b_id) | Q(test__bulimlar__id=b_id)).distinct()
+
+    # Urinishlar soni bo'yicha filtr: talaba boshiga urinishlar ro'yxati
+    bucket = defaultdict(list)
+    for st in tests_qs.order_by('student_id', 'start_time'):
+        bucket[st.student_id].append(st)
+
+    tests = []
+    attempt_nth_val = _to_int(query.get('attempt_nth'))
+    if attempt_nth_val and attempt_nth_val > 0:
+        for arr in bucket.values():
+            if len(arr) >= attempt_nth_val:
+                tests.append(arr[attempt_nth_val - 1])
+    else:
+        attempt_count_val = _to_int(query.get('attempt_count'))
+        attempt_gte_val = _to_int(query.get('attempt_gte'))
+        attempt_min_val = _to_int(query.get('attempt_min'))
+        attempt_max_val = _to_int(query.get('attempt_max'))
+        for arr in bucket.values():
+            total_attempts = len(arr)
+            ok = True
+            if attempt_count_val and total_attempts != attempt_count_val:
+                ok = False
+            if ok and attempt_gte_val and total_attempts < attempt_gte_val:
+                ok = False
+            if ok and attempt_min_val and total_attempts < attempt_min_val:
+                ok = False
+            if ok and attempt_max_val and total_attempts > attempt_max_val:
+                ok = False
+            if ok:
+                tests.append(arr[-1])
+
+    tests.sort(key=lambda st: (
+        (st.student.last_name or '').lower(),
+        (st.student.first_name or '').lower(),
+        (getattr(st.student, 'middle_name', '') or '').lower(),
+        (st.student.username or '')
+    ))
+    return tests, k_id, b_id
+
+
+def _resolve_group_name(st):
+    gname = None
+    if st.test.group:
+        gname = st.test.group.name
+    elif getattr(st, 'group', None):
+        gname = st.group.name if st.group else None
+    if gname is None:
+        student_group = getattr(st.student, 'group', None)
+        try:
+            if student_group and st.test.groups.filter(id=student_group.id).exists():
+                gname = student_group.name
+        except Exception:
+            pass
+    if gname is None:
+        first_grp = st.test.groups.first()
+        if first_grp:
+            gname = first_grp.name
+    return gname
+
+
+def _container_value(stest, k_id, b_id):
+    """Kafedra/Bo'lim tanlangan bo'lsa shuning nomi, aks holda guruh."""
+    try:
+        if k_id:
+            if getattr(stest.test, 'kafedra', None):
+                return stest.test.kafedra.name
+            if stest.test.kafedralar.exists():
+                kc = stest.test.kafedralar.count()
+                return stest.test.kafedralar.first().name if kc == 1 else f"Kafedralar ({kc})"
+            return '-'
+        if b_id:
+            if getattr(stest.test, 'bulim', None):
+                return stest.test.bulim.name
+            if stest.test.bulimlar.exists():
+                bc = stest.test.bulimlar.count()
+                return stest.test.bulimlar.first().name if bc == 1 else f"Bo'limlar ({bc})"
+            return '-'
+    except Exception:
+        return '-'
+    return _resolve_group_name(stest) or '-'
+
+
+def _pct(value):
+    return f"{value:.1f}".replace('.', ',') + "%"
+
+
+TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('ALIGN', (2, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+    ('LINEABOVE', (0, 0), (-1, 0), 1, colors.black),
+    ('LINEBEFORE', (0, 0), (0, -1), 1, colors.black),
+    ('LINEAFTER', (-1, 0), (-1, -1), 1, colors.black),
+    ('LINEBELOW', (0, -1), (-1, -1), 1, colors.black),
+    ('LINEABOVE', (0, 1), (-1, 1), 0.5, colors.black),
+    ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('LEFTPADDING', (0, 0), (-1, -1), 3),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ('ALIGN', (2, 1), (2, -1), 'LEFT'),
+])
+
+SIGNATURE_STYLE = TableStyle([
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+    ('ALIGN', (2, 0), (2, 0), 'LEFT'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ('BOX', (0, 0), (-1, -1), 0, colors.white),
+    ('INNERGRID', (0, 0), (-1, -1), 0, colors.white),
+])
+
+
+def report_filename(subject_name, group_name=''):
+    suffix = f"_{group_name}" if group_name else ''
+    return f"{subject_name}{suffix}_test_natijalari.pdf"
+
+
+def build_subject_results_pdf(subject_name, query, user, base_url, audit=None):
+    """PDF baytlari. base_url – QR tasdiq havolasi uchun sayt manzili (masalan https://test.katdpi.uz).
+
+    audit – ro'yxat berilsa QR audit yozuvi shunga qo'shiladi (paket rejimida ota jarayon yozadi),
+    aks holda record_issued bilan commitdan keyin fon oqimida yoziladi (main.pdf_verification).
+    """
+    tests, k_id, b_id = select_attempts(subject_name, query)
+    styles = report_styles()
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=30,
+        leftMargin=30,
+        topMargin=30,
+        bottomMargin=40 * mm,  # QR uchun har bir sahifada bo'sh joy
+    )
+    elements = [Spacer(1, 10), Paragraph("Kattaqurg'on Davlat Pedagogika instituti", styles['header'])]
+    times = [t.start_time for t in tests if t.start_time]
+    earliest = min(times) if times else None
+    test_date_display = localtime(earliest).strftime('%d.%m.%Y') if earliest else datetime.now().strftime('%d.%m.%Y')
+    elements.append(Paragraph("Yakuniy nazorat test sinovlari natijalari", styles['subtitle']))
+    elements.append(Spacer(1, 32))
+    elements.append(Paragraph(f"Fanning nomi: {subject_name}", styles['subject']))
+    elements.append(Paragraph(f"Test o'tkazilgan sana: {test_date_display}", styles['date']))
+    elements.append(Spacer(1, 12))
+
+    container_header = "Kafedra" if k_id else "Bo'lim" if b_id else "Guruh"
+    is_super = bool(user and user.is_superuser)
+    if is_super:
+        headers = ['№', 'F.I.O', container_header, 'Savollar soni', "To'g'ri javoblar", 'Asl foiz', 'Yakuniy foiz',
+                   'Final ball', "O'tgan?", 'Status']
+    else:
+        headers = ['№', 'F.I.O', container_header, 'Savollar soni', "To'g'ri javoblar", 'Foizi']
+    data = [[Paragraph(f'<b>{h}</b>', styles['th']) for h in headers]]
+
+    for idx, stest in enumerate(track_progress(tests, len(tests)), 1):
+        # F.I.O: otasining ismi (middle_name) bo'sh yoki None bo'lsa qo'shmaymiz
+        ln = (stest.student.last_name or '').upper()
+        fn = (stest.student.first_name or '').upper()
+        mn = getattr(stest.student, 'middle_name', None) or ''
+        fio = ' '.join([p for p in [ln, fn, mn.upper()] if p]).strip()
+        container_cell = Paragraph(_container_value(stest, k_id, b_id), styles['wrap'])
+        # Javoblar soni va foiz StudentTest dagi hisoblagichlardan (har qator uchun qo'shimcha so'rovsiz)
+        original_percent = stest.percent
+        total_score = stest.test.total_score
+        final_percent = (stest.final_score / total_score) * 100 if total_score else original_percent
+        row = [idx, Paragraph(fio, styles['td']), container_cell, stest.answered_count, stest.correct_count]
+        if is_super:
+            row += [
+                _pct(original_percent),
+                _pct(final_percent),
+                f"{stest.final_score:.1f}".replace('.', ','),
+                "Ha" if stest.final_passed else "Yo'q",
+                "Override" if stest.is_overridden else "Normal",
+            ]
+        else:
+            row.append(_pct(final_percent))
+        data.append(row)
+
+    if is_super:
+        table = Table(data, colWidths=[8 * mm, 45 * mm, 20 * mm, 18 * mm, 18 * mm, 18 * mm, 18 * mm, 18 * mm, 15 * mm, 18 * mm])
+    else:
+        table = Table(data, colWidths=[13 * mm, 55 * mm, 28 * mm, 28 * mm, 38 * mm, 22 * mm])
+    table.setStyle(TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 16))
+
+    signature_table = Table([[
+        Paragraph("O'UBB:", styles['sig_left']),
+        Paragraph("____________", styles['sig_mid']),
+        Paragraph("I.Madatov", styles['sig_name'])
+    ]], colWidths=[25 * mm, 70 * mm, 35 * mm])
+    signature_table.setStyle(SIGNATURE_STYLE)
+    elements.append(signature_table)
+    elements.append(Spacer(1, 12))
+
+    # QR in footer: imzolangan token – tekshirishda bazaga murojaat yo'q
+    token = issue_token(subject_name, len(tests))
+    entry = audit_entry(token, user.id if user and user.is_authenticated else None)
+    if audit is None:
+        record_issued([entry])
+    else:
+        audit.append(entry)
+    qr_png = verification_qr_png(f"{base_url.rstrip('/')}/api/test-api/verify-qr/{token}/")
+    footer = qr_footer(qr_png)
+    doc.build(elements, onFirstPage=footer, onLaterPages=footer)
+    return buffer.getvalue()
+
+
+# --- Paket (ZIP) rejimi ---
+
+def batch_targets(subjects=(), groups=(), semester=None):
+    """(fan nomi, guruh nomi) juftliklari. Fanlar berilmasa – filtrga mos yakunlangan natijasi bor barcha fanlar."""
+    qs = StudentTest.objects.filter(completed=True, test__subject__isnull=False)
+    if semester:
+        qs = qs.filter(Q(semester__number=semester) | Q(test__semester__number=semester))
+    if not subjects:
+        subject_qs = qs
+        if groups:
+            subject_qs = subject_qs.filter(Q(group__name__in=groups) | Q(student__group__name__in=groups))
+        subjects = sorted(set(subject_qs.values_list('test__subject__name', flat=True)))
+    return [(subject, group) for subject in subjects for group in (groups or [''])]
+
+
+def _unique_name(name, used):
+    """get_valid_filename turli nomlarni bir xil qilishi mumkin ("Fizika?" va "Fizika") – takrorga _2, _3 qo'shiladi."""
+    stem, dot, ext = name.rpartition('.')
+    candidate, number = name, 1
+    while candidate in used:
+        number += 1
+        candidate = f"{stem}_{number}{dot}{ext}"
+    used.add(candidate)
+    return candidate
+
+
+def build_batch_zip(fileobj, targets, query, user_id, base_url):
+    """Hisobotlarni joriy oqimda ketma-ket quradi va fileobj ga ZIP qilib yozadi; hisobotlar sonini qaytaradi.
+
+    Jarayonlar havzasi ishlatilmaydi – eksport navbati oqimi veb worker ichida, u yerda yangi jarayonlar
+    ochilmasin. QR audit yozuvlari oxirida bitta paket bo'lib yoziladi.
+    """
+    query = {key: value for key, value in query.items() if key in FILTER_PARAMS and key != 'group'}
+    user = User.objects.filter(id=user_id).first() if user_id else None
+    audit, used = [], set()
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for subject_name, group_name in track_progress(targets, len(targets)):
+            target_query = dict(query, group=group_name) if group_name else query
+            pdf = build_subject_results_pdf(subject_name, target_query, user, base_url, audit=audit)
+            name = get_valid_filename(report_filename(subject_name, group_name))
+            archive.writestr(_unique_name(name, used), pdf)
+    record_issued(audit)
+    return len(targets)
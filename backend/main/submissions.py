@@ -0,0 +1,134 @@
+"""Imtihon topshiriqlari jurnali va fon baholash.
+
+Topshirish so'rovi faqat Submission yozuvini (POST javoblari bilan) qo'shadi va
+urinishni yakunlangan deb belgilaydi – bitta qisqa tranzaksiya. Baholash commitdan
+keyin fon oqimida bajariladi. Baholash idempotent: javoblar qayta yoziladi va ball
+qayta hisoblanadi, shuning uchun jurnal istalgan payt qayta o'ynatilishi mumkin.
+Jarayon qulab qolsa, pending yozuvlar server ishga tushganda (bace/wsgi.py),
+replay_submissions buyrug'i bilan yoki talabaning baholash sahifasi so'rovida
+(muddati o'tgan band yozuvlar ham) qayta baholanadi. Vaqtinchalik baza xatolari
+(OperationalError, masalan SQLite "database is locked") yozuvni pending qoldiradi va
+MAX_ATTEMPTS gacha qayta olinadi; 'failed' faqat takrorlanadigan xatolar uchun.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import OperationalError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from .answer_key import get_answer_key
+from .background import run_in_background
+from .models import StudentAnswer, Submission
+from .rollups import refresh_rollups
+from .scoring import finalize_autosaved, grade_submission, refresh_result_counters
+
+
+logger = logging.getLogger('api')
+
+# Baholash shu muddatdan oshsa (worker qulagan) yozuv boshqa worker tomonidan qayta olinadi
+CLAIM_TIMEOUT = timedelta(minutes=5)
+# Yangi yozuv shu muddatda olinmasa (commitdan keyingi fon vazifasi jarayon bilan yo'qolgan) ham to'xtagan hisoblanadi
+PICKUP_TIMEOUT = timedelta(seconds=30)
+# Vaqtinchalik baza xatosidan keyin shuncha urinishdan so'ng yozuv 'failed' ga o'tadi
+MAX_ATTEMPTS = 5
+
+_SKIP_FIELDS = ('csrfmiddlewaretoken',)
+
+
+def record_submission(stest, post, question_ids, autosave_mode):
+    """POST javoblarini jurnalga yozadi (chaqiruvchi tranzaksiyasi ichida) va commitdan keyin baholashni rejalashtiradi."""
+    payload = {k: v for k, v in post.lists() if k not in _SKIP_FIELDS}
+    submission, _ = Submission.objects.update_or_create(
+        student_test=stest,
+        defaults={
+            'payload': payload,
+            'question_ids': list(question_ids),
+            'autosave_mode': autosave_mode,
+            'status': 'pending',
+            'error': '',
+            'claimed_at': None,
+            'attempts': 0,
+            'graded_at': None,
+        },
+    )
+    run_in_background(grade_pending, submission.id)
+    return submission
+
+
+def _claim(submission_id):
+    now = timezone.now()
+    return Submission.objects.filter(id=submission_id, status='pending').filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - CLAIM_TIMEOUT)
+    ).update(claimed_at=now, attempts=F('attempts') + 1)
+
+
+def grade_pending(submission_id):
+    """Jurnaldagi bitta topshiriqni baholaydi. Boshqa worker baholayotgan yoki baholangan bo'lsa hech narsa qilmaydi."""
+    if not _claim(submission_id):
+        return False
+    submission = Submission.objects.select_related('student_test__test').get(id=submission_id)
+    stest = submission.student_test
+    post = MultiValueDict(submission.payload)
+    try:
+        answer_key = get_answer_key(stest.test)
+        with transaction.atomic():
+            if submission.autosave_mode:
+                pending_ids = [int(v) for v in post.get('pending_questions', '').split(',') if v.strip().isdigit()]
+                total_score = finalize_autosaved(stest, answer_key.questions, post, submission.question_ids, pending_ids)
+            else:
+                StudentAnswer.objects.filter(student_test=stest).delete()
+                created = grade_submission(stest, answer_key.questions, post, submission.question_ids)
+                total_score = sum(sa.score for sa in created)
+            stest.total_score = total_score
+            refresh_result_counters([stest], save=False)
+            stest.save(update_fields=['total_score', 'answered_count', 'correct_count', 'percent', 'last_activity'])
+            submission.status = 'graded'
+            submission.graded_at = timezone.now()
+            submission.save(update_fields=['status', 'graded_at'])
+    except OperationalError as exc:
+        # Vaqtinchalik xato: band belgisi olinadi – is_stalled/replay yozuvni keyin qayta oladi
+        retry = submission.attempts < MAX_ATTEMPTS
+        logger.warning('SUBMISSION_GRADE_RETRY submission=%s attempt=%s retry=%s error=%s',
+                       submission_id, submission.attempts, retry, exc)
+        Submission.objects.filter(id=submission_id).update(
+            status='pending' if retry else 'failed', claimed_at=None, error=str(exc)[:2000])
+        return False
+    except Exception as exc:
+        logger.exception('SUBMISSION_GRADE_FAILED submission=%s', submission_id)
+        Submission.objects.filter(id=submission_id).update(status='failed', error=str(exc)[:2000])
+        return False
+    refresh_rollups([stest])
+    return True
+
+
+def is_stalled(submission, now=None):
+    """Pending yozuvni hech kim baholamayapti: olinmagan yoki olgan worker CLAIM_TIMEOUT dan beri jim."""
+    if submission.status != 'pending':
+        return False
+    now = now or timezone.now()
+    if submission.claimed_at is None:
+        return submission.created_at < now - PICKUP_TIMEOUT
+    return submission.claimed_at < now - CLAIM_TIMEOUT
+
+
+def resume_if_stalled(submission):
+    """Baholash sahifasi so'raganda to'xtab qolgan yozuvni fon oqimida qayta baholaydi.
+
+    Worker baholash o'rtasida qulab CLAIM_TIMEOUT ichida qayta ishga tushsa, ishga tushishdagi
+    replay band yozuvni o'tkazib yuboradi – talaba sahifasi uni shu yerda qayta oladi.
+    Ikki so'rov bir vaqtda kelsa ham _claim faqat bittasiga beradi.
+    """
+    if not is_stalled(submission):
+        return False
+    run_in_background(grade_pending, submission.id)
+    return True
+
+
+def replay_pending(include_failed=False):
+    """Baholanmay qolgan (pending, ixtiyoriy ravishda failed) topshiriqlarni qayta baholaydi; baholanganlar sonini qaytaradi."""
+    if include_failed:
+        Submission.objects.filter(status='failed').update(status='pending', claimed_at=None, attempts=0)
+    ids = list(Submission.objects.filter(status='pending').order_by('id').values_list('id', flat=True))
+    return sum(1 for sid in ids if grade_pending(sid))
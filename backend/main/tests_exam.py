@@ -0,0 +1,512 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Faculty, Group, University, Subject, Question, AnswerOption, Test as TestModel, TestQuestion, StudentTest, StudentAnswer, TestVariant, Submission, ExamQueueEntry
+from .question_fragments import attach_question_fragments
+from .admission import admit, admit_many
+from . import exam_queue, live_counters, live_monitor
+from .variants import generate_variants
+from .submissions import MAX_ATTEMPTS, replay_pending
+
+User = get_user_model()
+
+
+class QuestionFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        subject = Subject.objects.create(name='Algebra')
+        self.q = Question.objects.create(subject=subject, text='Hisoblang: \\frac{1}{2} + x^2', question_type='single_choice')
+        self.opt = AnswerOption.objects.create(question=self.q, text='x^2', is_correct=True)
+        AnswerOption.objects.create(question=self.q, text='Boshqa')
+
+    def _questions(self):
+        return list(Question.objects.filter(id=self.q.id).prefetch_related('answer_options'))
+
+    def test_fragments_rendered_and_cached(self):
+        q = attach_question_fragments(self._questions())[0]
+        self.assertIn('\\(\\frac{1}{2}\\)', q.fragment['text'])
+        opt = next(o for o in q.answer_options.all() if o.id == self.opt.id)
+        self.assertIn('\\(x^2\\)', opt.fragment_html)
+        # Ikkinchi marta keshdan olinadi – shablon qayta render qilinmaydi
+        with self.assertTemplateNotUsed('test_api/partials/_question_text.html'):
+            attach_question_fragments(self._questions())
+
+    def test_option_change_invalidates_fragment(self):
+        attach_question_fragments(self._questions())
+        self.opt.text = 'y^3'
+        self.opt.save()
+        q = attach_question_fragments(self._questions())[0]
+        opt = next(o for o in q.answer_options.all() if o.id == self.opt.id)
+        self.assertIn('\\(y^3\\)', opt.fragment_html)
+
+
+@override_settings(BACKGROUND_TASKS_SYNC=True)
+class ExamTestCase(TestCase):
+    """6 ta savollik havzadan 3 ta savol tanlanadigan oddiy test (faqat single_choice)."""
+
+    def setUp(self):
+        self.student = User.objects.create_user(username='stud', password='pass', role='student')
+        self.subject = Subject.objects.create(name='Fizika')
+        self.test = TestModel.objects.create(subject=self.subject, question_count=3, total_score=3,
+                                             duration=timedelta(minutes=10), minutes=10)
+        for i in range(6):
+            q = Question.objects.create(subject=self.subject, text=f'Savol {i}', question_type='single_choice')
+            for j in range(4):
+                AnswerOption.objects.create(question=q, text=f'v{j}', is_correct=(j == 0))
+            TestQuestion.objects.create(test=self.test, question=q, score=1)
+        self.client.force_login(self.student)
+        self.url = reverse('testapi_test', args=[self.test.id])
+
+    def correct_option(self, qid):
+        return str(AnswerOption.objects.get(question_id=qid, is_correct=True).id)
+
+    def wrong_option(self, qid):
+        return str(AnswerOption.objects.filter(question_id=qid, is_correct=False).first().id)
+
+    def submit(self, data):
+        """Topshiradi va fon baholashni (on_commit) shu joyda bajaradi."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, data)
+
+
+class SeededPaperTests(ExamTestCase):
+
+    def test_paper_is_stable_without_session(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        st = StudentTest.objects.get(student=self.student, test=self.test)
+        self.assertIsNotNone(st.shuffle_seed)
+        self.assertEqual(len(st.question_ids), 3)
+        first_ids = [q.id for q in resp.context['questions']]
+        first_opts = {k: [o.id for o in v] for k, v in resp.context['choice_options_dict'].items()}
+        self.assertEqual(first_ids, st.question_ids)
+        self.assertFalse(any(k.startswith(f'test_{self.test.id}_') for k in self.client.session.keys()))
+        # Sessiya tozalansa ham (boshqa worker) aynan shu varaqa qayta hisoblanadi
+        self.client.logout()
+        self.client.force_login(self.student)
+        resp = self.client.get(self.url)
+        self.assertEqual([q.id for q in resp.context['questions']], first_ids)
+        self.assertEqual({k: [o.id for o in v] for k, v in resp.context['choice_options_dict'].items()}, first_opts)
+        self.assertEqual(StudentTest.objects.filter(student=self.student, test=self.test).count(), 1)
+
+    def test_submit_uses_stored_paper(self):
+        self.client.get(self.url)
+        st = StudentTest.objects.get(student=self.student, test=self.test)
+        post = {}
+        for qid in st.question_ids:
+            post[f'question_{qid}'] = self.correct_option(qid)
+        resp = self.submit(post)
+        self.assertEqual(resp.status_code, 302)
+        st.refresh_from_db()
+        self.assertTrue(st.completed)
+        self.assertEqual(st.total_score, 3)
+        self.assertEqual((st.answered_count, st.correct_count, st.percent), (3, 3, 100))
+
+
+class AutosaveTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.get(self.url)
+        self.st = StudentTest.objects.get(student=self.student, test=self.test)
+        self.autosave_url = reverse('testapi_autosave', args=[self.test.id])
+
+    def test_autosave_upserts_answers(self):
+        qid = self.st.question_ids[0]
+        resp = self.client.post(self.autosave_url, {'question_ids': [qid], f'question_{qid}': self.wrong_option(qid)})
+        self.assertEqual(resp.json(), {'saved': [qid]})
+        resp = self.client.post(self.autosave_url, {'question_ids': [qid], f'question_{qid}': self.correct_option(qid)})
+        answers = StudentAnswer.objects.filter(student_test=self.st)
+        self.assertEqual(answers.count(), 1)
+        self.assertTrue(answers.get().is_correct)
+        # Varaqada yo'q savol saqlanmaydi
+        other = TestQuestion.objects.filter(test=self.test).exclude(question_id__in=self.st.question_ids).first()
+        resp = self.client.post(self.autosave_url, {'question_ids': [other.question_id]})
+        self.assertEqual(resp.json(), {'saved': []})
+
+    def test_page_restores_saved_answers(self):
+        qid = self.st.question_ids[1]
+        option = self.correct_option(qid)
+        self.client.post(self.autosave_url, {'question_ids': [qid], f'question_{qid}': option})
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.context['saved_answers'][qid]['options'], [int(option)])
+
+    def test_final_submit_uses_stored_scores(self):
+        q1, q2, q3 = self.st.question_ids
+        self.client.post(self.autosave_url, {'question_ids': [q1, q2], f'question_{q1}': self.correct_option(q1),
+                                             f'question_{q2}': self.correct_option(q2)})
+        # q2 keyin o'zgartirilgan, lekin autosave yetib bormagan (pending); q3 umuman belgilanmagan
+        resp = self.submit({'autosave_mode': '1', 'pending_questions': str(q2),
+                            f'question_{q2}': self.wrong_option(q2)})
+        self.assertEqual(resp.status_code, 302)
+        self.st.refresh_from_db()
+        self.assertTrue(self.st.completed)
+        self.assertEqual(self.st.total_score, 1)
+        self.assertEqual(StudentAnswer.objects.filter(student_test=self.st).count(), 3)
+
+
+class AdmissionTests(ExamTestCase):
+
+    def test_single_query_decision(self):
+        with self.assertNumQueries(1):
+            admission = admit(self.student, self.test)
+        self.assertTrue(admission)
+        self.assertIsNone(admission.attempt)
+        self.client.get(self.url)
+        st = StudentTest.objects.get(student=self.student, test=self.test)
+        with self.assertNumQueries(1):
+            self.assertEqual(admit(self.student, self.test).attempt, st)
+
+    def test_completed_attempt_blocks(self):
+        StudentTest.objects.create(student=self.student, test=self.test, subject=self.subject, completed=True)
+        self.assertFalse(admit(self.student, self.test))
+        resp = self.client.get(self.url)
+        self.assertTemplateUsed(resp, 'test_api/already_participated.html')
+        # Boshqa test, lekin shu fan/guruh/semestr – legacy kombinatsiya ham bloklanadi
+        other = TestModel.objects.create(subject=self.subject, question_count=1, total_score=1,
+                                        duration=timedelta(minutes=5), minutes=5)
+        self.assertEqual(admit_many(self.student, [other])[other.id].reason, 'participated')
+
+    def test_retake_allows_new_attempt(self):
+        StudentTest.objects.create(student=self.student, test=self.test, subject=self.subject,
+                                   completed=True, can_retake=True)
+        self.assertTrue(admit(self.student, self.test))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_rest_create_blocks_parallel_attempt_on_same_subject(self):
+        api = APIClient()
+        api.force_authenticate(self.student)
+        other = TestModel.objects.create(subject=self.subject, question_count=1, total_score=1,
+                                        duration=timedelta(minutes=5), minutes=5)
+        # Boshqa testdagi yakunlanmagan urinish – (guruh, fan, semestr) bo'yicha bloklaydi
+        StudentTest.objects.create(student=self.student, test=other, subject=self.subject)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = api.post('/api/student-tests/', {'test': self.test.id})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'main_studenttest' in q['sql']]), 1)
+        StudentTest.objects.filter(test=other).update(completed=True, can_retake=True)
+        resp = api.post('/api/student-tests/', {'test': self.test.id})
+        self.assertEqual(resp.status_code, 201)
+
+
+@override_settings(EXAM_ADMISSION_PER_TEST=1)
+class ExamQueueTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.status_url = reverse('testapi_queue_status', args=[self.test.id])
+
+    def test_over_budget_student_waits_then_enters(self):
+        # Boshqa talaba varaqasi yaratilmoqda – slot band
+        slot = exam_queue._acquire_slot(self.test.id)
+        self.assertIsNotNone(slot)
+        resp = self.client.get(self.url)
+        self.assertTemplateUsed(resp, 'test_api/waiting.html')
+        self.assertFalse(StudentTest.objects.filter(student=self.student).exists())
+        self.assertEqual(self.client.get(self.status_url).json(), {'ready': False, 'ahead': 0})
+
+        exam_queue.release_slot(slot)
+        self.assertTrue(self.client.get(self.status_url).json()['ready'])
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(StudentTest.objects.filter(student=self.student, test=self.test).exists())
+        # So'rov tugagach slot qaytarilgan
+        self.assertEqual(exam_queue.free_slots(self.test.id), 1)
+
+    def test_newcomer_does_not_jump_queue(self):
+        exam_queue.take_ticket(self.test.id)
+        resp = self.client.get(self.url)
+        self.assertTemplateUsed(resp, 'test_api/waiting.html')
+        self.assertEqual(self.client.get(self.status_url).json()['ahead'], 1)
+
+    def test_abandoned_ticket_does_not_block_queue(self):
+        # Oldingi talaba tabni yopgan: raqami bor, lekin heartbeat kelmayapti
+        ticket = exam_queue.take_ticket(self.test.id)
+        ExamQueueEntry.objects.filter(id=ticket).update(
+            heartbeat=timezone.now() - timedelta(seconds=exam_queue.TICKET_TIMEOUT + 1))
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(StudentTest.objects.filter(student=self.student, test=self.test).exists())
+        self.assertFalse(exam_queue.heartbeat(ticket))
+
+    def test_queue_is_shared_between_workers(self):
+        # Slot va raqamlar bazada: boshqa worker (kesh emas) olgan slot ham byudjetga kiradi
+        slot = exam_queue._acquire_slot(self.test.id)
+        cache.clear()
+        self.assertIsNone(exam_queue._acquire_slot(self.test.id))
+        exam_queue.release_slot(slot)
+        self.assertEqual(exam_queue.free_slots(self.test.id), 1)
+
+
+@override_settings(EXAM_VARIANT_COUNT=3)
+class VariantTests(ExamTestCase):
+
+    def test_attempt_uses_stored_variant(self):
+        self.assertEqual(generate_variants(self.test.id), 3)
+        resp = self.client.get(self.url)
+        st = StudentTest.objects.get(student=self.student, test=self.test)
+        variant = TestVariant.objects.get(test=self.test, number=st.id % 3)
+        self.assertEqual(st.variant, variant)
+        self.assertEqual([q.id for q in resp.context['questions']], variant.question_ids)
+        qid = variant.question_ids[0]
+        self.assertEqual([o.id for o in resp.context['choice_options_dict'][qid]], variant.option_orders[str(qid)])
+        # Sahifa variantdagi HTML bo'laklardan yig'iladi (shablon qayta render qilinmaydi)
+        self.assertTemplateNotUsed(resp, 'test_api/partials/_choice_option.html')
+        post = {f'question_{qid}': self.correct_option(qid) for qid in variant.question_ids}
+        self.submit(post)
+        st.refresh_from_db()
+        self.assertEqual(st.total_score, 3)
+
+    def test_stale_variant_not_assigned(self):
+        generate_variants(self.test.id)
+        opt = AnswerOption.objects.filter(question__test_questions__test=self.test).first()
+        opt.text = 'yangi'
+        opt.save()
+        self.client.get(self.url)
+        st = StudentTest.objects.get(student=self.student, test=self.test)
+        self.assertIsNone(st.variant)
+        self.assertEqual(len(st.question_ids), 3)
+
+    @override_settings(BACKGROUND_TASKS_SYNC=True)
+    def test_assign_generates_variants(self):
+        controller = User.objects.create_user(username='ctrl', password='pass', role='controller')
+        self.client.force_login(controller)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('assign_test_bulim', args=[self.test.id]), {'active': '1'})
+        self.assertEqual(TestVariant.objects.filter(test=self.test).count(), 3)
+
+
+class SubmissionJournalTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.get(self.url)
+        self.st = StudentTest.objects.get(student=self.student, test=self.test)
+        self.post = {f'question_{qid}': self.correct_option(qid) for qid in self.st.question_ids}
+
+    def test_submission_acknowledged_before_grading(self):
+        # Fon baholash hali ishlamagan (jarayon qulagan holat)
+        resp = self.client.post(self.url, self.post)
+        self.assertEqual(resp.status_code, 302)
+        self.st.refresh_from_db()
+        self.assertTrue(self.st.completed)
+        self.assertFalse(StudentAnswer.objects.filter(student_test=self.st).exists())
+        resp = self.client.get(reverse('testapi_result', args=[self.st.id]))
+        self.assertTemplateUsed(resp, 'test_api/grading.html')
+
+        # Qayta ishga tushganda jurnal qayta o'ynatiladi; ikkinchi replay hech narsani o'zgartirmaydi
+        self.assertEqual(replay_pending(), 1)
+        self.assertEqual(replay_pending(), 0)
+        self.st.refresh_from_db()
+        self.assertEqual(self.st.total_score, 3)
+        self.assertEqual(StudentAnswer.objects.filter(student_test=self.st).count(), 3)
+        self.assertEqual(Submission.objects.get(student_test=self.st).status, 'graded')
+        resp = self.client.get(reverse('testapi_result', args=[self.st.id]))
+        self.assertTemplateUsed(resp, 'test_api/result.html')
+
+    def test_locked_database_keeps_submission_pending(self):
+        self.client.post(self.url, self.post)
+        locked = OperationalError('database is locked')
+        with mock.patch('main.submissions.get_answer_key', side_effect=locked):
+            self.assertEqual(replay_pending(), 0)
+        submission = Submission.objects.get(student_test=self.st)
+        # Vaqtinchalik xato: pending qoladi, band belgisi olinadi – keyingi replay qayta baholaydi
+        self.assertEqual((submission.status, submission.claimed_at, submission.attempts), ('pending', None, 1))
+        self.assertEqual(replay_pending(), 1)
+        self.assertEqual(Submission.objects.get(student_test=self.st).status, 'graded')
+
+    def test_locked_database_retries_are_bounded(self):
+        self.client.post(self.url, self.post)
+        with mock.patch('main.submissions.get_answer_key', side_effect=OperationalError('database is locked')):
+            for _ in range(MAX_ATTEMPTS):
+                replay_pending()
+        self.assertEqual(Submission.objects.get(student_test=self.st).status, 'failed')
+        self.assertEqual(replay_pending(include_failed=True), 1)
+
+    def test_grading_page_resumes_stale_claim(self):
+        # Worker baholash o'rtasida qulagan va CLAIM_TIMEOUT ichida qayta ishga tushgan: ishga tushishdagi replay o'tkazib yuboradi
+        self.client.post(self.url, self.post)
+        Submission.objects.filter(student_test=self.st).update(claimed_at=timezone.now())
+        self.assertEqual(replay_pending(), 0)
+        url = reverse('testapi_result', args=[self.st.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTemplateUsed(self.client.get(url), 'test_api/grading.html')
+        self.assertEqual(Submission.objects.get(student_test=self.st).status, 'pending')
+
+        Submission.objects.filter(student_test=self.st).update(claimed_at=timezone.now() - timedelta(minutes=6))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url)
+        self.assertEqual(Submission.objects.get(student_test=self.st).status, 'graded')
+        self.assertTemplateUsed(self.client.get(url), 'test_api/result.html')
+
+
+class LiveMonitorChangesTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.get(self.url)
+        self.st = StudentTest.objects.get(student=self.student, test=self.test)
+        self.controller = Client()
+        self.controller.force_login(User.objects.create_user(username='ctrl', password='pass', role='controller'))
+        self.changes_url = reverse('live_monitor_changes')
+
+    def poll(self, cursor=None):
+        params = {'test_id': self.test.id}
+        if cursor is not None:
+            params['cursor'] = cursor
+        resp = self.controller.get(self.changes_url, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_snapshot_then_delta_from_database(self):
+        data = self.poll()
+        self.assertEqual(data['type'], 'snapshot')
+        self.assertEqual([row['id'] for row in data['students']], [self.st.id])
+        self.assertEqual(data['students'][0]['answers_count'], 0)
+        cursor = data['cursor']
+
+        qid = self.st.question_ids[0]
+        self.client.post(reverse('testapi_autosave', args=[self.test.id]),
+                         {'question_ids': [qid], f'question_{qid}': self.correct_option(qid)})
+        # O'zgarish va sonlar bazadan olinadi – boshqa worker yozgan bo'lsa ham ko'rinadi
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.poll(cursor)
+        self.assertFalse(any('main_studentanswer' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(sum('main_studenttest' in q['sql'] for q in ctx.captured_queries), 1)
+        self.assertEqual(data['type'], 'delta')
+        self.assertGreaterEqual(data['cursor'], cursor)
+        self.assertEqual([row['id'] for row in data['rows']], [self.st.id])
+        self.assertEqual((data['rows'][0]['answers_count'], data['rows'][0]['correct_count']), (1, 1))
+
+    def test_cursor_returns_only_changed_rows(self):
+        cursor = self.poll()['cursor']
+        # Kursordan oldin o'zgargan qator qayta yuborilmaydi
+        StudentTest.objects.filter(id=self.st.id).update(last_activity=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.poll(cursor)['rows'], [])
+        # Juda eski (yoki noto'g'ri) kursor – to'liq snapshot
+        self.assertEqual(self.poll(0)['type'], 'snapshot')
+        self.assertEqual(self.poll('abc')['type'], 'snapshot')
+
+    def test_changes_requires_controller(self):
+        resp = self.client.get(self.changes_url, {'test_id': self.test.id})
+        self.assertNotEqual(resp.status_code, 200)
+
+
+class LiveCountersTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.get(self.url)
+        self.st = StudentTest.objects.get(student=self.student, test=self.test)
+        self.autosave_url = reverse('testapi_autosave', args=[self.test.id])
+
+    def counters(self):
+        data = live_counters.test_counters(self.test.id)
+        return tuple(data[field] for field in ('started', 'answered', 'correct', 'completed'))
+
+    def test_write_path_updates_counters(self):
+        self.assertEqual(self.counters(), (1, 0, 0, 0))
+        q1, q2, _ = self.st.question_ids
+        self.client.post(self.autosave_url, {'question_ids': [q1, q2], f'question_{q1}': self.correct_option(q1),
+                                             f'question_{q2}': self.wrong_option(q2)})
+        self.assertEqual(self.counters(), (1, 2, 1, 0))
+        self.st.refresh_from_db()
+        self.assertEqual((self.st.answered_count, self.st.correct_count), (2, 1))
+        # Qayta saqlash ustidan yozadi, ikki marta sanalmaydi
+        self.client.post(self.autosave_url, {'question_ids': [q1], f'question_{q1}': self.wrong_option(q1)})
+        self.assertEqual(self.counters(), (1, 2, 0, 0))
+        self.submit({f'question_{qid}': self.correct_option(qid) for qid in self.st.question_ids})
+        self.assertEqual(self.counters(), (1, 3, 3, 1))
+        self.assertIsNotNone(live_counters.test_counters(self.test.id)['last_activity'])
+
+    def test_monitor_reads_counters_not_answers(self):
+        qid = self.st.question_ids[0]
+        self.client.post(self.autosave_url, {'question_ids': [qid], f'question_{qid}': self.correct_option(qid)})
+        with CaptureQueriesContext(connection) as ctx:
+            data = live_monitor.snapshot(self.test)
+        self.assertFalse(any('main_studentanswer' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual((data['students'][0]['answers_count'], data['students'][0]['correct_count']), (1, 1))
+
+        # Hisoblagichlar keshda emas – boshqa worker ham xuddi shu sonlarni ko'radi
+        cache.clear()
+        data = live_monitor.snapshot(self.test)
+        self.assertEqual(data['students'][0]['answers_count'], 1)
+
+    def test_reconcile_corrects_drift(self):
+        live_monitor.reconcile(self.test.id)
+        qid = self.st.question_ids[0]
+        # Hisoblagichlarni chetlab o'tgan yozuv
+        StudentAnswer.objects.create(student_test=self.st, question_id=qid, is_correct=True, score=1)
+        self.assertEqual(self.counters(), (1, 0, 0, 0))
+        StudentTest.objects.filter(id=self.st.id).update(last_activity=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(live_monitor.reconcile(self.test.id), [self.st.id])
+        self.assertEqual(self.counters(), (1, 1, 1, 0))
+        # Tuzatilgan qator kuzatuvchilarga delta sifatida boradi
+        self.st.refresh_from_db()
+        self.assertGreater(self.st.last_activity, timezone.now() - timedelta(seconds=30))
+        self.assertEqual(live_monitor.reconcile(self.test.id), [])
+
+    def test_reconcile_command(self):
+        StudentAnswer.objects.create(student_test=self.st, question_id=self.st.question_ids[0], is_correct=False)
+        out = io.StringIO()
+        call_command('reconcile_live_counters', '--test', str(self.test.id), stdout=out)
+        self.assertIn('1 ta urinish tuzatildi', out.getvalue())
+        self.assertEqual(self.counters(), (1, 1, 0, 0))
+
+
+class ExamDayOverviewTests(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        faculty = Faculty.objects.create(university=University.objects.create(name='TDTU'), name='IT')
+        self.group_a = Group.objects.create(faculty=faculty, name='101')
+        self.group_b = Group.objects.create(faculty=faculty, name='102')
+        self.test.groups.add(self.group_a, self.group_b)
+        self.student.group = self.group_a
+        self.student.save()
+        User.objects.create_user(username='b1', password='pass', role='student', group=self.group_b)
+        User.objects.create_user(username='b2', password='pass', role='student', group=self.group_b)
+        other = User.objects.create_user(username='a2', password='pass', role='student', group=self.group_a)
+        self.client.get(self.url)
+        st = StudentTest.objects.get(student=self.student, test=self.test)
+        qid = st.question_ids[0]
+        self.client.post(reverse('testapi_autosave', args=[self.test.id]),
+                         {'question_ids': [qid], f'question_{qid}': self.correct_option(qid)})
+        self.client.force_login(other)
+        self.client.get(self.url)
+        self.controller = Client()
+        self.controller.force_login(User.objects.create_user(username='ctrl', password='pass', role='controller'))
+
+    def test_overview_from_counters(self):
+        data = self.controller.get(reverse('exam_day_data')).json()
+        self.assertEqual(data['summary'], {'tests': 1, 'running': 1, 'participants': 2, 'in_progress': 2, 'completed': 0})
+        row = data['tests'][0]
+        self.assertEqual((row['participants'], row['in_progress'], row['participation']), (2, 2, 50))
+        self.assertEqual(row['avg_progress'], 17)  # 1 / (2 × 3)
+        groups = {g['name']: g for g in row['groups']}
+        self.assertEqual((groups['101']['participants'], groups['101']['participation']), (2, 100))
+        self.assertEqual(groups['102']['participants'], 0)
+        self.assertEqual([g['name'] for g in row['lagging']], ['102'])
+        # Sessiya, foydalanuvchi, testlar/guruhlar/talabalar soni va bitta agregat – kesh yo'q, StudentAnswer o'qilmaydi
+        with CaptureQueriesContext(connection) as ctx:
+            self.controller.get(reverse('exam_day_data'))
+        self.assertEqual(len(ctx.captured_queries), 6)
+        self.assertFalse(any('main_studentanswer' in q['sql'] for q in ctx.captured_queries))
+        # Boshqa worker yozgan o'zgarish darhol ko'rinadi
+        StudentTest.objects.filter(test=self.test, student=self.student).update(completed=True)
+        self.assertEqual(self.controller.get(reverse('exam_day_data')).json()['summary']['completed'], 1)
+
+    def test_page_links_to_monitor(self):
+        resp = self.controller.get(reverse('exam_day'))
+        self.assertContains(resp, reverse('live_monitor'))
+        self.assertContains(resp, reverse('exam_day_data'))
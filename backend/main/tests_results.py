@@ -0,0 +1,578 @@
+import csv
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from importlib import import_module
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from .answer_key import get_answer_key
+from .export_jobs import EXPORT_KINDS, fingerprint
+from .models import ExportJob, Faculty, Group, Kafedra, PdfVerification, ResultRollup, StudentTest, Subject, University
+from .pdf_blocks import report_styles
+from .pdf_verification import issue_token
+from .rollups import refresh_rollups
+from .subject_report import build_batch_zip
+from .roster import non_participants
+from .scoring import grade_submission, refresh_result_counters
+from .tests_scoring import make_exam
+
+User = get_user_model()
+
+
+class ResultsExplorerTests(TestCase):
+    def setUp(self):
+        faculty = Faculty.objects.create(university=University.objects.create(name='TDTU'), name='IT')
+        self.group = Group.objects.create(faculty=faculty, name='101')
+        self.subject = Subject.objects.create(name='Fizika')
+        self.test, self.post = make_exam(self.subject)
+        self.test.pass_percent = 50
+        self.test.save()
+        self.controller = User.objects.create_user(username='ctrl', password='pass', role='controller')
+        self.client.force_login(self.controller)
+
+    def attempt(self, username, group=None, correct=True):
+        student = User.objects.create_user(username=username, password='pass', role='student', first_name=username.title())
+        st = StudentTest.objects.create(student=student, test=self.test, group=group, completed=True)
+        post = self.post if correct else {}
+        created = grade_submission(st, get_answer_key(self.test).questions, post)
+        st.total_score = sum(sa.score for sa in created)
+        refresh_result_counters([st])
+        st.save()
+        return st
+
+    def test_page_renders_summaries_without_loading_attempts(self):
+        for n in range(5):
+            self.attempt(f'stud{n}', group=self.group, correct=n % 2 == 0)
+        self.attempt('guest')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('testapi_all_results'))
+        self.assertEqual(response.status_code, 200)
+        subject = response.context['subjects'][0]
+        self.assertEqual((subject['attempts'], subject['passed']), (6, 4))
+        groups = {row['group_name']: row for row in subject['groups']}
+        self.assertEqual(groups['101']['attempts'], 5)
+        self.assertEqual(groups["NOMA'LUM GURUH"]['attempts'], 1)
+        # Sahifa faqat agregat xulosalarni oladi: javoblar umuman o'qilmaydi, urinishlar render qilinmaydi
+        self.assertFalse([q for q in ctx.captured_queries if 'main_studentanswer' in q['sql']])
+        self.assertNotContains(response, 'stud1')
+
+    def test_students_endpoint_filters_sorts_and_pages(self):
+        for n in range(30):
+            self.attempt(f'stud{n:02d}', group=self.group, correct=n < 10)
+        url = reverse('results_explorer_students')
+        params = {'subject_id': self.subject.id, 'node': f'g:{self.group.id}', 'sort': '-percent'}
+        data = self.client.get(url, params).json()
+        self.assertEqual((data['count'], data['num_pages'], len(data['results'])), (30, 2, 25))
+        self.assertTrue(data['results'][0]['passed'])
+        self.assertEqual(data['results'][0]['correct'], 6)
+        self.assertFalse(data['results'][-1]['passed'])
+
+        data = self.client.get(url, dict(params, q='stud0')).json()
+        self.assertEqual(data['count'], 10)
+        data = self.client.get(url, {'subject_id': self.subject.id, 'node': ''}).json()
+        self.assertEqual(data['count'], 0)
+
+    def test_containers_follow_legacy_grouping(self):
+        kafedra = Kafedra.objects.create(faculty=self.group.faculty, name='Fizika kafedrasi')
+        self.test.kafedralar.add(kafedra)
+        tutor = self.attempt('tutor')
+        User.objects.filter(id=tutor.student_id).update(role='tutor', kafedra=kafedra)
+        # Urinishda guruh yozilmagan, lekin talabaning guruhi test.groups ichida
+        student = self.attempt('stud')
+        User.objects.filter(id=student.student_id).update(group=self.group)
+        url = reverse('testapi_all_results')
+
+        nodes = {row['group_name']: row for row in self.client.get(url).context['subjects'][0]['groups']}
+        # Guruhi yo'q test: tutor va talaba kafedra konteyneriga tushadi
+        self.assertEqual(list(nodes), ['Kafedra: Fizika kafedrasi'])
+        self.assertEqual((nodes['Kafedra: Fizika kafedrasi']['attempts'], nodes['Kafedra: Fizika kafedrasi']['container_type']),
+                         (2, 'kafedra'))
+        data = self.client.get(reverse('results_explorer_students'),
+                               {'subject_id': self.subject.id, 'node': f'k:{kafedra.id}'}).json()
+        self.assertEqual(data['count'], 2)
+
+        self.test.groups.add(self.group)
+        nodes = {row['group_name']: row for row in self.client.get(url).context['subjects'][0]['groups']}
+        self.assertEqual(nodes['101']['attempts'], 2)
+
+    def test_answers_endpoint_pages_details(self):
+        st = self.attempt('stud', group=self.group)
+        data = self.client.get(reverse('results_explorer_answers', args=[st.id])).json()
+        self.assertEqual(data['count'], 6)
+        texts = {row['question']: row for row in data['results']}
+        self.assertEqual(texts['2+2?']['user_answer'], '4')
+        self.assertTrue(texts['2+2?']['is_correct'])
+
+    def test_students_cannot_browse_results(self):
+        st = self.attempt('stud', group=self.group)
+        self.client.force_login(st.student)
+        self.assertEqual(self.client.get(reverse('results_explorer_answers', args=[st.id])).status_code, 403)
+
+
+class StreamingExcelExportTests(TestCase):
+    def setUp(self):
+        faculty = Faculty.objects.create(university=University.objects.create(name='TDTU'), name='IT')
+        self.group = Group.objects.create(faculty=faculty, name='101')
+        self.test, self.post = make_exam(Subject.objects.create(name='Fizika'))
+        self.test.group = self.group
+        self.test.save()
+        self.client.force_login(User.objects.create_user(username='ctrl', password='pass', role='controller'))
+
+    def attempts(self, count):
+        for _ in range(count):
+            student = User.objects.create_user(username=f'stud{self.test.student_tests.count()}', password='pass',
+                                               role='student', group=self.group)
+            st = StudentTest.objects.create(student=student, test=self.test, completed=True)
+            grade_submission(st, get_answer_key(self.test).questions, self.post)
+            refresh_result_counters([st])
+
+    def workbook(self, response):
+        self.assertTrue(response.streaming)
+        return load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_container_export_streams_counters(self):
+        self.attempts(3)
+        response = self.client.get(reverse('export_students_by_group_excel', args=[self.group.id]))
+        ws = self.workbook(response).active
+        rows = list(ws.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'Talaba F.I.Sh.')
+        self.assertEqual(ws['A1'].font.bold, True)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][5:8], (6, 6, 0))
+
+    def test_detail_export_query_count_does_not_grow_with_attempts(self):
+        url = reverse('export_group_results', args=[self.group.id])
+        self.attempts(2)
+        with CaptureQueriesContext(connection) as small:
+            rows_small = list(self.workbook(self.client.get(url)).active.iter_rows(values_only=True))
+        self.attempts(6)
+        with CaptureQueriesContext(connection) as large:
+            rows_large = list(self.workbook(self.client.get(url)).active.iter_rows(values_only=True))
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+        self.assertEqual((len(rows_small), len(rows_large)), (1 + 2 * 6, 1 + 8 * 6))
+        by_question = {row[10]: row for row in rows_large[1:]}
+        self.assertEqual(by_question['2+2?'][11:14], ('4', '4', "To'g'ri"))
+
+
+class ResultsExportPipelineTests(StreamingExcelExportTests):
+    def csv_rows(self, response):
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(text)))
+
+    def test_query_count_is_constant_for_every_format(self):
+        url = reverse('export_results')
+        for params in ({'format': 'csv'}, {'format': 'csv', 'detail': '1'}, {'format': 'xlsx', 'detail': '1'},
+                       {'format': 'pdf'}):
+            User.objects.filter(role='student').delete()
+            self.attempts(2)
+            with CaptureQueriesContext(connection) as small:
+                b''.join(self.client.get(url, params).streaming_content)
+            self.attempts(5)
+            with CaptureQueriesContext(connection) as large:
+                response = self.client.get(url, params)
+                b''.join(response.streaming_content)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(large.captured_queries), len(small.captured_queries), params)
+
+    def test_filter_spec_selects_rows(self):
+        self.attempts(2)
+        other = Group.objects.create(faculty=self.group.faculty, name='102')
+        outsider = User.objects.create_user(username='zz', password='pass', role='student', group=other)
+        StudentTest.objects.create(student=outsider, test=self.test, completed=True)
+        rows = self.csv_rows(self.client.get(reverse('export_results'), {'format': 'csv', 'group': self.group.id,
+                                                                         'role': 'student'}))
+        self.assertEqual(rows[0][:2], ['F.I.Sh.', 'Username'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len(self.csv_rows(self.client.get(reverse('export_results'), {'format': 'csv'}))), 4)
+        self.assertEqual(self.client.get(reverse('export_results'), {'group': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_results'), {'format': 'doc'}).status_code, 400)
+
+    def test_employee_is_limited_to_own_group(self):
+        self.attempts(1)
+        other = Group.objects.create(faculty=self.group.faculty, name='102')
+        self.client.force_login(User.objects.create_user(username='emp', password='pass', role='employee',
+                                                         group=other))
+        self.assertEqual(len(self.csv_rows(self.client.get(reverse('export_results'), {'format': 'csv'}))), 1)
+        response = self.client.get(reverse('export_results'), {'format': 'csv', 'test_group': self.group.id})
+        self.assertEqual(response.status_code, 403)
+
+
+class AnswersCsvTests(StreamingExcelExportTests):
+    def rows(self, **params):
+        response = self.client.get(reverse('export_answers_csv'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        text = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(text)))
+
+    def test_streams_one_row_per_answer_with_single_query(self):
+        self.attempts(2)
+        with CaptureQueriesContext(connection) as small:
+            rows = self.rows()
+        self.attempts(4)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(len(self.rows()), 6 * 6)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+        self.assertEqual(len(rows), 2 * 6)
+        self.assertEqual((rows[0]['subject'], rows[0]['group'], rows[0]['is_correct']), ('Fizika', '101', '1'))
+
+    def test_filters(self):
+        self.attempts(1)
+        self.assertEqual(len(self.rows(test=self.test.id)), 6)
+        self.assertEqual(self.rows(test=self.test.id + 1), [])
+        today = timezone.localdate()
+        self.assertEqual(len(self.rows(date_from=today.isoformat(), date_to=today.isoformat())), 6)
+        self.assertEqual(self.rows(date_from=(today + timedelta(days=1)).isoformat()), [])
+        self.assertEqual(self.client.get(reverse('export_answers_csv'), {'date_to': '18.10'}).status_code, 400)
+
+    def test_command_writes_file(self):
+        self.attempts(1)
+        with tempfile.NamedTemporaryFile(suffix='.csv') as tmp:
+            call_command('export_answers_csv', '--subject', str(self.test.subject_id), '-o', tmp.name,
+                         stdout=io.StringIO())
+            with open(tmp.name, encoding='utf-8-sig') as fh:
+                self.assertEqual(len(list(csv.reader(fh))), 1 + 6)
+
+    def test_student_is_forbidden(self):
+        self.client.force_login(User.objects.create_user(username='s', password='pass', role='student'))
+        self.assertEqual(self.client.get(reverse('export_answers_csv')).status_code, 403)
+
+
+class FailedExportTests(TestCase):
+    def test_failed_pdf_lists_failed_attempts(self):
+        faculty = Faculty.objects.create(university=University.objects.create(name='TDTU'), name='IT')
+        group = Group.objects.create(faculty=faculty, name='101')
+        test, _ = make_exam(Subject.objects.create(name='Fizika'))
+        student = User.objects.create_user(username='stud', password='pass', role='student', group=group)
+        st = StudentTest.objects.create(student=student, test=test, group=group, completed=True)
+        grade_submission(st, get_answer_key(test).questions, {})
+        refresh_result_counters([st])
+        self.client.force_login(User.objects.create_user(username='ctrl', password='pass', role='controller'))
+        response = self.client.get(reverse('export_failed_pdf'), {'group_id': group.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+
+class SubjectReportPdfTests(TestCase):
+    def setUp(self):
+        faculty = Faculty.objects.create(university=University.objects.create(name='TDTU'), name='IT')
+        self.group = Group.objects.create(faculty=faculty, name='101')
+        for name in ('Fizika', 'Kimyo'):
+            test, post = make_exam(Subject.objects.create(name=name))
+            student = User.objects.create_user(username=f'stud_{name}', password='pass', role='student',
+                                               group=self.group)
+            st = StudentTest.objects.create(student=student, test=test, group=self.group, completed=True)
+            grade_submission(st, get_answer_key(test).questions, post)
+            refresh_result_counters([st])
+        self.client.force_login(User.objects.create_user(username='ctrl', password='pass', role='controller'))
+
+    @override_settings(BACKGROUND_TASKS_SYNC=True)
+    def test_subject_pdf_uses_cached_blocks(self):
+        self.assertIs(report_styles(), report_styles())
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.get(reverse('export_subject_results_pdf', args=['Fizika']), {'group': '101'})
+            # Audit yozuvi so'rov ichida emas, commitdan keyin yoziladi
+            self.assertFalse(PdfVerification.objects.exists())
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(PdfVerification.objects.get().record_count, 1)
+
+    @override_settings(BACKGROUND_TASKS_SYNC=True)
+    def test_batch_zip_contains_one_pdf_per_subject_and_group(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse('export_subject_results_zip'), {'group': '101'})
+        # ZIP so'rov ichida qurilmaydi – eksport navbatiga qo'yiladi
+        self.assertEqual((response.status_code, response.json()['kind']), (202, 'subject_results_zip'))
+        with override_settings(MEDIA_ROOT=media):
+            status = self.client.get(response.json()['status_url']).json()
+            self.assertEqual(status['status'], 'done')
+            download = self.client.get(status['download_url'])
+            self.assertEqual(download['Content-Type'], 'application/zip')
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(download.streaming_content)))
+        self.assertEqual(archive.namelist(), ['Fizika_101_test_natijalari.pdf', 'Kimyo_101_test_natijalari.pdf'])
+        self.assertTrue(all(archive.read(name).startswith(b'%PDF') for name in archive.namelist()))
+
+    @override_settings(BACKGROUND_TASKS_SYNC=True)
+    def test_batch_zip_names_do_not_collide(self):
+        # "101" va "101?" get_valid_filename dan keyin bir xil nom beradi – ikkinchisi ustidan yozilmasin
+        buffer = io.BytesIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            count = build_batch_zip(buffer, [('Fizika', '101'), ('Fizika', '101?')], {}, None, 'http://testserver/')
+        archive = zipfile.ZipFile(buffer)
+        self.assertEqual(count, 2)
+        self.assertEqual(archive.namelist(), ['Fizika_101_test_natijalari.pdf', 'Fizika_101_test_natijalari_2.pdf'])
+        self.assertEqual(PdfVerification.objects.count(), 2)
+
+    def test_signed_token_verifies_without_database(self):
+        token = issue_token('Fizika', 12, issued_at=1700000000)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('verify_qr', args=[token]))
+        self.assertFalse(ctx.captured_queries)
+        self.assertEqual(response.context['status'], 'valid')
+        self.assertEqual((response.context['subject'], response.context['count']), ('Fizika', 12))
+        self.assertIn('public', response['Cache-Control'])
+
+        body, _, signature = token.partition('.')
+        forged = issue_token('Fizika', 99, issued_at=1700000000).partition('.')[0] + '.' + signature
+        self.assertEqual(self.client.get(reverse('verify_qr', args=[forged])).context['status'], 'invalid')
+
+    def test_legacy_hash_is_read_once_and_cached(self):
+        PdfVerification.objects.create(hash_code='a' * 32, subject_name='Kimyo', record_count=3, payload='x')
+        url = reverse('verify_qr', args=['a' * 32])
+        self.assertEqual(self.client.get(url).context['subject'], 'Kimyo')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).context['status'], 'valid')
+        self.assertFalse([q for q in ctx.captured_queries if 'main_pdfverification' in q['sql']])
+
+    def test_batch_zip_requires_controller(self):
+        self.client.force_login(User.objects.get(username='stud_Fizika'))
+        self.assertEqual(self.client.get(reverse('export_subject_results_zip')).status_code, 403)
+
+
+@override_settings(BACKGROUND_TASKS_SYNC=True)
+class ExportJobTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.controller = User.objects.create_user(username='ctrl', password='pass', role='controller')
+        User.objects.create_user(username='stud', password='pass', role='student', first_name='Ali')
+        self.client.force_login(self.controller)
+
+    def create(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('export_job_create'), dict({'kind': 'users_excel'}, **data))
+
+    def test_job_runs_in_background_and_is_downloadable(self):
+        response = self.create(filter_role='student')
+        self.assertEqual(response.status_code, 202)
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'done')
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download.status_code, 200)
+        rows = list(load_workbook(io.BytesIO(b''.join(download.streaming_content))).active.iter_rows(values_only=True))
+        self.assertEqual([row[0] for row in rows], ['Ism', 'Ali'])
+
+    def test_progress_follows_writer_rows(self):
+        for i in range(19):
+            User.objects.create_user(username=f'stud{i}', password='pass', role='student')
+        with CaptureQueriesContext(connection) as ctx:
+            job = self.create(filter_role='student').json()
+        updates = [q['sql'] for q in ctx.captured_queries
+                   if q['sql'].startswith('UPDATE "main_exportjob" SET "progress"')]
+        # 20 qator, har 5% da bitta yozuv
+        self.assertEqual(len(updates), 19)
+        status = self.client.get(job['status_url']).json()
+        self.assertEqual((status['status'], status['progress']), ('done', 100))
+
+    def test_identical_request_reuses_job_until_data_changes(self):
+        first = self.create(filter_role='student').json()
+        again = self.create(filter_role='student')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual((again.json()['id'], again.json()['reused']), (first['id'], True))
+        self.assertEqual(ExportJob.objects.count(), 1)
+        User.objects.create_user(username='stud2', password='pass', role='student')
+        changed = self.create(filter_role='student')
+        self.assertEqual(changed.status_code, 202)
+        self.assertNotEqual(changed.json()['id'], first['id'])
+
+    def test_user_edit_invalidates_reuse(self):
+        first = self.create(filter_role='student').json()
+        student = User.objects.get(username='stud')
+        student.first_name = 'Vali'
+        student.save()
+        changed = self.create(filter_role='student').json()
+        self.assertNotEqual(changed['id'], first['id'])
+        status = self.client.get(changed['status_url']).json()
+        rows = load_workbook(io.BytesIO(b''.join(self.client.get(status['download_url']).streaming_content)))
+        self.assertEqual([row[0] for row in rows.active.iter_rows(values_only=True)], ['Ism', 'Vali'])
+
+    def test_result_kinds_follow_user_edits(self):
+        student = User.objects.get(username='stud')
+        params = {'kwargs': {}, 'query': {}}
+        before = {kind: fingerprint(kind, params, self.controller) for kind in EXPORT_KINDS}
+        student.first_name = 'Vali'
+        student.save()
+        # Talaba ismi chiqadigan barcha eksportlar (natijalar ham) qayta tuziladi
+        self.assertEqual([kind for kind in EXPORT_KINDS if fingerprint(kind, params, self.controller) == before[kind]], [])
+
+    def test_other_users_cannot_see_job(self):
+        job_id = self.create().json()['id']
+        self.client.force_login(User.objects.get(username='stud'))
+        self.assertEqual(self.client.get(reverse('export_job_status', args=[job_id])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('export_job_download', args=[job_id])).status_code, 403)
+
+    def test_unknown_kind_is_rejected(self):
+        self.assertEqual(self.create(kind='nope').status_code, 400)
+
+
+class ResultRollupTests(TestCase):
+    def setUp(self):
+        faculty = Faculty.objects.create(university=University.objects.create(name='TDTU'), name='IT')
+        self.group = Group.objects.create(faculty=faculty, name='101')
+        self.subject = Subject.objects.create(name='Fizika')
+        self.test, self.post = make_exam(self.subject)
+        self.test.pass_percent = 50
+        self.test.save()
+        self.test.groups.add(self.group)
+        self.admin = User.objects.create_user(username='super', password='pass', role='admin', is_superuser=True)
+
+    def attempt(self, username, correct=True):
+        student = User.objects.create_user(username=username, password='pass', role='student', group=self.group,
+                                           first_name=username.title())
+        st = StudentTest.objects.create(student=student, test=self.test, group=self.group, completed=True)
+        created = grade_submission(st, get_answer_key(self.test).questions, self.post if correct else {})
+        st.total_score = sum(sa.score for sa in created)
+        refresh_result_counters([st])
+        st.save()
+        refresh_rollups([st])
+        return st
+
+    def rollup(self):
+        row = ResultRollup.objects.get(test=self.test, subject=self.subject, group=self.group)
+        return row.participants, row.attempts, row.passed, row.failed
+
+    def test_events_keep_rollup_in_sync(self):
+        passed = self.attempt('ali')
+        failed = self.attempt('vali', correct=False)
+        self.assertEqual(self.rollup(), (2, 2, 1, 1))
+        self.client.force_login(self.admin)
+        self.client.post(f"/api/student-tests/{failed.id}/override/", {'pass_override': True, 'reason': 'Komissiya'})
+        self.assertEqual(self.rollup(), (2, 2, 2, 0))
+        self.client.post(f"/api/student-tests/{failed.id}/revert/", {'reason': 'Bekor'})
+        self.assertEqual(self.rollup(), (2, 2, 1, 1))
+        passed.delete()
+        self.assertEqual(self.rollup(), (1, 1, 0, 1))
+        failed.delete()
+        self.assertFalse(ResultRollup.objects.exists())
+
+    def test_rebuild_repairs_table(self):
+        self.attempt('ali')
+        self.attempt('vali', correct=False)
+        expected = self.rollup()
+        ResultRollup.objects.update(passed=0, failed=0)
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(self.rollup(), expected)
+        self.assertEqual(ResultRollup.objects.count(), 1)
+
+    def test_group_move_and_test_groups_refresh_old_keys(self):
+        st = self.attempt('ali')
+        StudentTest.objects.filter(id=st.id).update(group=None)
+        refresh_rollups([st])
+        other = Group.objects.create(faculty=self.group.faculty, name='102')
+        student = st.student
+        student.group = other
+        student.save()
+        # Yangi guruh test.groups da yo'q – urinish xulosadan chiqadi, eski qator qolmaydi
+        self.assertFalse(ResultRollup.objects.exists())
+        self.test.groups.add(other)
+        self.assertEqual(ResultRollup.objects.get().group, other)
+        other.multi_tests.clear()
+        self.assertFalse(ResultRollup.objects.exists())
+
+    def test_migration_backfills_existing_attempts(self):
+        self.attempt('ali')
+        self.attempt('vali', correct=False)
+        ResultRollup.objects.all().delete()
+        # Migratsiya o'z holatidagi (tarixiy) modellar bilan ishlaydi
+        name = '0033_backfill_result_rollups'
+        state_apps = MigrationLoader(connection).project_state(('main', name)).apps
+        import_module(f'main.migrations.{name}').backfill_rollups(state_apps, None)
+        self.assertEqual(self.rollup(), (2, 2, 1, 1))
+
+    def test_participated_page_reads_rollups(self):
+        self.attempt('ali')
+        self.attempt('vali', correct=False)
+        absent = User.objects.create_user(username='gani', password='pass', role='student', group=self.group)
+        self.client.force_login(User.objects.create_user(username='ctrl', password='pass', role='controller'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('participated_students_list'))
+        self.assertEqual(response.status_code, 200)
+        # Urinishlar o'qilmaydi (main_studenttest faqat qatnashmaganlar anti-join ichida uchraydi)
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "main_studenttest"' in q['sql'].split('EXISTS')[0]])
+        group = response.context['subjects'][0]['groups'][0]
+        self.assertEqual((group['id'], group['passed'], group['failed'], group['not_participated']),
+                         (self.group.id, 1, 1, 1))
+
+        bucket = self.client.get(reverse('participated_bucket'), {'subject_id': self.subject.id, 'group_id': self.group.id})
+        self.assertEqual([st.student.username for st in bucket.context['buckets']['passed']], ['ali'])
+        self.assertEqual([st.student.username for st in bucket.context['buckets']['failed']], ['vali'])
+        self.assertEqual(bucket.context['buckets']['not_participated'], [absent])
+
+
+class NonParticipantsTests(TestCase):
+    def setUp(self):
+        faculty = Faculty.objects.create(university=University.objects.create(name='TDTU'), name='IT')
+        self.groups = [Group.objects.create(faculty=faculty, name=f'10{n}') for n in range(3)]
+        self.subjects = [Subject.objects.create(name=name) for name in ('Fizika', 'Kimyo')]
+        self.tests = []
+        for subject in self.subjects:
+            test, _ = make_exam(subject)
+            test.groups.set(self.groups)
+            self.tests.append(test)
+        self.students = {}
+        for group in self.groups:
+            for n in range(3):
+                username = f'{group.name}_{n}'
+                self.students[username] = User.objects.create_user(username=username, password='pass', role='student',
+                                                                   group=group, last_name=username)
+        # 100_0 ikkala fanni, 100_1 faqat Fizikani topshirgan
+        for username, test in (('100_0', self.tests[0]), ('100_0', self.tests[1]), ('100_1', self.tests[0])):
+            StudentTest.objects.create(student=self.students[username], test=test, completed=True)
+        self.client.force_login(User.objects.create_user(username='ctrl', password='pass', role='controller'))
+
+    def names(self, users):
+        return [u.username for u in users]
+
+    def test_all_pairs_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            roster = non_participants()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(len(roster), 6)
+        physics, chemistry = (s.id for s in self.subjects)
+        first = self.groups[0].id
+        self.assertEqual(self.names(roster[(physics, first)]), ['100_2'])
+        self.assertEqual(self.names(roster[(chemistry, first)]), ['100_1', '100_2'])
+        self.assertEqual(len(roster[(physics, self.groups[2].id)]), 3)
+
+    def test_pairs_and_inactive_tests_are_filtered(self):
+        physics = self.subjects[0].id
+        roster = non_participants(pairs=[(physics, self.groups[0].id)])
+        self.assertEqual(list(roster), [(physics, self.groups[0].id)])
+        self.tests[1].active = False
+        self.tests[1].save()
+        self.assertEqual({key[0] for key in non_participants(active_only=True)}, {physics})
+
+    def test_json_endpoint(self):
+        data = self.client.get(reverse('non_participants_json'), {'group_id': self.groups[0].id}).json()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual([(p['subject_id'], p['count']) for p in data['pairs']],
+                         [(self.subjects[0].id, 1), (self.subjects[1].id, 2)])
+        self.assertEqual(data['pairs'][0]['students'][0]['username'], '100_2')
+        self.assertEqual(self.client.get(reverse('non_participants_json'), {'group_id': 'x'}).status_code, 400)
+        self.client.force_login(self.students['100_0'])
+        self.assertEqual(self.client.get(reverse('non_participants_json')).status_code, 403)
+
+    def test_failed_pdf_uses_single_roster_query(self):
+        response = self.client.get(reverse('export_failed_pdf'), {'group_id': self.groups[0].id})
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('export_failed_pdf'), {'group_id': self.groups[0].id, 'subject_id': self.subjects[1].id})
+        self.assertEqual(len([q for q in ctx.captured_queries if 'NOT EXISTS' in q['sql']]), 1)
@@ -0,0 +1,197 @@
+import io
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import Subject, Question, AnswerOption, Test as TestModel, TestQuestion, StudentTest, StudentAnswer, StudentTestModification
+from .scoring import build_answer_key, grade_submission
+from .answer_key import get_answer_key
+from .regrade import regrade
+
+User = get_user_model()
+
+
+def make_exam(subject, copies=1):
+    """Har bir savol turidan `copies` tadan savol bilan test yaratadi va to'g'ri javoblar POST lug'atini qaytaradi."""
+    test = TestModel.objects.create(subject=subject, question_count=6 * copies, total_score=6 * copies,
+                                    duration=timedelta(minutes=10), minutes=10)
+    correct_post = {}
+    for _ in range(copies):
+        q = Question.objects.create(subject=subject, text='2+2?', question_type='single_choice')
+        AnswerOption.objects.create(question=q, text='3')
+        ok = AnswerOption.objects.create(question=q, text='4', is_correct=True)
+        correct_post[f'question_{q.id}'] = str(ok.id)
+
+        q = Question.objects.create(subject=subject, text='Juft sonlar', question_type='multiple_choice')
+        a = AnswerOption.objects.create(question=q, text='2', is_correct=True)
+        AnswerOption.objects.create(question=q, text='3')
+        b = AnswerOption.objects.create(question=q, text='4', is_correct=True)
+        correct_post[f'question_{q.id}_{a.id}'] = 'on'
+        correct_post[f'question_{q.id}_{b.id}'] = 'on'
+
+        q = Question.objects.create(subject=subject, text='Poytaxt', question_type='fill_in_blank')
+        AnswerOption.objects.create(question=q, text=' Toshkent ', is_correct=True)
+        correct_post[f'question_{q.id}'] = 'toshkent  '
+
+        q = Question.objects.create(subject=subject, text='Yer yumaloq', question_type='true_false')
+        AnswerOption.objects.create(question=q, text='To‘g‘ri', is_correct=True)
+        correct_post[f'question_{q.id}'] = 'true'
+
+        q = Question.objects.create(subject=subject, text='Moslang', question_type='matching')
+        r1 = AnswerOption.objects.create(question=q, left='uz', right='Toshkent')
+        r2 = AnswerOption.objects.create(question=q, left='ru', right='Moskva')
+        correct_post[f'matching_{q.id}_1'] = str(r1.id)
+        correct_post[f'matching_{q.id}_2'] = str(r2.id)
+
+        q = Question.objects.create(subject=subject, text='Tartiblang', question_type='sentence_ordering')
+        AnswerOption.objects.create(question=q, text='Men', is_correct=True)
+        AnswerOption.objects.create(question=q, text='kitob', is_correct=True)
+        AnswerOption.objects.create(question=q, text='o‘qiyman', is_correct=True)
+        correct_post[f'question_{q.id}'] = ' men Kitob o‘qiyman '
+
+    for q in Question.objects.filter(subject=subject):
+        TestQuestion.objects.create(test=test, question=q, score=1)
+    return test, correct_post
+
+
+class BulkScoringTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='stud', password='pass', role='student')
+        self.subject = Subject.objects.create(name='Matematika')
+
+    def _grade(self, test, post):
+        tqs = list(TestQuestion.objects.filter(test=test).select_related('question'))
+        questions = [tq.question for tq in tqs]
+        key = build_answer_key(questions, {tq.question_id: tq.score for tq in tqs})
+        st = StudentTest.objects.create(student=self.student, test=test)
+        return st, grade_submission(st, key, post, [q.id for q in questions])
+
+    def test_all_types_correct(self):
+        test, post = make_exam(self.subject)
+        st, created = self._grade(test, post)
+        self.assertEqual(len(created), 6)
+        self.assertTrue(all(sa.is_correct for sa in created))
+        self.assertEqual(sum(sa.score for sa in created), 6)
+        self.assertEqual(StudentAnswer.objects.filter(student_test=st, is_correct=True).count(), 6)
+        # Tanlangan variantlar M2M orqali saqlangan (single: 1, multiple: 2)
+        self.assertEqual(StudentAnswer.answer_option.through.objects.filter(studentanswer__student_test=st).count(), 3)
+
+    def test_wrong_and_foreign_answers(self):
+        test, post = make_exam(self.subject)
+        other = AnswerOption.objects.create(question=Question.objects.create(subject=self.subject, text='x', question_type='single_choice'), text='y', is_correct=True)
+        single = Question.objects.get(subject=self.subject, question_type='single_choice', test_questions__test=test)
+        wrong = {f'question_{single.id}': str(other.id)}
+        st, created = self._grade(test, wrong)
+        self.assertEqual(sum(sa.score for sa in created), 0)
+        # Boshqa savolga tegishli variant saqlanmaydi
+        self.assertFalse(StudentAnswer.objects.get(student_test=st, question=single).answer_option.exists())
+
+    def test_query_count_does_not_grow_with_questions(self):
+        small, small_post = make_exam(self.subject, copies=1)
+        big, big_post = make_exam(Subject.objects.create(name='Fizika'), copies=5)
+        counts = []
+        for test, post in ((small, small_post), (big, big_post)):
+            with CaptureQueriesContext(connection) as ctx:
+                self._grade(test, post)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class AnswerKeyCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.subject = Subject.objects.create(name='Tarix')
+        self.test, self.post = make_exam(self.subject)
+        self.test.refresh_from_db()
+
+    def test_cached_key_needs_no_queries(self):
+        get_answer_key(self.test)
+        with self.assertNumQueries(0):
+            key = get_answer_key(self.test)
+        self.assertEqual(len(key.questions), 6)
+
+    def test_option_change_invalidates_key(self):
+        q = Question.objects.get(subject=self.subject, question_type='single_choice')
+        key = get_answer_key(self.test)
+        old_correct = key.get(q.id)['correct_ids']
+        AnswerOption.objects.filter(question=q, is_correct=True).get().delete()
+        new_opt = AnswerOption.objects.create(question=q, text='5', is_correct=True)
+        self.test.refresh_from_db()
+        key = get_answer_key(self.test)
+        self.assertNotEqual(key.get(q.id)['correct_ids'], old_correct)
+        self.assertEqual(key.get(q.id)['correct_ids'], {new_opt.id})
+        self.assertEqual(key.correct_answer(q), '5')
+
+    def test_score_change_invalidates_key(self):
+        tq = TestQuestion.objects.filter(test=self.test).first()
+        get_answer_key(self.test)
+        tq.score = 7
+        tq.save()
+        self.test.refresh_from_db()
+        self.assertEqual(get_answer_key(self.test).get(tq.question_id)['score'], 7)
+
+
+class RegradeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.subject = Subject.objects.create(name='Geometriya')
+        self.test, self.post = make_exam(self.subject, copies=2)
+        key = get_answer_key(self.test).questions
+        self.attempts = []
+        for i in range(3):
+            student = User.objects.create_user(username=f's{i}', password='pass', role='student')
+            st = StudentTest.objects.create(student=student, test=self.test, completed=True)
+            created = grade_submission(st, key, self.post)
+            st.total_score = sum(sa.score for sa in created)
+            st.save()
+            self.attempts.append(st)
+        # Kalit tuzatiladi: single_choice savolda boshqa variant to'g'ri
+        self.question = Question.objects.filter(subject=self.subject, question_type='single_choice').first()
+        self.question.answer_options.update(is_correct=False)
+        wrong = self.question.answer_options.order_by('id').first()
+        wrong.is_correct = True
+        wrong.save()
+
+    def test_dry_run_reports_without_writing(self):
+        report = regrade(test=self.test, dry_run=True)
+        self.assertEqual(report.answers_changed, 3)
+        self.assertEqual(report.answers_skipped, 6)  # matching javoblari
+        self.assertEqual([r['new_score'] for r in report.rows], [11, 11, 11])
+        self.assertEqual(StudentTest.objects.get(id=self.attempts[0].id).total_score, 12)
+        self.assertFalse(StudentTestModification.objects.exists())
+
+    def test_regrade_question_updates_in_bulk(self):
+        with CaptureQueriesContext(connection) as ctx:
+            report = regrade(question=self.question, chunk_size=2)
+        # Urinishlar soniga bog'liq emas (ResultRollup yangilanishi ham o'zgarmas sonli so'rov)
+        self.assertLess(len(ctx.captured_queries), 25)
+        self.assertEqual(report.answers_changed, 3)
+        for st in self.attempts:
+            st.refresh_from_db()
+            self.assertEqual(st.total_score, 11)
+        self.assertFalse(StudentAnswer.objects.get(student_test=self.attempts[0], question=self.question).is_correct)
+        self.assertEqual((self.attempts[0].answered_count, self.attempts[0].correct_count), (12, 11))
+        self.assertEqual(StudentTestModification.objects.filter(change_type='regrade').count(), 3)
+        # Ikkinchi marta hech narsa o'zgarmaydi
+        self.assertEqual(regrade(test=self.test).answers_changed, 0)
+
+
+class ResultCounterTests(TestCase):
+    def test_backfill_counts_paper_answers(self):
+        student = User.objects.create_user(username='stud', password='pass', role='student')
+        test, post = make_exam(Subject.objects.create(name='Kimyo'))
+        st = StudentTest.objects.create(student=student, test=test, completed=True)
+        created = grade_submission(st, get_answer_key(test).questions, post)
+        # Varaqada faqat 3 ta savol (eski yozuvlarda ortiqcha javoblar bo'lishi mumkin)
+        st.question_ids = [sa.question_id for sa in created[:3]]
+        st.save()
+        StudentAnswer.objects.filter(id=created[0].id).update(is_correct=False)
+        call_command('backfill_result_counters', stdout=io.StringIO())
+        st.refresh_from_db()
+        self.assertEqual((st.answered_count, st.correct_count, st.incorrect_count), (3, 2, 1))
+        self.assertAlmostEqual(st.percent, 200 / 3)
@@ -0,0 +1,154 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (Faculty, Group, Subject, Topic, TopicAnswerOption, TopicQuestion, TopicStudentAnswer, TopicStudentTest,
+                     TopicTest, University)
+
+User = get_user_model()
+
+
+class TopicTestCase(TestCase):
+    """5 ta savolli mavzu testi (bitta to'g'ri javobli), talaba testni boshlagan."""
+
+    def setUp(self):
+        cache.clear()
+        faculty = Faculty.objects.create(university=University.objects.create(name='TDTU'), name='IT')
+        self.group = Group.objects.create(faculty=faculty, name='101')
+        self.teacher = User.objects.create_user(username='teach', password='pass', role='teacher')
+        self.student = User.objects.create_user(username='stud', password='pass', role='student', group=self.group)
+        self.topic = Topic.objects.create(subject=Subject.objects.create(name='Fizika'), title='Kinematika',
+                                          created_by=self.teacher)
+        self.questions = []
+        for i in range(5):
+            q = TopicQuestion.objects.create(topic=self.topic, text=f'Savol {i}', created_by=self.teacher)
+            for j in range(4):
+                TopicAnswerOption.objects.create(question=q, text=f'v{j}', is_correct=(j == 0))
+            self.questions.append(q)
+        self.test = TopicTest.objects.create(topic=self.topic, title='Test', question_count=5, total_score=10,
+                                             duration=timedelta(minutes=20), created_by=self.teacher,
+                                             question_ids=[q.id for q in self.questions])
+        self.test.groups.add(self.group)
+        self.client.force_login(self.student)
+        self.client.get(reverse('topic:start_test', args=[self.test.id]))
+        self.run = TopicStudentTest.objects.get(student=self.student, test=self.test)
+
+    def correct_option(self, qid):
+        return TopicAnswerOption.objects.get(question_id=qid, is_correct=True).id
+
+    def wrong_option(self, qid):
+        return TopicAnswerOption.objects.filter(question_id=qid, is_correct=False).first().id
+
+
+class TopicBundleTests(TopicTestCase):
+    def bundle(self):
+        return self.client.get(reverse('topic:test_bundle', args=[self.run.id]))
+
+    def test_bundle_follows_run_order(self):
+        # sessiya, foydalanuvchi, urinish, savollar + variantlar (prefetch)
+        with self.assertNumQueries(5):
+            data = self.bundle().json()
+        self.assertEqual([q['id'] for q in data['questions']], self.run.randomized_question_ids)
+        first = data['questions'][0]
+        self.assertEqual(len(first['options']), 4)
+        self.assertNotIn('is_correct', first['options'][0])
+        # Qayta so'rov keshdan, tartib o'zgarmaydi
+        with self.assertNumQueries(3):
+            self.assertEqual(self.bundle().json(), data)
+
+    def test_detail_matches_bundle_order(self):
+        question = self.bundle().json()['questions'][2]
+        detail = self.client.get(reverse('topic:question_detail', args=[question['id']])).json()
+        self.assertEqual(detail['options'], question['options'])
+
+    def test_edit_invalidates_bundle(self):
+        self.bundle()
+        self.topic.refresh_from_db()
+        option = TopicAnswerOption.objects.filter(question=self.questions[0]).first()
+        option.text = 'yangi'
+        option.save()
+        # Versiya bazada – tahrirni qabul qilmagan workerlar ham yangi kalitga o'tadi
+        self.assertEqual(Topic.objects.get(id=self.topic.id).content_version, self.topic.content_version + 1)
+        texts = {o['text'] for q in self.bundle().json()['questions'] for o in q['options']}
+        self.assertIn('yangi', texts)
+
+    def test_other_students_run_is_hidden(self):
+        other = User.objects.create_user(username='other', password='pass', role='student', group=self.group)
+        self.client.force_login(other)
+        self.assertEqual(self.bundle().status_code, 404)
+
+
+class TopicBatchSubmitTests(TopicTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('topic:submit_answers_batch', args=[self.run.id])
+
+    def send(self, answers):
+        return self.client.post(self.url, {'answers': json.dumps(answers)})
+
+    def test_batch_scores_and_updates_total_incrementally(self):
+        q1, q2, q3 = self.run.randomized_question_ids[:3]
+        resp = self.send({q1: [self.correct_option(q1)], q2: [self.correct_option(q2)], q3: [self.wrong_option(q3)]})
+        self.assertEqual(resp.json(), {'saved': sorted([q1, q2, q3]), 'total': 4.0})
+        self.assertEqual(TopicStudentAnswer.objects.filter(student_test=self.run).count(), 3)
+        # Javob o'zgartirildi: faqat farq qo'shiladi, qatorlar takrorlanmaydi
+        resp = self.send({q1: [self.wrong_option(q1)], q3: [self.correct_option(q3)]})
+        self.assertEqual(resp.json()['total'], 4.0)
+        answer = TopicStudentAnswer.objects.get(student_test=self.run, question_id=q3)
+        self.assertTrue(answer.is_correct)
+        self.assertEqual(list(answer.selected_options.values_list('id', flat=True)), [self.correct_option(q3)])
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.total_score, sum(TopicStudentAnswer.objects.filter(student_test=self.run)
+                                                   .values_list('score', flat=True)))
+
+    def test_batch_query_count_does_not_grow(self):
+        qids = self.run.randomized_question_ids
+        correct = {qid: [self.correct_option(qid)] for qid in qids}
+        self.send({qids[0]: correct[qids[0]]})
+        wrong = {qids[0]: [self.wrong_option(qids[0])]}
+        with CaptureQueriesContext(connection) as small:
+            self.send(wrong)
+        with CaptureQueriesContext(connection) as large:
+            self.send(correct)
+        self.assertLessEqual(len(large), len(small) + 1)  # yangi javoblar uchun bitta bulk_create
+
+    def test_answer_key_follows_option_edit(self):
+        q1 = self.run.randomized_question_ids[0]
+        old, new = self.correct_option(q1), self.wrong_option(q1)
+        self.send({q1: [old]})
+        version = Topic.objects.get(id=self.topic.id).content_version
+        for option in TopicAnswerOption.objects.filter(id__in=[old, new]):
+            option.is_correct = option.id == new
+            option.save()
+        # Versiya bazada oshadi – barcha workerlar kalitni qayta quradi
+        self.assertEqual(Topic.objects.get(id=self.topic.id).content_version, version + 2)
+        self.assertEqual(self.send({q1: [new]}).json()['total'], 2.0)
+
+    def test_foreign_questions_and_options_are_ignored(self):
+        other_topic = Topic.objects.create(subject=self.topic.subject, title='Boshqa', created_by=self.teacher)
+        foreign = TopicQuestion.objects.create(topic=other_topic, text='?', created_by=self.teacher)
+        q1, q2 = self.run.randomized_question_ids[:2]
+        resp = self.send({foreign.id: [], q1: [self.correct_option(q2)]})
+        self.assertEqual(resp.json(), {'saved': [q1], 'total': 0.0})
+        self.assertFalse(TopicStudentAnswer.objects.get(question_id=q1).selected_options.exists())
+
+    def test_expired_run_rejects_batch(self):
+        TopicStudentTest.objects.filter(id=self.run.id).update(started_at=timezone.now() - timedelta(hours=1))
+        q1 = self.run.randomized_question_ids[0]
+        self.assertEqual(self.send({q1: [self.correct_option(q1)]}).status_code, 403)
+        self.run.refresh_from_db()
+        self.assertTrue(self.run.completed)
+        self.assertEqual(self.send({q1: [self.correct_option(q1)]}).status_code, 403)
+
+    def test_single_submit_uses_same_scoring(self):
+        q1 = self.run.randomized_question_ids[0]
+        resp = self.client.post(reverse('topic:submit_answer', args=[self.run.id]),
+                                {'question_id': q1, 'options': [self.correct_option(q1)]})
+        self.assertEqual(resp.json(), {'correct': True, 'score': 2.0, 'total': 2.0})
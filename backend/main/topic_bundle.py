@@ -0,0 +1,67 @@
+"""Mavzu testi urinishi uchun savollar to'plami (bundle).
+
+Oldin test_run.html har bir savolni alohida topic_question_detail so'rovi bilan olardi va
+har so'rovda talabaning barcha urinishlari ikki marta ko'rib chiqilardi. Endi urinish
+(TopicStudentTest) ning barcha savollari va variantlari randomized_question_ids tartibida
+bitta so'rov + bitta prefetch bilan quriladi va urinish bo'yicha keshlanadi.
+
+Variantlar tartibi urinish seed'idan deterministik (main/paper.py): to'plam qayta qurilsa
+yoki topic_question_detail orqali olinsa ham tartib o'zgarmaydi. Kesh kaliti mavzu
+versiyasiga (Topic.content_version, bazada) bog'langan – savol yoki variant o'zgarsa signal
+versiyani F() bilan oshiradi va barcha workerlar yangi kalitga o'tadi.
+"""
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Topic, TopicQuestion
+from .paper import paper_seed, shuffled
+
+
+CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def bump_topic_version(topic_id):
+    Topic.objects.filter(id=topic_id).update(content_version=F('content_version') + 1)
+
+
+def run_seed(run):
+    return paper_seed(f"topic:{run.test_id}", run.id)
+
+
+def question_options(run, question, options):
+    """Urinish uchun variantlar tartibi (test sozlamasi bo'yicha aralashtirilgan yoki asl)."""
+    options = sorted(options, key=lambda o: o.id)
+    if run.test.shuffle_options:
+        return shuffled(run_seed(run), question.id, options)
+    return options
+
+
+def question_payload(question, options):
+    return {
+        'id': question.id,
+        'text': question.text,
+        'question_type': question.question_type,
+        'question_type_display': question.get_question_type_display(),
+        'image': question.image.url if question.image else None,
+        'options': [{'id': o.id, 'text': o.text} for o in options],
+    }
+
+
+def build_bundle(run):
+    ids = list(run.randomized_question_ids or run.test.question_ids or [])
+    questions = {q.id: q for q in TopicQuestion.objects.filter(id__in=ids).prefetch_related('options')}
+    return [question_payload(questions[qid], question_options(run, questions[qid], questions[qid].options.all()))
+            for qid in ids if qid in questions]
+
+
+def get_bundle(run):
+    """Urinish savollari (keshdan, bo'lmasa bitta so'rov + prefetch bilan quriladi).
+
+    run – test__topic bilan (select_related) olingan urinish.
+    """
+    key = f"topic_bundle:{run.id}:{run.test.topic.content_version}"
+    bundle = cache.get(key)
+    if bundle is None:
+        bundle = build_bundle(run)
+        cache.set(key, bundle, CACHE_TIMEOUT)
+    return bundle
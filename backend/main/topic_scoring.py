@@ -0,0 +1,96 @@
+"""Mavzu testi javoblarini baholash (keshdagi kalit bilan, paketlab).
+
+Kalit mavzuning barcha savollari uchun {savol_id: {'type', 'options', 'correct'}} – bitta
+so'rov + prefetch bilan quriladi va mavzu versiyasi (Topic.content_version) bo'yicha
+keshlanadi. save_answers bir nechta javobni bitta tranzaksiyada yozadi: mavjud javoblar
+bitta so'rovda olinadi, yangilari bulk_create, o'zgarganlari bulk_update, tanlangan
+variantlar (M2M) bitta delete + bitta bulk_create. TopicStudentTest.total_score qayta
+yig'ilmaydi – ball farqi (delta) F() bilan qo'shiladi.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import TopicQuestion, TopicStudentAnswer, TopicStudentTest
+
+
+CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def compile_topic_key(topic_id):
+    key = {}
+    for q in TopicQuestion.objects.filter(topic_id=topic_id).prefetch_related('options'):
+        options = list(q.options.all())
+        key[q.id] = {
+            'type': q.question_type,
+            'options': frozenset(o.id for o in options),
+            'correct': frozenset(o.id for o in options if o.is_correct),
+        }
+    return key
+
+
+def get_topic_key(topic):
+    """Mavzu javob kaliti (keshdan; savol yoki variant o'zgarsa Topic.content_version oshiriladi)."""
+    cache_key = f"topic_key:{topic.id}:{topic.content_version}"
+    compiled = cache.get(cache_key)
+    if compiled is None:
+        compiled = compile_topic_key(topic.id)
+        cache.set(cache_key, compiled, CACHE_TIMEOUT)
+    return compiled
+
+
+def grade(entry, selected):
+    """(tanlangan variantlar – faqat shu savolniki, to'g'rimi)."""
+    chosen = {int(v) for v in selected if str(v).isdigit()} & entry['options']
+    if entry['type'] == TopicQuestion.SINGLE:
+        return chosen, len(chosen) == 1 and chosen == entry['correct']
+    return chosen, chosen == entry['correct']
+
+
+def run_question_ids(st):
+    return set(st.randomized_question_ids or st.test.question_ids or [])
+
+
+def save_answers(st, answers):
+    """answers – {savol_id: [variant_id, ...]}; urinishda yo'q savollar tashlab ketiladi.
+
+    {savol_id: (to'g'rimi, ball)} qaytaradi; st.total_score yangilangan qiymatga ega bo'ladi.
+    """
+    key = get_topic_key(st.test.topic)
+    allowed = run_question_ids(st)
+    graded = {qid: grade(key[qid], selected) for qid, selected in answers.items() if qid in allowed and qid in key}
+    if not graded:
+        return {}
+    per_q = st.test.total_score / st.test.question_count if st.test.question_count else 0
+    Through = TopicStudentAnswer.selected_options.through
+    results = {}
+    with transaction.atomic():
+        existing = {a.question_id: a for a in TopicStudentAnswer.objects.filter(student_test=st, question_id__in=list(graded))}
+        created, changed = [], []
+        delta = 0
+        for qid, (chosen, is_correct) in graded.items():
+            score = per_q if is_correct else 0
+            results[qid] = (is_correct, score)
+            ans = existing.get(qid)
+            if ans is None:
+                created.append(TopicStudentAnswer(student_test=st, question_id=qid, is_correct=is_correct, score=score))
+            else:
+                delta -= ans.score
+                if (ans.is_correct, ans.score) != (is_correct, score):
+                    ans.is_correct, ans.score = is_correct, score
+                    changed.append(ans)
+            delta += score
+        created = TopicStudentAnswer.objects.bulk_create(created)
+        if changed:
+            TopicStudentAnswer.objects.bulk_update(changed, ['is_correct', 'score'])
+        if existing:
+            Through.objects.filter(topicstudentanswer_id__in=[a.id for a in existing.values()]).delete()
+        answer_ids = {a.question_id: a.id for a in list(existing.values()) + created}
+        links = [Through(topicstudentanswer_id=answer_ids[qid], topicansweroption_id=oid)
+                 for qid, (chosen, _) in graded.items() for oid in chosen]
+        if links:
+            Through.objects.bulk_create(links)
+        if delta:
+            TopicStudentTest.objects.filter(id=st.id).update(total_score=F('total_score') + delta)
+        st.refresh_from_db(fields=['total_score'])
+    return results
@@ -5,6 +5,7 @@ from django.urls import path
 
 from . import views_controller_panel
 from . import views_participated
+from . import views_export_jobs
 
 urlpatterns = [
     path('group-subjects/', views_controller_panel.group_subjects_list, name='group_subjects_list'),
@@ -27,14 +28,23 @@ urlpatterns = [
     # Live monitor (controller)
     path('live-monitor/', views_controller_panel.live_monitor, name='live_monitor'),
     path('live-monitor/data/', views_controller_panel.live_monitor_data, name='live_monitor_data'),
+    path('live-monitor/changes/', views_controller_panel.live_monitor_changes, name='live_monitor_changes'),
+    path('live-monitor/exam-day/', views_controller_panel.exam_day, name='exam_day'),
+    path('live-monitor/exam-day/data/', views_controller_panel.exam_day_data, name='exam_day_data'),
     path('add-user/', views_controller_panel.add_user, name='add_user'),
     path('export-users-excel/', views_controller_panel.export_users_excel, name='export_users_excel'),
     path('export-users-word/', views_controller_panel.export_users_word, name='export_users_word'),
     path('export-users-pdf/', views_controller_panel.export_users_pdf, name='export_users_pdf'),
+    # Eksport navbati (fon oqimida tayyorlanadigan PDF/Excel/Word)
+    path('exports/', views_export_jobs.export_job_create, name='export_job_create'),
+    path('exports/<int:job_id>/', views_export_jobs.export_job_status, name='export_job_status'),
+    path('exports/<int:job_id>/download/', views_export_jobs.export_job_download, name='export_job_download'),
     path('download-student-import-template/', views_controller_panel.download_student_import_template, name='download_student_import_template'),
 
     # Qatnashganlar ro'yxati va qayta topshirish
     path('participated-students/', views_participated.participated_students_list, name='participated_students_list'),
+    path('participated-students/bucket/', views_participated.participated_bucket, name='participated_bucket'),
+    path('participated-students/non-participants/', views_participated.non_participants_json, name='non_participants_json'),
     path('participated-students/export-failed-pdf/', views_participated.export_failed_pdf, name='export_failed_pdf'),
     path('allow-retake/', views_participated.allow_retake, name='allow_retake'),
     path('allow-retake-bulk/', views_participated.allow_retake_bulk, name='allow_retake_bulk'),
@@ -1,19 +1,26 @@
 from django.urls import path
-from . import views_test_api
+from . import views_results_explorer, views_test_api
 
 urlpatterns = [
     path('login/', views_test_api.testapi_login, name='testapi_login'),
     path('dashboard/', views_test_api.testapi_dashboard, name='testapi_dashboard'),
     path('test/<int:test_id>/', views_test_api.testapi_test, name='testapi_test'),
+    path('test/<int:test_id>/autosave/', views_test_api.testapi_autosave, name='testapi_autosave'),
+    path('test/<int:test_id>/queue/', views_test_api.testapi_queue_status, name='testapi_queue_status'),
     path('test/<int:test_id>/dalolatnoma/', views_test_api.create_dalolatnoma, name='create_dalolatnoma'),
     path('result/<int:stest_id>/', views_test_api.testapi_result, name='testapi_result'),
     path('stats/', views_test_api.testapi_stats, name='testapi_stats'),
-    path('all-results/', views_test_api.testapi_all_results, name='testapi_all_results'),
+    path('all-results/', views_results_explorer.results_explorer, name='testapi_all_results'),
+    path('all-results/students/', views_results_explorer.results_students, name='results_explorer_students'),
+    path('all-results/answers/<int:stest_id>/', views_results_explorer.results_answers, name='results_explorer_answers'),
     path('all-results/excel/', views_test_api.export_all_results_excel, name='export_all_results_excel'),
     path('export-group/<int:group_id>/', views_test_api.export_group_results_excel, name='export_group_results'),
     path('export-students-group/<int:group_id>/', views_test_api.export_students_by_group_excel, name='export_students_by_group_excel'),
     path('export-tutors-kafedra/<int:kafedra_id>/', views_test_api.export_tutors_by_kafedra_excel, name='export_tutors_by_kafedra_excel'),
     path('export-employees-bulim/<int:bulim_id>/', views_test_api.export_employees_by_bulim_excel, name='export_employees_by_bulim_excel'),
+    path('answers/csv/', views_test_api.export_answers_csv, name='export_answers_csv'),
+    path('results/export/', views_test_api.export_results, name='export_results'),
+    path('export-subjects/zip/', views_test_api.export_subject_results_zip, name='export_subject_results_zip'),
     path('export-subject/<str:subject_name>/pdf/', views_test_api.export_subject_results_pdf, name='export_subject_results_pdf'),
     path('subject/<str:subject_name>/groups/', views_test_api.subject_groups_for_results, name='subject_groups_for_results'),
     path('verify-qr/<str:hash_code>/', views_test_api.verify_qr, name='verify_qr'),
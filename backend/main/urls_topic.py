@@ -19,8 +19,10 @@ urlpatterns = [
     path('student/test/<int:test_id>/start/', vt.start_topic_test, name='start_test'),
     path('student/test/<int:test_id>/video-seen/', vt.mark_topic_video_seen, name='video_seen'),
     path('student/answer/<int:student_test_id>/submit/', vt.submit_answer, name='submit_answer'),
+    path('student/answer/<int:student_test_id>/submit-batch/', vt.submit_answers_batch, name='submit_answers_batch'),
     path('student/test/<int:student_test_id>/finish/', vt.finish_topic_test, name='finish_test'),
     path('student/test/<int:student_test_id>/remaining/', vt.test_remaining_time, name='remaining_time'),
+    path('student/test/<int:student_test_id>/bundle/', vt.topic_test_bundle, name='test_bundle'),
     path('question/<int:question_id>/', vt.topic_question_detail, name='question_detail'),
     path('topic/<int:topic_id>/stats/', vt.topic_stats, name='topic_stats'),
     # CRUD additions
@@ -0,0 +1,122 @@
+"""Oldindan tayyorlangan varaqa variantlari.
+
+Test guruh/kafedra/bo'limga biriktirilganda fon oqimida EXAM_VARIANT_COUNT ta variant
+tuziladi: savollar tanlovi, variantlar tartibi (paper.py dagi seed funksiyalari bilan)
+va render qilingan HTML bo'laklar. Yangi urinishga variant StudentTest.id bo'yicha
+navbatma-navbat (round-robin) beriladi, shuning uchun imtihon sahifasini ochish
+aralashtirish o'rniga bitta saqlangan variantni o'qishdan iborat bo'ladi.
+
+Variant test.answer_key_version bilan belgilanadi – savollar yoki variantlar
+o'zgarsa, eski variantlar ishlatilmaydi (urinish seed bo'yicha varaqaga qaytadi)
+va keyingi biriktirishda qayta tuziladi.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+from .background import run_in_background
+from .models import Test, TestQuestion, TestVariant
+from .paper import paper_seed, select_question_ids, shuffled, tf_order
+from .question_fragments import render_question_fragment
+
+
+def variant_count():
+    return getattr(settings, 'EXAM_VARIANT_COUNT', 20)
+
+
+def _build_variant(test, number, questions_by_id, pool_ids):
+    seed = paper_seed(test.id, f'variant-{number}')
+    question_ids = select_question_ids(seed, pool_ids, test.question_count)
+    option_orders, matching_orders, tf_orders, fragments = {}, {}, {}, {}
+    for qid in question_ids:
+        q = questions_by_id[qid]
+        options = sorted(q.answer_options.all(), key=lambda opt: opt.id)
+        if q.question_type == 'matching':
+            rights = [opt.id for opt in options if opt.right or opt.image]
+            matching_orders[str(qid)] = shuffled(seed, qid, rights, salt='matching')
+        elif q.question_type in ('single_choice', 'multiple_choice'):
+            option_orders[str(qid)] = shuffled(seed, qid, [opt.id for opt in options])
+        elif q.question_type == 'true_false':
+            tf_orders[str(qid)] = tf_order(seed, qid)
+        fragment = render_question_fragment(q)
+        fragment['options'] = {str(k): v for k, v in fragment['options'].items()}
+        fragments[str(qid)] = fragment
+    return TestVariant(
+        test=test,
+        number=number,
+        source_version=test.answer_key_version,
+        question_ids=question_ids,
+        option_orders=option_orders,
+        matching_orders=matching_orders,
+        tf_orders=tf_orders,
+        fragments=fragments,
+    )
+
+
+def generate_variants(test_id, count=None):
+    """Test uchun variantlar to'plamini (qayta) tuzadi va yaratilgan variantlar sonini qaytaradi."""
+    test = Test.objects.get(id=test_id)
+    count = variant_count() if count is None else count
+    tqs = list(TestQuestion.objects.filter(test=test).select_related('question'))
+    questions_by_id = {tq.question_id: tq.question for tq in tqs}
+    prefetch_related_objects(list(questions_by_id.values()), 'answer_options')
+    variants = [_build_variant(test, n, questions_by_id, questions_by_id.keys()) for n in range(count)] if tqs else []
+    with transaction.atomic():
+        TestVariant.objects.filter(test=test).delete()
+        TestVariant.objects.bulk_create(variants)
+    return len(variants)
+
+
+def schedule_variant_generation(test):
+    """Test biriktirilganda variantlarni fon oqimida tuzishni rejalashtiradi (joriy variantlar bo'lsa o'tkazib yuboriladi)."""
+    fresh = TestVariant.objects.filter(test=test, source_version=test.answer_key_version).count()
+    if fresh >= variant_count():
+        return
+    run_in_background(generate_variants, test.id)
+
+
+def assign_variant(stest, test, pool_size):
+    """Yangi urinishga round-robin variant biriktiradi; mos variant bo'lmasa None (seed bo'yicha varaqa ishlatiladi)."""
+    count = variant_count()
+    if not count:
+        return None
+    variant = TestVariant.objects.filter(
+        test=test, number=stest.id % count, source_version=test.answer_key_version,
+    ).first()
+    if variant is None or len(variant.question_ids) != min(test.question_count, pool_size):
+        return None
+    stest.variant = variant
+    stest.question_ids = variant.question_ids
+    stest.shuffle_seed = paper_seed(test.id, stest.id)
+    stest.save(update_fields=['variant', 'question_ids', 'shuffle_seed'])
+    return variant
+
+
+def variant_layout(variant, questions):
+    """Saqlangan variantdan (choice, matching, tf) tartiblarini va HTML bo'laklarni savollarga qo'llaydi.
+
+    Savol/variantlar o'zgargan bo'lsa (variant eskirgan) None qaytariladi.
+    """
+    choice, matching, tf = {}, {}, {}
+    for q in questions:
+        key = str(q.id)
+        fragment = variant.fragments.get(key)
+        if fragment is None:
+            return None
+        options = {opt.id: opt for opt in q.answer_options.all()}
+        if q.question_type == 'matching':
+            order = variant.matching_orders.get(key, [])
+            if not set(order) <= options.keys():
+                return None
+            matching[q.id] = [options[oid] for oid in order]
+        elif q.question_type in ('single_choice', 'multiple_choice'):
+            order = variant.option_orders.get(key, [])
+            if set(order) != options.keys():
+                return None
+            choice[q.id] = [options[oid] for oid in order]
+            for opt in choice[q.id]:
+                opt.fragment_html = fragment['options'].get(str(opt.id))
+        elif q.question_type == 'true_false':
+            tf[q.id] = variant.tf_orders.get(key, ['true', 'false'])
+        q.fragment = fragment
+    return choice, matching, tf
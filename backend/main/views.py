@@ -4,7 +4,6 @@ from rest_framework.permissions import AllowAny
 
 from rest_framework.response import Response
 from rest_framework import serializers
-from django.db import models
 
 # API: Get max question count for a subject (optionally by semester)
 @api_view(['GET'])
@@ -37,9 +36,7 @@ def subject_max_question_count(request):
     count = qs.count()
     return Response({'max_question_count': count})
 from rest_framework.views import APIView
-from rest_framework.response import Response
 from rest_framework import status
-from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 from .models import User
 
@@ -61,22 +58,24 @@ import csv
 from django.http import HttpResponse
 from rest_framework import viewsets
 from rest_framework.decorators import action
-from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 import random
 from .models import (
-    User, University, Faculty, Group, Subject, Question, AnswerOption, Test,
+    University, Faculty, Group, Subject, Question, AnswerOption, Test,
     TestQuestion, StudentTest, StudentAnswer, Log, StudentTestModification
 )
-from django.db import models
 from .serializers import (
     UserSerializer, UniversitySerializer, FacultySerializer, GroupSerializer, SubjectSerializer,
     QuestionSerializer, AnswerOptionSerializer, TestSerializer, TestQuestionSerializer,
     StudentTestSerializer, StudentTestAdminSerializer, StudentAnswerSerializer, LogSerializer,
     StudentTestModificationSerializer
 )
-from .permissions import IsAdmin, IsTeacher, IsController, IsStudent, HasMultipleRoles, IsRTTM, IsStudentOrSuper, IsSuperUser
+from .permissions import IsAdmin, IsTeacher, IsController, IsStudent, HasMultipleRoles, IsStudentOrSuper, IsSuperUser
+from .answer_key import get_answer_key
+from .admission import admit_new_attempt
+from .regrade import regrade
+from .rollups import refresh_rollups
+from .scoring import refresh_result_counters
 
 # Mavjud view’lar (qisqartirilgan)
 class UserViewSet(viewsets.ModelViewSet):
@@ -113,11 +112,22 @@ class SubjectViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(id__in=subject_ids)
         return queryset
 
+def _is_true(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
 class QuestionViewSet(viewsets.ModelViewSet):
     queryset = Question.objects.all()
     serializer_class = QuestionSerializer
     permission_classes = [IsTeacher]
 
+    # Javob kaliti tuzatilgandan keyin shu savol bo'yicha barcha testlardagi javoblarni qayta baholash
+    @action(detail=True, methods=['post'], permission_classes=[IsSuperUser])
+    def regrade(self, request, pk=None):
+        question = self.get_object()
+        report = regrade(question=question, dry_run=_is_true(request.data.get('dry_run')),
+                         changed_by=request.user, reason=request.data.get('reason', ''))
+        return Response(report.as_dict())
+
 class AnswerOptionViewSet(viewsets.ModelViewSet):
     queryset = AnswerOption.objects.all()
     serializer_class = AnswerOptionSerializer
@@ -155,10 +165,18 @@ class TestViewSet(viewsets.ModelViewSet):
         Log.objects.create(user=self.request.user, action=f"Test uchun savollar tanlandi: {test.id}")
         return Response({"status": "Savollar tanlandi"})
 
+    # Javob kaliti tuzatilgandan keyin test natijalarini ommaviy qayta baholash (dry_run=true – faqat hisobot)
+    @action(detail=True, methods=['post'], permission_classes=[IsSuperUser])
+    def regrade(self, request, pk=None):
+        test = self.get_object()
+        report = regrade(test=test, dry_run=_is_true(request.data.get('dry_run')),
+                         changed_by=request.user, reason=request.data.get('reason', ''))
+        return Response(report.as_dict())
+
     @action(detail=True, methods=['get'])
     def export_stats(self, request, pk=None):
         test = self.get_object()
-        student_tests = StudentTest.objects.filter(test=test)
+        student_tests = StudentTest.objects.filter(test=test).select_related('student')
         
         response = HttpResponse(content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="test_{test.id}_stats.csv"'
@@ -171,8 +189,8 @@ class TestViewSet(viewsets.ModelViewSet):
             writer.writerow(['Talaba', 'To‘g‘ri javoblar', 'Noto‘g‘ri javoblar', 'Ball', 'Foiz'])
         
         for student_test in student_tests:
-            correct_answers = student_test.answers.filter(is_correct=True).count()
-            incorrect_answers = student_test.answers.count() - correct_answers
+            correct_answers = student_test.correct_count
+            incorrect_answers = student_test.incorrect_count
             original_percentage = (student_test.total_score / test.total_score) * 100 if test.total_score else 0
             final_percentage = (student_test.final_score / test.total_score) * 100 if test.total_score else original_percentage
             if is_super:
@@ -231,20 +249,13 @@ class StudentTestViewSet(viewsets.ModelViewSet):
         if gs:
             semester = gs.semester
         # Faqat bitta marta topshirish (yakunlanmagan yoki can_retake=False bo‘lsa bloklanadi)
-        already = StudentTest.objects.filter(
-            student=self.request.user,
-            group=group,
-            subject=subject,
-            semester=semester
-        ).filter(
-            models.Q(completed=False) | models.Q(completed=True, can_retake=False)
-        ).exists()
-        if already:
+        admission = admit_new_attempt(self.request.user, test, semester.id if semester else None)
+        if not admission:
             raise serializers.ValidationError({"error": "Siz bu fanga ushbu semestrda testni allaqachon topshirgansiz yoki yakunlanmagan test mavjud!"})
         # Yangi yozuvga group, subject, semester ni ham saqlaymiz
         student_test = serializer.save(
             student=self.request.user,
-            group=group,
+            group_id=admission.group_id,
             subject=subject,
             semester=semester
         )
@@ -262,7 +273,9 @@ class StudentTestViewSet(viewsets.ModelViewSet):
             student_test.end_time = timezone.now()
             total_score = sum(answer.score for answer in student_test.answers.all())
             student_test.total_score = total_score
+            refresh_result_counters([student_test], save=False)
             student_test.save()
+            refresh_rollups([student_test])
             Log.objects.create(user=self.request.user, action=f"Test vaqti tugashi bilan yakunlandi: {student_test.test.subject.name}")
             return Response({"error": "Test vaqti tugadi", "total_score": total_score}, status=400)
         
@@ -270,7 +283,9 @@ class StudentTestViewSet(viewsets.ModelViewSet):
         student_test.end_time = timezone.now()
         total_score = sum(answer.score for answer in student_test.answers.all())
         student_test.total_score = total_score
+        refresh_result_counters([student_test], save=False)
         student_test.save()
+        refresh_rollups([student_test])
         
         Log.objects.create(user=self.request.user, action=f"Test yakunlandi: {student_test.test.subject.name}")
         return Response({"status": "Test yakunlandi", "total_score": total_score})
@@ -308,6 +323,7 @@ class StudentTestViewSet(viewsets.ModelViewSet):
         st.overridden_by = request.user
         st.overridden_at = dj_tz.now()
         st.save()
+        refresh_rollups([st])
 
         StudentTestModification.objects.create(
             student_test=st,
@@ -337,6 +353,7 @@ class StudentTestViewSet(viewsets.ModelViewSet):
         st.overridden_by = None
         st.overridden_at = None
         st.save()
+        refresh_rollups([st])
         StudentTestModification.objects.create(
             student_test=st,
             previous_score=prev_score,
@@ -384,7 +401,9 @@ class StudentTestViewSet(viewsets.ModelViewSet):
             student_test.completed = True
             student_test.end_time = timezone.now()
             student_test.total_score = sum(answer.score for answer in student_test.answers.all())
+            refresh_result_counters([student_test], save=False)
             student_test.save()
+            refresh_rollups([student_test])
             Log.objects.create(user=self.request.user, action=f"Test vaqti tugashi bilan yakunlandi: {student_test.test.subject.name}")
             return Response({"error": "Test vaqti tugadi"}, status=400)
         
@@ -404,24 +423,24 @@ class StudentAnswerViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         student_answer = serializer.save()
         question = student_answer.question
-        correct_answers = set(question.answer_options.filter(is_correct=True).values_list('id', flat=True))
+        # To'g'ri javoblar har safar AnswerOption dan emas, testning keshlangan javob kalitidan olinadi
+        entry = get_answer_key(student_answer.student_test.test).entry_for(question)
+        correct_answers = entry['correct_ids']
         selected_answers = set(student_answer.answer_option.values_list('id', flat=True))
         
         # Maxsus savol turlari uchun logika
         if question.question_type == 'single_choice':
-            student_answer.is_correct = selected_answers and (selected_answers.issubset(correct_answers))
+            student_answer.is_correct = bool(selected_answers) and selected_answers.issubset(correct_answers)
         elif question.question_type == 'multiple_choice':
             student_answer.is_correct = selected_answers == correct_answers
         elif question.question_type == 'fill_in_blank':
-            student_answer.is_correct = student_answer.text_answer.strip().lower() in [ans.text.strip().lower() for ans in question.answer_options.filter(is_correct=True)]
+            student_answer.is_correct = (student_answer.text_answer or '').strip().lower() in entry['correct_texts']
         elif question.question_type == 'true_false':
-            student_answer.is_correct = selected_answers and (selected_answers.issubset(correct_answers))
-        elif question.question_type == 'sentence_ordering':
-            student_answer.is_correct = student_answer.text_answer == question.answer_options.filter(is_correct=True).first().text
-        elif question.question_type == 'matching':
-            student_answer.is_correct = student_answer.text_answer == question.answer_options.filter(is_correct=True).first().text
+            student_answer.is_correct = bool(selected_answers) and selected_answers.issubset(correct_answers)
+        elif question.question_type in ('sentence_ordering', 'matching'):
+            student_answer.is_correct = entry['correct_raw'] is not None and student_answer.text_answer == entry['correct_raw']
         
-        student_answer.score = student_answer.student_test.test.test_questions.get(question=question).score if student_answer.is_correct else 0
+        student_answer.score = entry['score'] if student_answer.is_correct else 0
         student_answer.save()
         
         Log.objects.create(user=self.request.user, action=f"Javob yuborildi: {question.text[:50]}...")
@@ -504,7 +523,9 @@ class StudentAnswerViewSet(viewsets.ModelViewSet):
             ans.answer_option.set(selected_ids)
         st = ans.student_test
         st.total_score = sum(a.score for a in st.answers.all())
-        st.save(update_fields=['total_score'])
+        refresh_result_counters([st], save=False)
+        st.save(update_fields=['total_score', 'answered_count', 'correct_count', 'percent'])
+        refresh_rollups([st])
         StudentTestModification.objects.create(
             student_test=st,
             previous_score=prev_score,
@@ -4,30 +4,30 @@
 from collections import defaultdict
 import random
 from docx import Document
-from docx.shared import Pt
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 import io
 import openpyxl
-from django.http import HttpResponse, HttpResponseForbidden
-from main.models import User, Kafedra, Bulim
+from django.http import HttpResponse
+from main.models import User
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render, redirect
 from django.shortcuts import get_object_or_404
-from main.models import Test, Subject, Question, Group, StudentTest
-from django.contrib.auth import authenticate, login, logout
+from main.models import Test, Question
+from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.paginator import Paginator
-from django.db.models import Count, Q
+from django.db.models import Count
 from django.db import IntegrityError
 from main.models import GroupSubject, Semester, Group, Bulim, Kafedra, Subject, University, Faculty
+from main.variants import schedule_variant_generation
+from main.excel_export import xlsx_response
+from main.export_jobs import track_progress
+from main.live_monitor import MONITOR_POLL_INTERVAL, OVERVIEW_POLL_INTERVAL, changes as live_changes, overview as live_overview, snapshot as live_snapshot
 # AJAX orqali guruhga tegishli fanlarni qaytaruvchi endpoint
 from django.views.decorators.http import require_GET
-from django.utils.timezone import now as tz_now
-from django.db.models.functions import Coalesce
-from django.db.models import Count
 from django.contrib import messages
 @require_GET
 def get_subjects_by_group(request):
@@ -97,6 +97,7 @@ def live_monitor(request):
     context = {
         'tests': tests,
         'selected_test_id': int(sel_test_id) if sel_test_id and sel_test_id.isdigit() else None,
+        'poll_interval': MONITOR_POLL_INTERVAL,
     }
     return render(request, 'controller_panel/live_monitor.html', context)
 
@@ -113,90 +114,35 @@ def live_monitor_data(request):
     except Test.DoesNotExist:
         return JsonResponse({'error': 'Test not found'}, status=404)
 
-    # Collect StudentTest rows for the given test
-    st_qs = (StudentTest.objects
-             .filter(test=test)
-             .select_related('student', 'group')
-             .annotate(
-                 answers_count=Count('answers'),
-                 correct_count=Count('answers', filter=Q(answers__is_correct=True))
-             )
-             .order_by('start_time'))
-
-    active_rows = []
-    completed_rows = []  # will store tuples (end_ts, row)
-    total = st_qs.count()
-    active = 0
-    completed = 0
-    avg_progress_acc = 0.0
-    for st in st_qs:
-        total_q = len(st.question_ids or [])
-        ans = getattr(st, 'answers_count', 0) or 0
-        corr = getattr(st, 'correct_count', 0) or 0
-        percent = int(round((ans / total_q) * 100)) if total_q else 0
-        # Remaining time (sec)
-        minutes = getattr(test, 'minutes', 30) or 30
-        elapsed = 0
-        remaining = None
-        if st.start_time:
-            elapsed = max(0, int((tz_now() - st.start_time).total_seconds()))
-            remaining = max(0, minutes * 60 - elapsed)
-        status = 'completed' if st.completed or (remaining is not None and remaining <= 0) else 'active'
-        if status == 'active':
-            active += 1
-        else:
-            completed += 1
-        avg_progress_acc += percent
-        row = {
-            'student_id': st.student_id,
-            'student': st.student.get_full_name() or st.student.username,
-            'group': st.group.name if st.group else (getattr(st.student.group, 'name', None) or '-'),
-            'start_time': st.start_time.isoformat() if st.start_time else None,
-            'end_time': st.end_time.isoformat() if st.end_time else None,
-            'answers_count': ans,
-            'correct_count': corr,
-            'total_questions': total_q,
-            'percent': percent,
-            'remaining_seconds': remaining,
-            'completed': bool(st.completed),
-            'status': status,
-        }
-        if status == 'active':
-            active_rows.append(row)
-        else:
-            # Sort completed by latest finished first (fallback to start_time if end_time missing)
-            try:
-                end_ts = st.end_time.timestamp() if st.end_time else (st.start_time.timestamp() if st.start_time else 0)
-            except Exception:
-                end_ts = 0
-            completed_rows.append((end_ts, row))
-
-    # Order completed by end_ts DESC
-    completed_rows.sort(key=lambda t: t[0], reverse=True)
-    completed_only = [r for _, r in completed_rows]
-    # Active first, then completed
-    data = active_rows + completed_only
-    avg_progress = int(round(avg_progress_acc / total)) if total else 0
-    payload = {
-        'test': {
-            'id': test.id,
-            'subject': test.subject.name,
-            'group': test.group.name if test.group else None,
-            'minutes': getattr(test, 'minutes', 30),
-            'active': test.active,
-        },
-        'summary': {
-            'participants': total,
-            'active': active,
-            'completed': completed,
-            'avg_progress': avg_progress,
-        },
-        'students': data,
-        'active_students': active_rows,
-        'completed_students': completed_only,
-        'server_time': tz_now().isoformat(),
-    }
-    return JsonResponse(payload)
+    return JsonResponse(live_snapshot(test))
+
+
+@controller_required
+def exam_day(request):
+    """Imtihon kuni: barcha faol testlar bitta sahifada; test bosilsa live monitorga o'tiladi."""
+    return render(request, 'controller_panel/exam_day.html', {'poll_interval': OVERVIEW_POLL_INTERVAL})
+
+
+@controller_required
+@require_GET
+def exam_day_data(request):
+    """Imtihon kuni sahifasi uchun JSON (StudentTest jonli hisoblagichlaridan)."""
+    return JsonResponse(live_overview())
+
+
+@controller_required
+@require_GET
+def live_monitor_changes(request):
+    """Short-poll: ?cursor= dan keyin o'zgargan urinish qatorlari (cursor yo'q yoki eski bo'lsa snapshot)."""
+    test_id = request.GET.get('test_id')
+    if not test_id or not test_id.isdigit():
+        return JsonResponse({'error': 'test_id is required'}, status=400)
+    try:
+        test = Test.objects.select_related('subject', 'group').get(id=test_id)
+    except Test.DoesNotExist:
+        return JsonResponse({'error': 'Test not found'}, status=404)
+    cursor = request.GET.get('cursor') or ''
+    return JsonResponse(live_changes(test, int(cursor) if cursor.isdigit() else None))
 # --- WORD EXPORT ---
 
 # GroupSubject ro'yxati (faqat controller)
@@ -574,7 +520,7 @@ def export_users_word(request):
         users = users.filter(bulim_id=filter_bulim)
     # Role bo‘yicha ajratish
     role_map = defaultdict(list)
-    for user in users:
+    for user in track_progress(users, users.count):
         role_map[user.get_role_display()].append(user)
     doc = Document()
     doc.add_heading('Foydalanuvchilar ro‘yxati', 0)
@@ -633,7 +579,7 @@ def export_users_pdf(request):
     if filter_bulim:
         users = users.filter(bulim_id=filter_bulim)
     role_map = defaultdict(list)
-    for user in users:
+    for user in track_progress(users, users.count):
         role_map[user.get_role_display()].append(user)
     output = io.BytesIO()
     c = canvas.Canvas(output, pagesize=A4)
@@ -698,22 +644,10 @@ def export_users_excel(request):
         users = users.filter(kafedra_id=filter_kafedra)
     if filter_bulim:
         users = users.filter(bulim_id=filter_bulim)
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Foydalanuvchilar'
-    ws.append(['Ism', 'Familiya', 'Access code'])
-    for user in users:
-        ws.append([
-            getattr(user, 'first_name', ''),
-            getattr(user, 'last_name', ''),
-            getattr(user, 'access_code', '')
-        ])
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    response = HttpResponse(output, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=foydalanuvchilar.xlsx'
-    return response
+    users = users.order_by('id').values_list('first_name', 'last_name', 'access_code')
+    return xlsx_response('foydalanuvchilar.xlsx', 'Foydalanuvchilar', ['Ism', 'Familiya', 'Access code'],
+                         (list(row) for row in track_progress(users.iterator(chunk_size=2000), users.count)),
+                         header_style=False)
 
 
 # Talabalar importi uchun Excel shablonini yuklab berish
@@ -991,7 +925,6 @@ def edit_test(request, test_id):
     test = get_object_or_404(Test, id=test_id, created_by=request.user)
     from main.models import StudentTest
     if not (request.user.is_superuser or request.user.is_staff):
-        from django.db.models import Exists, OuterRef
         has_participation = StudentTest.objects.filter(test_id=test.id).exists()
         if has_participation:
             return render(request, 'controller_panel/edit_test.html', {
@@ -1288,8 +1221,6 @@ def parse_duration_string(duration_str):
         return None
 
 
-from main.models import Kafedra, Bulim
-
 @login_required
 def add_test(request):
     login_redirect = login_check(request)
@@ -1508,6 +1439,7 @@ def assign_test(request, test_id):
                 'error': "Tanlangan ayrim guruhlar uchun shu fan va semestr bo'yicha allaqachon test mavjud. Iltimos ularni olib tashlang."
             })
         test.groups.set(valid_ids)
+        schedule_variant_generation(test)
         return redirect('controller_dashboard')
     assigned_ids = set(test.groups.values_list('id', flat=True))
     return render(request, 'controller_panel/assign_test.html', {
@@ -1533,6 +1465,7 @@ def assign_test_kafedra(request, test_id):
         ids = request.POST.getlist('kafedra_ids')
         valid_ids = [k.id for k in all_kaf if str(k.id) in ids]
         test.kafedralar.set(valid_ids)
+        schedule_variant_generation(test)
         return redirect('controller_dashboard')
     assigned_ids = set(test.kafedralar.values_list('id', flat=True))
     return render(request, 'controller_panel/assign_test_kafedra.html', {
@@ -1557,6 +1490,7 @@ def assign_test_bulim(request, test_id):
         ids = request.POST.getlist('bulim_ids')
         valid_ids = [b.id for b in all_b if str(b.id) in ids]
         test.bulimlar.set(valid_ids)
+        schedule_variant_generation(test)
         return redirect('controller_dashboard')
     assigned_ids = set(test.bulimlar.values_list('id', flat=True))
     return render(request, 'controller_panel/assign_test_bulim.html', {
@@ -0,0 +1,61 @@
+"""Eksport navbati uchun JSON endpointlar: navbatga qo'yish, holatni so'rash va tayyor faylni yuklash."""
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
+from .export_jobs import EXPORT_KINDS, can_access, request_export
+from .models import ExportJob
+
+
+def job_payload(job, reused=False):
+    data = {
+        'id': job.id,
+        'kind': job.kind,
+        'label': EXPORT_KINDS.get(job.kind, ('', (), (), job.kind))[3],
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'reused': reused,
+        'status_url': reverse('export_job_status', args=[job.id]),
+        'download_url': None,
+    }
+    if job.status == 'done':
+        data['download_url'] = reverse('export_job_download', args=[job.id])
+    return data
+
+
+@require_POST
+def export_job_create(request):
+    """POST kind=<tur> + eksport viewining GET filtrlari (va URL argumentlari, masalan group_id)."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'unauthenticated'}, status=401)
+    kind = request.POST.get('kind', '')
+    if kind not in EXPORT_KINDS:
+        return JsonResponse({'error': "Noma'lum eksport turi"}, status=400)
+    kwargs = {name: request.POST.get(name, '') for name in EXPORT_KINDS[kind][1]}
+    try:
+        job, reused = request_export(request.user, kind, request.POST, kwargs,
+                                     host=request.get_host(), secure=request.is_secure())
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(job_payload(job, reused), status=200 if reused else 202)
+
+
+@require_GET
+def export_job_status(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id)
+    if not can_access(request.user, job):
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    return JsonResponse(job_payload(job))
+
+
+@require_GET
+def export_job_download(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id)
+    if not can_access(request.user, job):
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    if job.status != 'done' or not job.file or not job.file.storage.exists(job.file.name):
+        raise Http404("Fayl tayyor emas")
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.filename,
+                        content_type=job.content_type or None)
@@ -1,89 +1,77 @@
-from django.shortcuts import render, redirect
-from django.contrib.auth.decorators import login_required, user_passes_test
-from main.models import StudentTest, Group, Bulim, Kafedra, User, Test, Subject
+from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
+from main.models import StudentTest, Group, Test, Subject, ResultRollup
+from main.rollups import keyed
+from main.roster import non_participants
+from main.results_query import completed_results
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse
-from django.db.models import Q, F, FloatField, ExpressionWrapper
+from django.db.models import Q, F, FloatField, ExpressionWrapper, Sum
 from django.db.models.functions import Coalesce
 from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from reportlab.lib.units import mm
-from reportlab.platypus import Table, TableStyle
 from django.http import HttpResponse
 import io
+from collections import Counter
+from django.utils import timezone
 
 @login_required
 def participated_students_list(request):
-    from main.models import StudentAnswer
-    from django.db.models import Count, Case, When, F, FloatField, Value
-    from django.db.models.functions import Cast
-    from django.db.models import Count, Case, When, F, FloatField
-
-    # Completed student tests with required relations
-    student_tests = StudentTest.objects.filter(completed=True).select_related(
-        'student', 'test', 'group', 'subject', 'semester', 'test__subject'
-    ).prefetch_related('answers')
-
-    # Compute per-stats for display (correct count and percent)
-    from main.models import StudentAnswer
-    for st in student_tests:
-        answers = StudentAnswer.objects.filter(student_test=st)
-        if st.question_ids:
-            answers = answers.filter(question_id__in=st.question_ids)
-        total = answers.count()
-        correct = answers.filter(is_correct=True).count()
-        st.total_answers = total
-        st.correct_answers_count = correct
-        st.percent_result = round((correct / total * 100), 1) if total > 0 else 0
-
-    # Build subject -> group -> {passed: [st], failed: [st]}
+    """Fan → Guruh daraxti ResultRollup xulosalaridan; guruh ochilganda talabalar ro'yxati
+    participated_bucket orqali yuklanadi (urinishlar sahifa ochilganda aylanib chiqilmaydi)."""
+    rows = (
+        ResultRollup.objects.values('subject_id', 'subject__name', 'group_id', 'group__name')
+        .annotate(n_attempts=Sum('attempts'), n_passed=Sum('passed'), n_failed=Sum('failed'),
+                  percent_total=Sum(F('avg_percent') * F('attempts')))
+        .order_by('subject__name', 'group__name')
+    )
     subject_data = {}
-    for st in student_tests:
-        # Subject resolution
-        subj = st.subject or getattr(st.test, 'subject', None)
-        if not subj:
-            continue
-        # Group resolution: prefer StudentTest.group, else if student's real group matches one of Test.groups
-        grp = st.group
-        if not grp:
-            try:
-                real_grp = getattr(st.student, 'group', None)
-                if real_grp and st.test.groups.filter(id=real_grp.id).exists():
-                    grp = real_grp
-            except Exception:
-                grp = st.group  # leave None
-        if not grp:
-            continue
-
-        if subj not in subject_data:
-            subject_data[subj] = {}
-        if grp not in subject_data[subj]:
-            subject_data[subj][grp] = {'passed': [], 'failed': [], 'not_participated': []}
-
-        if getattr(st, 'final_passed', False):
-            subject_data[subj][grp]['passed'].append(st)
-        else:
-            subject_data[subj][grp]['failed'].append(st)
-
-    # After collecting passed/failed, compute not_participated per (subject, group)
-    for subj, groups in list(subject_data.items()):
-        for grp, buckets in list(groups.items()):
-            participant_ids = {st.student_id for st in buckets['passed']} | {st.student_id for st in buckets['failed']}
-            # Only consider students in this group
-            group_students_qs = User.objects.filter(role='student', group=grp).only('id', 'first_name', 'last_name', 'username', 'access_code')
-            not_parts = group_students_qs.exclude(id__in=participant_ids).order_by('last_name', 'first_name')
-            # Store as list for template
-            buckets['not_participated'] = list(not_parts)
+    for row in rows:
+        subject = (row['subject_id'], row['subject__name'])
+        subject_data.setdefault(subject, []).append({
+            'id': row['group_id'],
+            'name': row['group__name'],
+            'attempts': row['n_attempts'],
+            'passed': row['n_passed'],
+            'failed': row['n_failed'],
+            'avg_percent': round(row['percent_total'] / row['n_attempts'], 1) if row['n_attempts'] else 0,
+        })
+    # Qatnashmaganlar soni – barcha juftlar uchun bitta so'rov
+    missing = non_participants(pairs={(sid, g['id']) for (sid, _), groups in subject_data.items() for g in groups})
+    subjects = []
+    for (sid, name), groups in subject_data.items():
+        for g in groups:
+            g['not_participated'] = len(missing.get((sid, g['id']), ()))
+        subjects.append({'id': sid, 'name': name, 'groups': groups})
 
     # All groups for top-level PDF export selector
     all_groups = Group.objects.all().order_by('name')
     return render(request, 'controller_panel/participated_students_list.html', {
-        'subject_data': subject_data,
+        'subjects': subjects,
         'all_groups': all_groups,
     })
 
 
+@login_required
+def participated_bucket(request):
+    """Bitta (fan, guruh) uchun o'tganlar, yiqilganlar va qatnashmaganlar jadvali (HTML qism)."""
+    subject_id = request.GET.get('subject_id')
+    group_id = request.GET.get('group_id')
+    if not (subject_id or '').isdigit() or not (group_id or '').isdigit():
+        return HttpResponse("subject_id va group_id majburiy", status=400)
+    attempts = keyed(completed_results()).filter(
+        rollup_subject=int(subject_id), rollup_group=int(group_id)
+    ).select_related('student', 'test', 'semester').order_by('student__last_name', 'student__first_name', 'id')
+    buckets = {'passed': [], 'failed': []}
+    for st in attempts:
+        st.percent_result = round(st.percent, 1)
+        buckets['passed' if st.passed_flag else 'failed'].append(st)
+    pair = (int(subject_id), int(group_id))
+    buckets['not_participated'] = non_participants(pairs=[pair]).get(pair, [])
+    return render(request, 'controller_panel/partials/_participated_bucket.html', {'buckets': buckets})
+
+
 @login_required
 def export_failed_pdf(request):
     """
@@ -102,6 +90,8 @@ def export_failed_pdf(request):
     mode = request.GET.get('mode') or request.GET.get('format') or 'access'
     if not group_id:
         return HttpResponse('group_id is required', status=400)
+    if subject_id and not subject_id.isdigit():
+        return HttpResponse('subject_id must be an integer', status=400)
 
     try:
         group = Group.objects.get(id=group_id)
@@ -119,10 +109,10 @@ def export_failed_pdf(request):
     # Compute percent and filter failed only
     final_score = Coalesce(F('overridden_score'), F('total_score'))
     percent = ExpressionWrapper(final_score * 100.0 / F('test__total_score'), output_field=FloatField())
-    failed_qs = base.annotate(percent=percent).filter(
+    failed_qs = base.annotate(final_percent=percent).filter(
         pass_override=False,
         test__total_score__gt=0,
-        percent__lt=F('test__pass_percent')
+        final_percent__lt=F('test__pass_percent')
     ).select_related('student', 'test', 'test__subject', 'semester').order_by('student__id', '-end_time', '-start_time')
 
     # Deduplicate: latest attempt per student (if subject filtered),
@@ -149,17 +139,18 @@ def export_failed_pdf(request):
         st.student.username or ''
     ))
 
-    # Compute NOT PARTICIPATED list for the same scope (group [+ subject])
-    group_students = User.objects.filter(role='student', group=group).only('id', 'first_name', 'last_name', 'username', 'access_code', 'middle_name')
-    participants_qs = StudentTest.objects.filter(completed=True).filter(
-        Q(group_id=group.id)
-        | (Q(group__isnull=True) & Q(student__group_id=group.id) & Q(test__groups__id=group.id))
-    )
+    # Compute NOT PARTICIPATED list for the same scope (group [+ subject]) – bitta anti-join so'rov.
+    # Fan berilmasa: guruhga biriktirilgan hech bir fan testini topshirmaganlar
     if subject_id:
-        participants_qs = participants_qs.filter(Q(subject_id=subject_id) | Q(test__subject_id=subject_id))
-    participant_ids = participants_qs.values_list('student_id', flat=True).distinct()
-    not_part_qs = group_students.exclude(id__in=participant_ids).order_by('last_name', 'first_name')
-    not_part = list(not_part_qs)
+        pair = (int(subject_id), group.id)
+        not_part = non_participants(pairs=[pair]).get(pair, [])
+    else:
+        roster = non_participants(group_ids=[group.id])
+        assigned = Test.objects.filter(groups=group).values('subject_id').distinct().count()
+        misses = Counter(u.id for users in roster.values() for u in users)
+        students = {u.id: u for users in roster.values() for u in users}
+        not_part = sorted((students[uid] for uid, n in misses.items() if n == assigned),
+                          key=lambda u: (u.last_name or '', u.first_name or '', u.id))
 
     # PDF build common header
     buffer = io.BytesIO()
@@ -276,7 +267,6 @@ def export_failed_pdf(request):
             sem_list = [s for s in sem_list if s is not None]
             if sem_list:
                 # Choose the most common semester among failed, or first
-                from collections import Counter
                 sem_for_np = str(Counter(sem_list).most_common(1)[0][0])
             else:
                 any_st = base.exclude(semester__isnull=True).first()
@@ -315,6 +305,52 @@ def export_failed_pdf(request):
     resp['Content-Disposition'] = f'attachment; filename="{base_name}.pdf"'
     return resp
 
+def _id_list(value):
+    """Vergul bilan ajratilgan ID lar ro'yxati; bo'sh bo'lsa None, noto'g'ri qiymatda ValueError."""
+    parts = [p.strip() for p in (value or '').split(',') if p.strip()]
+    if not parts:
+        return None
+    if not all(p.isdigit() for p in parts):
+        raise ValueError
+    return [int(p) for p in parts]
+
+
+@login_required
+def non_participants_json(request):
+    """Imtihon kuni nazoratchi so'rab turadigan ro'yxat: (fan, guruh) bo'yicha hali topshirmaganlar.
+
+    GET: group_id, subject_id – vergul bilan ajratilgan ID lar (ixtiyoriy); active=0 – nofaol
+    testlar ham hisobga olinadi (default faqat faol testlar).
+    """
+    if getattr(request.user, 'role', None) not in ('admin', 'controller') and not request.user.is_superuser:
+        return JsonResponse({'error': "Ruxsat yo'q"}, status=403)
+    try:
+        group_ids = _id_list(request.GET.get('group_id'))
+        subject_ids = _id_list(request.GET.get('subject_id'))
+    except ValueError:
+        return JsonResponse({'error': "group_id va subject_id butun son bo'lishi kerak"}, status=400)
+    roster = non_participants(group_ids=group_ids, subject_ids=subject_ids,
+                              active_only=request.GET.get('active', '1') != '0')
+    pairs = [
+        {
+            'subject_id': subject_id,
+            'group_id': group_id,
+            'count': len(users),
+            'students': [
+                {'id': u.id, 'full_name': u.get_full_name() or u.username, 'username': u.username,
+                 'access_code': u.access_code}
+                for u in users
+            ],
+        }
+        for (subject_id, group_id), users in sorted(roster.items())
+    ]
+    return JsonResponse({
+        'generated_at': timezone.now().isoformat(),
+        'total': sum(p['count'] for p in pairs),
+        'pairs': pairs,
+    })
+
+
 @require_POST
 @login_required
 def allow_retake(request):
@@ -395,6 +431,6 @@ def allow_retake_group_subject_failed(request):
         Q(group_id=group_id, subject_id=subject_id)
         | Q(group_id=group_id, test__subject_id=subject_id)
         | (Q(group__isnull=True) & Q(student__group_id=group_id) & Q(test__groups__id=group_id) & Q(test__subject_id=subject_id))
-    ).annotate(percent=percent).filter(pass_override=False, test__total_score__gt=0, percent__lt=F('test__pass_percent')).distinct()
+    ).annotate(final_percent=percent).filter(pass_override=False, test__total_score__gt=0, final_percent__lt=F('test__pass_percent')).distinct()
     updated = qs.update(can_retake=True)
     return JsonResponse({'success': True, 'updated': updated})
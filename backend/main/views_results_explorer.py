@@ -0,0 +1,270 @@
+"""Natijalar explorer: fan/guruh xulosalari agregat so'rovlardan, talabalar va javoblar esa
+tugun ochilganda sahifalangan JSON orqali yuklanadi.
+
+Eski testapi_all_results barcha yakunlangan StudentTest va har bir javob tafsilotini bitta
+sahifada render qilar edi; endi sahifa faqat xulosalarni oladi.
+"""
+from django.core.paginator import Paginator
+from django.db.models import Avg, Case, CharField, Count, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+
+from .answer_key import get_answer_key
+from .models import Bulim, Group, Kafedra, StudentAnswer, StudentTest, Test
+from .results_query import completed_results
+
+
+PAGE_SIZE = 25
+ANSWERS_PAGE_SIZE = 50
+
+# Ruxsat etilgan saralash maydonlari (indekslangan yoki qatorning o'zida)
+SORT_FIELDS = {
+    'name': ('student__last_name', 'student__first_name', 'id'),
+    '-name': ('-student__last_name', '-student__first_name', '-id'),
+    'percent': ('percent', 'id'),
+    '-percent': ('-percent', '-id'),
+    'score': ('total_score', 'id'),
+    '-score': ('-total_score', '-id'),
+    'date': ('start_time', 'id'),
+    '-date': ('-start_time', '-id'),
+}
+DEFAULT_SORT = 'name'
+
+
+def _can_view(user):
+    return user.is_authenticated and getattr(user, 'role', None) in ('admin', 'controller')
+
+
+def _first_and_count(through, field):
+    rows = through.objects.filter(test_id=OuterRef('test_id'))
+    first = Subquery(rows.order_by(field).values(field)[:1])
+    count = Subquery(rows.values('test_id').annotate(n=Count('id')).values('n')[:1])
+    return first, count
+
+
+def _key(prefix, value):
+    return Concat(Value(prefix), Cast(value, CharField()))
+
+
+def with_node(qs):
+    """Explorer tuguni kaliti – node: 'g:<id>' guruh, 'k:<id>' / 'kn:<soni>' kafedra(lar),
+    'b:<id>' / 'bn:<soni>' bo'lim(lar), '' noma'lum.
+
+    Guruh tartibi eski sahifadagi kabi: test.group, urinish guruhi, talabaning guruhi (test.groups
+    ichida bo'lsa), test.groups ning birinchisi. Guruh bo'lmasa (tutor/xodim urinishlari) test
+    biriktirilgan kafedra, so'ng bo'lim; bir nechta bo'lsa ular soni bo'yicha birlashtiriladi.
+    """
+    groups = Test.groups.through.objects.filter(test_id=OuterRef('test_id'))
+    kafedra_first, kafedra_count = _first_and_count(Test.kafedralar.through, 'kafedra_id')
+    bulim_first, bulim_count = _first_and_count(Test.bulimlar.through, 'bulim_id')
+    return qs.annotate(
+        group_key=Coalesce(
+            'test__group_id', 'group_id',
+            Subquery(groups.filter(group_id=OuterRef('student__group_id')).values('group_id')[:1]),
+            Subquery(groups.order_by('group_id').values('group_id')[:1]),
+            output_field=IntegerField(),
+        ),
+        kafedra_first=kafedra_first, kafedra_count=kafedra_count,
+        bulim_first=bulim_first, bulim_count=bulim_count,
+    ).annotate(node=Case(
+        When(group_key__isnull=False, then=_key('g:', 'group_key')),
+        When(test__kafedra_id__isnull=False, then=_key('k:', 'test__kafedra_id')),
+        When(kafedra_count=1, then=_key('k:', 'kafedra_first')),
+        When(kafedra_count__gt=1, then=_key('kn:', 'kafedra_count')),
+        When(test__bulim_id__isnull=False, then=_key('b:', 'test__bulim_id')),
+        When(bulim_count=1, then=_key('b:', 'bulim_first')),
+        When(bulim_count__gt=1, then=_key('bn:', 'bulim_count')),
+        default=Value(''),
+        output_field=CharField(),
+    ))
+
+
+# Tugun turi: (tartib, sarlavha shabloni, konteyner turi)
+NODE_KINDS = {
+    'g': (0, '{}', 'group'),
+    'k': (1, 'Kafedra: {}', 'kafedra'),
+    'kn': (2, 'Kafedralar ({})', 'kafedra'),
+    'b': (3, "Bo'lim: {}", 'bulim'),
+    'bn': (4, "Bo'limlar ({})", 'bulim'),
+}
+
+
+def _node_labels(nodes):
+    """{node: (saralash kaliti, nom, konteyner turi)} – nomlar turi bo'yicha bitta so'rov bilan."""
+    ids = {}
+    for node in nodes:
+        kind, _, value = node.partition(':')
+        if kind in ('g', 'k', 'b'):
+            ids.setdefault(kind, set()).add(int(value))
+    names = {
+        'g': Group.objects.in_bulk(ids.get('g', ())),
+        'k': Kafedra.objects.in_bulk(ids.get('k', ())),
+        'b': Bulim.objects.in_bulk(ids.get('b', ())),
+    }
+    labels = {}
+    for node in nodes:
+        kind, _, value = node.partition(':')
+        if kind not in NODE_KINDS:
+            labels[node] = ((len(NODE_KINDS), ''), "NOMA'LUM GURUH", 'group')
+            continue
+        order, template, container = NODE_KINDS[kind]
+        obj = names[kind].get(int(value)) if kind in names else None
+        name = template.format(obj.name if obj else value)
+        labels[node] = ((order, name), name, container)
+    return labels
+
+
+def _summary_fields():
+    return {
+        'attempts': Count('id'),
+        'students': Count('student', distinct=True),
+        'avg_percent': Avg('percent'),
+        'passed': Sum('passed_flag'),
+    }
+
+
+def results_explorer(request):
+    if not request.user.is_authenticated:
+        return redirect('/api/login/')
+    if not _can_view(request.user):
+        return redirect('testapi_dashboard')
+
+    qs = completed_results()
+    subjects = list(
+        qs.values('test__subject_id', 'test__subject__name')
+        .annotate(**_summary_fields())
+        .order_by('test__subject__name')
+    )
+    group_rows = list(
+        with_node(qs).values('test__subject_id', 'node')
+        .annotate(**_summary_fields())
+        .order_by('node')
+    )
+    labels = _node_labels({row['node'] for row in group_rows})
+    groups_by_subject = {}
+    for row in group_rows:
+        row['sort_key'], row['group_name'], row['container_type'] = labels[row['node']]
+        groups_by_subject.setdefault(row['test__subject_id'], []).append(row)
+    for subject in subjects:
+        subject['groups'] = sorted(groups_by_subject.get(subject['test__subject_id'], []), key=lambda row: row['sort_key'])
+
+    return render(request, 'test_api/all_results.html', {
+        'subjects': subjects,
+        'kafedralar_list': Kafedra.objects.all().order_by('name'),
+        'bulimlar_list': Bulim.objects.all().order_by('name'),
+        'show_override': request.user.is_superuser,
+        'page_size': PAGE_SIZE,
+    })
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def results_students(request):
+    """Fan + guruh tuguni ochilganda: urinishlar ro'yxati (filtr, saralash, sahifalash serverda)."""
+    if not _can_view(request.user):
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    subject_param = request.GET.get('subject_id', '')
+    if subject_param == 'none':
+        qs = completed_results().filter(test__subject__isnull=True)
+    elif _int_or_none(subject_param) is not None:
+        qs = completed_results().filter(test__subject_id=int(subject_param))
+    else:
+        return JsonResponse({'error': 'subject_id majburiy'}, status=400)
+    if 'node' in request.GET:
+        qs = with_node(qs).filter(node=request.GET['node'])
+    search = (request.GET.get('q') or '').strip()
+    if search:
+        qs = qs.filter(
+            Q(student__username__icontains=search.lstrip('@'))
+            | Q(student__first_name__icontains=search)
+            | Q(student__last_name__icontains=search)
+        )
+    sort = request.GET.get('sort') or DEFAULT_SORT
+    qs = qs.order_by(*SORT_FIELDS.get(sort, SORT_FIELDS[DEFAULT_SORT]))
+    qs = qs.select_related('student', 'test', 'test__subject', 'overridden_by')
+
+    page = Paginator(qs, PAGE_SIZE).get_page(request.GET.get('page'))
+    show_override = request.user.is_superuser
+    rows = []
+    for st in page.object_list:
+        test_total = st.test.total_score
+        final_percent = (st.final_score / test_total) * 100 if test_total else st.percent
+        row = {
+            'id': st.id,
+            'student': f"{st.student.first_name} {st.student.last_name}".strip(),
+            'username': st.student.username,
+            'test': st.test.subject.name if st.test.subject else '',
+            'start_time': st.start_time.strftime('%d.%m.%Y %H:%M') if st.start_time else '',
+            'total': st.answered_count,
+            'correct': st.correct_count,
+            'score': st.total_score,
+            'max_score': test_total,
+            'percent': int(st.percent),
+            'passed': bool(st.passed_flag),
+        }
+        if show_override:
+            row.update({
+                'final_score': st.final_score,
+                'final_percent': int(final_percent),
+                'is_overridden': st.is_overridden,
+                'overridden_score': st.overridden_score,
+                'pass_override': st.pass_override,
+                'override_reason': st.override_reason or '',
+                'overridden_by': st.overridden_by.username if st.overridden_by else '',
+                'overridden_at': st.overridden_at.strftime('%d.%m.%Y %H:%M') if st.overridden_at else '',
+            })
+        rows.append(row)
+    return JsonResponse({
+        'results': rows,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'count': page.paginator.count,
+        'sort': sort if sort in SORT_FIELDS else DEFAULT_SORT,
+    })
+
+
+def _user_answer(answer):
+    qtype = answer.question.question_type
+    if qtype == 'single_choice':
+        options = list(answer.answer_option.all())
+        return options[0].text if options else ''
+    if qtype == 'multiple_choice':
+        return ", ".join(opt.text for opt in answer.answer_option.all())
+    if qtype in ('fill_in_blank', 'true_false', 'sentence_ordering'):
+        return answer.text_answer or ''
+    if qtype == 'matching':
+        return "Moslashtirish javobi"
+    return ''
+
+
+def results_answers(request, stest_id):
+    """Bitta urinishning batafsil javoblari (sahifalangan)."""
+    if not _can_view(request.user):
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    stest = get_object_or_404(StudentTest.objects.select_related('test'), id=stest_id, completed=True)
+    answers = StudentAnswer.objects.filter(student_test=stest)
+    if stest.question_ids:
+        answers = answers.filter(question_id__in=stest.question_ids)
+    answers = answers.select_related('question').prefetch_related('answer_option').order_by('id')
+    page = Paginator(answers, ANSWERS_PAGE_SIZE).get_page(request.GET.get('page'))
+    answer_key = get_answer_key(stest.test)
+    rows = [{
+        'id': answer.id,
+        'question': answer.question.text,
+        'user_answer': _user_answer(answer),
+        'correct_answer': answer_key.correct_answer(answer.question),
+        'is_correct': answer.is_correct,
+        'score': answer.score,
+    } for answer in page.object_list]
+    return JsonResponse({
+        'results': rows,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'count': page.paginator.count,
+    })
@@ -1,426 +1,65 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import mm
-from reportlab.platypus import Table, TableStyle, SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.styles import getSampleStyleSheet
-import qrcode
-from qrcode.constants import ERROR_CORRECT_H
 import io
-from PIL import Image, ImageDraw, ImageFont
 from django.db import transaction, IntegrityError
 from django.shortcuts import render
-from django.db.models import Q
-from .models import StudentTest, StudentAnswer, PdfVerification
-from .models import StudentTest, StudentAnswer, PdfVerification, Group, Kafedra, Bulim
 from .models import Dalolatnoma, User
 # Fan bo'yicha PDF natija yuklash
 from django.utils.encoding import smart_str
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.core.files.base import ContentFile
+from django.http import FileResponse
+import tempfile
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from .pdf_verification import verify
+from .subject_report import batch_targets, build_batch_zip, build_subject_results_pdf
+from .export_jobs import request_export
+from .views_export_jobs import job_payload
 def export_subject_results_pdf(request, subject_name):
     """Export selected subject results into a PDF and always return HttpResponse."""
-    from datetime import datetime
-    # 1) Base queryset
-    tests_qs = StudentTest.objects.filter(
-        test__subject__name=subject_name,
-        completed=True
-    ).select_related('student', 'test', 'test__group')
-
-    # 2) Filters from query params
-    group_name = request.GET.get('group') or ''
-    semester_number = request.GET.get('semester') or ''
-    attempt_count_param = request.GET.get('attempt_count') or ''
-    attempt_gte_param = request.GET.get('attempt_gte') or ''
-    attempt_min_param = request.GET.get('attempt_min') or ''
-    attempt_max_param = request.GET.get('attempt_max') or ''
-    attempt_nth_param = request.GET.get('attempt_nth') or ''
-    kafedra_id_param = request.GET.get('kafedra_id') or ''
-    bulim_id_param = request.GET.get('bulim_id') or ''
-
-    if group_name:
-        try:
-            grp_obj = Group.objects.get(name=group_name)
-            tests_qs = tests_qs.filter(Q(group=grp_obj) | Q(student__group=grp_obj))
-        except Group.DoesNotExist:
-            tests_qs = tests_qs.filter(Q(group__name=group_name) | Q(student__group__name=group_name))
-        tests_qs = tests_qs.distinct()
-
-    if semester_number:
-        tests_qs = tests_qs.filter(Q(semester__number=semester_number) | Q(test__semester__number=semester_number))
-
-    tests_qs = tests_qs.distinct()
-
-    def to_int_safe(v):
-        try:
-            return int(v)
-        except (TypeError, ValueError):
-            return None
-
-    k_id = to_int_safe(kafedra_id_param)
-    b_id = to_int_safe(bulim_id_param)
-    if k_id:
-        tests_qs = tests_qs.filter(Q(test__kafedra_id=k_id) | Q(test__kafedralar__id=k_id)).distinct()
-    if b_id:
-        tests_qs = tests_qs.filter(Q(test__bulim_id=b_id) | Q(test__bulimlar__id=b_id)).distinct()
-
-    # 3) Attempt filtering buckets
-    from collections import defaultdict
-    bucket = defaultdict(list)
-    for st in tests_qs.order_by('student_id', 'start_time'):
-        bucket[st.student_id].append(st)
-
-    tests = []
-    def to_int(v):
-        try:
-            return int(v)
-        except (TypeError, ValueError):
-            return None
-
-    attempt_nth_val = to_int(attempt_nth_param)
-    if attempt_nth_val and attempt_nth_val > 0:
-        for arr in bucket.values():
-            if len(arr) >= attempt_nth_val:
-                tests.append(arr[attempt_nth_val - 1])
-    else:
-        attempt_count_val = to_int(attempt_count_param)
-        attempt_gte_val = to_int(attempt_gte_param)
-        attempt_min_val = to_int(attempt_min_param)
-        attempt_max_val = to_int(attempt_max_param)
-        for arr in bucket.values():
-            total_attempts = len(arr)
-            ok = True
-            if attempt_count_val and total_attempts != attempt_count_val:
-                ok = False
-            if ok and attempt_gte_val and total_attempts < attempt_gte_val:
-                ok = False
-            if ok and attempt_min_val and total_attempts < attempt_min_val:
-                ok = False
-            if ok and attempt_max_val and total_attempts > attempt_max_val:
-                ok = False
-            if ok:
-                tests.append(arr[-1])
-
-    try:
-        tests.sort(key=lambda st: (
-            (st.student.last_name or '').lower(),
-            (st.student.first_name or '').lower(),
-            (getattr(st.student, 'middle_name', '') or '').lower(),
-            (st.student.username or '')
-        ))
-    except Exception:
-        pass
-
-    # 4) Build PDF
-    response = HttpResponse(content_type='application/pdf')
+    pdf = build_subject_results_pdf(subject_name, request.GET, request.user, request.build_absolute_uri('/'))
+    response = HttpResponse(pdf, content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{smart_str(subject_name)}_test_natijalari.pdf"'
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=30,
-        leftMargin=30,
-        topMargin=30,
-        bottomMargin=40 * mm,  # QR uchun har bir sahifada bo'sh joy
-    )
-
-    elements = []
-    styles = getSampleStyleSheet()
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-    from reportlab.lib.styles import ParagraphStyle
-
-    title_style = ParagraphStyle('title', parent=styles['Title'], alignment=TA_CENTER, fontSize=16, spaceAfter=8)
-    subtitle_style = ParagraphStyle('subtitle', parent=styles['Normal'], alignment=TA_CENTER, fontSize=13, spaceAfter=8)
-    normal_style = ParagraphStyle('normal', parent=styles['Normal'], fontSize=11, spaceAfter=4)
-    right_style = ParagraphStyle('right', parent=styles['Normal'], alignment=TA_RIGHT, fontSize=11)
-    left_style = ParagraphStyle('left', parent=styles['Normal'], alignment=TA_LEFT, fontSize=11)
-    wrap_style = ParagraphStyle('tdwrap', parent=styles['Normal'], alignment=TA_LEFT, fontSize=10, leading=11)
-
-    elements.append(Spacer(1, 10))
-    elements.append(Paragraph("Kattaqurg'on Davlat Pedagogika instituti", ParagraphStyle('header', parent=styles['Normal'], alignment=TA_CENTER, fontSize=14, spaceAfter=0, leading=16)))
-    from django.utils.timezone import localtime
-    earliest = None
-    if tests:
-        try:
-            times = [t.start_time for t in tests if t.start_time]
-            earliest = min(times) if times else None
-        except Exception:
-            earliest = None
-    test_date_display = localtime(earliest).strftime('%d.%m.%Y') if earliest else datetime.now().strftime('%d.%m.%Y')
-    elements.append(Paragraph("Yakuniy nazorat test sinovlari natijalari", subtitle_style))
-    elements.append(Spacer(1, 32))
-    elements.append(Paragraph(f"Fanning nomi: {subject_name}", ParagraphStyle('subj', parent=styles['Normal'], fontSize=11, alignment=TA_LEFT, spaceAfter=2)))
-    elements.append(Paragraph(f"Test o'tkazilgan sana: {test_date_display}", ParagraphStyle('dateHead', parent=styles['Normal'], fontSize=9, alignment=TA_LEFT, textColor=colors.black)))
-    elements.append(Spacer(1, 12))
-
-    # Render table
-    container_header = "Guruh"
-    if k_id:
-        container_header = "Kafedra"
-    elif b_id:
-        container_header = "Bo'lim"
-
-    is_super = request.user.is_authenticated and request.user.is_superuser
-    if is_super:
-        data = [[
-            Paragraph('<b>№</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>F.I.O</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph(f'<b>{container_header}</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Savollar soni</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>To\'g\'ri javoblar</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Asl foiz</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Yakuniy foiz</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Final ball</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>O\'tgan?</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Status</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-        ]]
-    else:
-        data = [[
-            Paragraph('<b>№</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>F.I.O</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph(f'<b>{container_header}</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Savollar soni</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>To\'g\'ri javoblar</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Foizi</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-        ]]
-
-    for idx, stest in enumerate(tests, 1):
-        # F.I.O: otasining ismi (middle_name) bo'sh yoki None bo'lsa qo'shmaymiz
-        ln = (stest.student.last_name or '').upper()
-        fn = (stest.student.first_name or '').upper()
-        mn = getattr(stest.student, 'middle_name', None) or ''
-        fio = ' '.join([p for p in [ln, fn, mn.upper() if mn else ''] if p]).strip()
-
-        def resolve_group_name(st):
-            gname = None
-            if st.test.group:
-                gname = st.test.group.name
-            elif getattr(st, 'group', None):
-                gname = st.group.name if st.group else None
-            if gname is None:
-                student_group = getattr(st.student, 'group', None)
-                try:
-                    if student_group and st.test.groups.filter(id=student_group.id).exists():
-                        gname = student_group.name
-                except Exception:
-                    pass
-            if gname is None:
-                first_grp = st.test.groups.first()
-                if first_grp:
-                    gname = first_grp.name
-            return gname
-
-        if k_id:
-            try:
-                if getattr(stest.test, 'kafedra', None):
-                    container_value = stest.test.kafedra.name
-                elif hasattr(stest.test, 'kafedralar') and stest.test.kafedralar.exists():
-                    kc = stest.test.kafedralar.count()
-                    container_value = stest.test.kafedralar.first().name if kc == 1 else f"Kafedralar ({kc})"
-                else:
-                    container_value = '-'
-            except Exception:
-                container_value = '-'
-        elif b_id:
-            try:
-                if getattr(stest.test, 'bulim', None):
-                    container_value = stest.test.bulim.name
-                elif hasattr(stest.test, 'bulimlar') and stest.test.bulimlar.exists():
-                    bc = stest.test.bulimlar.count()
-                    container_value = stest.test.bulimlar.first().name if bc == 1 else f"Bo'limlar ({bc})"
-                else:
-                    container_value = '-'
-            except Exception:
-                container_value = '-'
-        else:
-            container_value = resolve_group_name(stest) or '-'
-
-        container_cell = Paragraph(container_value, wrap_style)
-        question_ids = stest.question_ids if stest.question_ids else []
-        if question_ids:
-            answers = StudentAnswer.objects.filter(student_test=stest, question_id__in=question_ids)
-        else:
-            answers = StudentAnswer.objects.filter(student_test=stest)
-        total = answers.count()
-        correct = answers.filter(is_correct=True).count()
-        original_percent = (correct / total) * 100 if total else 0
-        if hasattr(stest, 'final_score'):
-            try:
-                final_percent = (stest.final_score / stest.test.total_score) * 100 if stest.test.total_score else original_percent
-            except Exception:
-                final_percent = original_percent
-        else:
-            final_percent = original_percent
-        original_percent_str = f"{original_percent:.1f}".replace('.', ',') + "%"
-        final_percent_str = f"{final_percent:.1f}".replace('.', ',') + "%"
-
-        if is_super:
-            status_text = "Override" if (getattr(stest, 'overridden_score', None) is not None or getattr(stest, 'pass_override', False)) else "Normal"
-            final_ball_str = f"{getattr(stest,'final_score', stest.total_score):.1f}".replace('.', ',')
-            final_passed = getattr(stest, 'final_passed', False)
-            passed_label = "Ha" if final_passed else "Yo'q"
-            data.append([
-                idx,
-                Paragraph(fio, ParagraphStyle('td', alignment=TA_LEFT, fontSize=10)),
-                container_cell,
-                total,
-                correct,
-                original_percent_str,
-                final_percent_str,
-                final_ball_str,
-                passed_label,
-                status_text
-            ])
-        else:
-            data.append([
-                idx,
-                Paragraph(fio, ParagraphStyle('td', alignment=TA_LEFT, fontSize=10)),
-                container_cell,
-                total,
-                correct,
-                final_percent_str
-            ])
-
-    if is_super:
-        table = Table(data, colWidths=[8 * mm, 45 * mm, 20 * mm, 18 * mm, 18 * mm, 18 * mm, 18 * mm, 18 * mm, 15 * mm, 18 * mm])
-    else:
-        table = Table(data, colWidths=[13 * mm, 55 * mm, 28 * mm, 28 * mm, 38 * mm, 22 * mm])
-    ts = TableStyle([
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('ALIGN', (2, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
-        ('LINEABOVE', (0, 0), (-1, 0), 1, colors.black),
-        ('LINEBEFORE', (0, 0), (0, -1), 1, colors.black),
-        ('LINEAFTER', (-1, 0), (-1, -1), 1, colors.black),
-        ('LINEBELOW', (0, -1), (-1, -1), 1, colors.black),
-        ('LINEABOVE', (0, 1), (-1, 1), 0.5, colors.black),
-        ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('LEFTPADDING', (0, 0), (-1, -1), 3),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 3),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-    ])
-    ts.add('ALIGN', (2, 1), (2, -1), 'LEFT')
-    table.setStyle(ts)
-    elements.append(table)
-    elements.append(Spacer(1, 16))
-
-    # Signature block
-    sig_mid_style = ParagraphStyle('sigmid', parent=left_style, alignment=TA_CENTER, fontSize=10, spaceAfter=0)
-    sig_left_style = ParagraphStyle('sigleft', parent=left_style, fontSize=10, spaceAfter=0)
-    sig_name_style = ParagraphStyle('signame', parent=left_style, fontSize=10, spaceAfter=0)
-    signature_data = [[
-        Paragraph("O'UBB:", sig_left_style),
-        Paragraph("____________", sig_mid_style),
-        Paragraph("I.Madatov", sig_name_style)
-    ]]
-    signature_table = Table(signature_data, colWidths=[25 * mm, 70 * mm, 35 * mm])
-    signature_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-        ('ALIGN', (2, 0), (2, 0), 'LEFT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-        ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-        ('BOX', (0, 0), (-1, -1), 0, colors.white),
-        ('INNERGRID', (0, 0), (-1, -1), 0, colors.white),
-    ]))
-    elements.append(signature_table)
-    elements.append(Spacer(1, 12))
-
-    # QR in footer
-    import hashlib, time
-    record_count = len(tests)
-    payload_raw = f"SUBJECT={subject_name};COUNT={record_count};TS={int(time.time())}"
-    sig_hash = hashlib.sha256(payload_raw.encode()).hexdigest()[:32]
-    verification_obj, _ = PdfVerification.objects.get_or_create(
-        hash_code=sig_hash,
-        defaults={
-            'subject_name': subject_name,
-            'record_count': record_count,
-            'payload': payload_raw,
-            'generated_by': request.user if request.user.is_authenticated else None
-        }
-    )
-    qr_text = request.build_absolute_uri(f"/api/test-api/verify-qr/{verification_obj.hash_code}/")
-    qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECT_H, box_size=4, border=2)
-    qr.add_data(qr_text)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color=(19, 46, 120), back_color=(255, 255, 255)).convert('RGBA')
-
-    # Center overlay label
-    draw = ImageDraw.Draw(img)
-    W, H = img.size
-    overlay_ratio = 0.18
-    base_size = int(W * overlay_ratio)
-    try:
-        font = ImageFont.truetype("arial.ttf", base_size)
-    except Exception:
-        font = ImageFont.load_default()
-    text = "RTTM"
-    tb = draw.textbbox((0, 0), text, font=font)
-    tw, th = tb[2] - tb[0], tb[3] - tb[1]
-    pad_x, pad_y = 8, 6
-    box_x0 = (W - tw) // 2 - pad_x
-    box_y0 = (H - th) // 2 - pad_y
-    box_x1 = box_x0 + tw + pad_x * 2
-    box_y1 = box_y0 + th + pad_y * 2
-    grad_w, grad_h = int(box_x1 - box_x0), int(box_y1 - box_y0)
-    gradient = Image.new('RGBA', (grad_w, grad_h))
-    gdraw = ImageDraw.Draw(gradient)
-    start_col = (37, 99, 235)
-    end_col = (147, 51, 234)
-    for x in range(grad_w):
-        t = x / max(1, grad_w - 1)
-        r = int(start_col[0] + (end_col[0] - start_col[0]) * t)
-        g = int(start_col[1] + (end_col[1] - start_col[1]) * t)
-        b = int(start_col[2] + (end_col[2] - start_col[2]) * t)
-        gdraw.line([(x, 0), (x, grad_h)], fill=(r, g, b, 235))
-    mask = Image.new('L', (grad_w, grad_h), 0)
-    mask_draw = ImageDraw.Draw(mask)
-    try:
-        mask_draw.rounded_rectangle([0, 0, grad_w, grad_h], radius=10, fill=255)
-    except Exception:
-        mask_draw.rectangle([0, 0, grad_w, grad_h], fill=255)
-    shadow = Image.new('RGBA', (grad_w + 6, grad_h + 6), (0, 0, 0, 0))
-    sdraw = ImageDraw.Draw(shadow)
-    sdraw.ellipse([3, 3, grad_w + 3, grad_h + 3], fill=(0, 0, 0, 60))
-    img.alpha_composite(shadow, (int(box_x0 - 3), int(box_y0 - 3)))
-    img.paste(gradient, (int(box_x0), int(box_y0)), mask)
-    text_x = (W - tw) // 2
-    text_y = (H - th) // 2
-    draw.text((text_x + 1, text_y + 1), text, font=font, fill=(0, 0, 0, 90))
-    draw.text((text_x, text_y), text, font=font, fill=(255, 255, 255, 240))
-    qr_buffer = io.BytesIO()
-    img.save(qr_buffer, format='PNG')
-
-    def footer(c, doc):
-        from reportlab.lib.pagesizes import A4 as _A4
-        size = 25 * mm
-        x = _A4[0] - doc.rightMargin - size
-        padding = 3 * mm
-        y = max(padding, doc.bottomMargin - size - padding)
-        qr_buffer.seek(0)
-        c.drawImage(ImageReader(qr_buffer), x, y, size, size, preserveAspectRatio=True, mask='auto')
-
-    doc.build(elements, onFirstPage=footer, onLaterPages=footer)
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
     return response
-        
 
 
+def _batch_zip_denied(request):
+    if not request.user.is_authenticated:
+        return redirect('/api/login/')
+    if not (request.user.is_superuser or getattr(request.user, 'role', None) in ('admin', 'controller')):
+        return HttpResponse("Ruxsat yo'q", status=403)
+    return None
+
+
+# Bir nechta fan/guruh hisobotlari bitta ZIP da: ?subject=..&subject=..&group=..&semester=N (+ PDF filtrlari).
+# Fan berilmasa semestr (va guruhlar) bo'yicha natijasi bor barcha fanlar olinadi.
+# ZIP so'rov ichida qurilmaydi: eksport navbatiga qo'yiladi va job holati (JSON) qaytariladi.
+def export_subject_results_zip(request):
+    denied = _batch_zip_denied(request)
+    if denied:
+        return denied
+    job, reused = request_export(request.user, 'subject_results_zip', request.GET,
+                                 host=request.get_host(), secure=request.is_secure())
+    return JsonResponse(job_payload(job, reused), status=200 if reused else 202)
+
+
+def subject_results_zip_file(request):
+    """ZIP faylni quradi – faqat eksport navbati worker'i chaqiradi (export_jobs.EXPORT_KINDS)."""
+    denied = _batch_zip_denied(request)
+    if denied:
+        return denied
+    subjects = [s for s in request.GET.getlist('subject') if s.strip()]
+    groups = [g for g in request.GET.getlist('group') if g.strip()]
+    targets = batch_targets(subjects, groups, request.GET.get('semester') or None)
+    if not targets:
+        return HttpResponse("Hisobot uchun natijalar topilmadi", status=404)
+    tmp = tempfile.TemporaryFile()
+    build_batch_zip(tmp, targets, request.GET.dict(), request.user.id, request.build_absolute_uri('/'))
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename='natijalar_hisobotlari.zip', content_type='application/zip')
+
 
 # === DALOLATNOMA CREATE ===
 @login_required
@@ -504,314 +143,22 @@ def create_dalolatnoma(request, test_id):
         return JsonResponse({'error': 'student not found'}, status=404)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
-    else:
-        if attempt_count_val:
-            filter_bits.append(f"Aynan {attempt_count_val} marta (oxirgi urinish)")
-        if attempt_gte_val:
-            filter_bits.append(f">= {attempt_gte_val} marta (oxirgi urinish)")
-        if attempt_min_val or attempt_max_val:
-            span_min = attempt_min_val if attempt_min_val else 1
-            span_max = attempt_max_val if attempt_max_val else '∞'
-            filter_bits.append(f"Oraliq: {span_min}–{span_max} marta (oxirgi urinish)")
-  
-    # Table header and data
-    container_header = "Guruh"
-    if k_id:
-        container_header = "Kafedra"
-    elif b_id:
-        container_header = "Bo'lim"
-    is_super = request.user.is_authenticated and request.user.is_superuser
-    if is_super:
-        data = [[
-            Paragraph('<b>№</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>F.I.O</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph(f'<b>{container_header}</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Savollar soni</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>To\'g\'ri javoblar</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Asl foiz</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Yakuniy foiz</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Final ball</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>O\'tgan?</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Status</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-        ]]
-    else:
-        data = [[
-            Paragraph('<b>№</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>F.I.O</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph(f'<b>{container_header}</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Savollar soni</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>To\'g\'ri javoblar</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-            Paragraph('<b>Foizi</b>', ParagraphStyle('th', alignment=TA_CENTER, fontSize=10)),
-        ]]
-    for idx, stest in enumerate(tests, 1):
-        fio = f"{stest.student.last_name.upper()} {stest.student.first_name.upper()} {getattr(stest.student, 'middle_name', '')}".strip()
-        # Konteyner nomi: Kafedra/Bulim tanlangan bo'lsa shuni, aks holda guruh.
-        def resolve_group_name(st):
-            gname = None
-            if st.test.group:
-                gname = st.test.group.name
-            elif getattr(st, 'group', None):
-                gname = st.group.name if st.group else None
-            if gname is None:
-                student_group = getattr(st.student, 'group', None)
-                try:
-                    if student_group and st.test.groups.filter(id=student_group.id).exists():
-                        gname = student_group.name
-                except Exception:
-                    pass
-            if gname is None:
-                first_grp = st.test.groups.first()
-                if first_grp:
-                    gname = first_grp.name
-            return gname
-
-        container_value = '-'
-        if k_id:
-            # Kafedra nomini chiqarish
-            try:
-                if getattr(stest.test, 'kafedra', None):
-                    container_value = stest.test.kafedra.name
-                elif hasattr(stest.test, 'kafedralar') and stest.test.kafedralar.exists():
-                    kc = stest.test.kafedralar.count()
-                    container_value = stest.test.kafedralar.first().name if kc == 1 else f"Kafedralar ({kc})"
-            except Exception:
-                container_value = '-'
-        elif b_id:
-            try:
-                if getattr(stest.test, 'bulim', None):
-                    container_value = stest.test.bulim.name
-                elif hasattr(stest.test, 'bulimlar') and stest.test.bulimlar.exists():
-                    bc = stest.test.bulimlar.count()
-                    container_value = stest.test.bulimlar.first().name if bc == 1 else f"Bo'limlar ({bc})"
-            except Exception:
-                container_value = '-'
-        else:
-            container_value = resolve_group_name(stest) or '-'
-
-        group = container_value
-        container_cell = Paragraph(group, wrap_style)
-        question_ids = stest.question_ids if stest.question_ids else []
-        if question_ids:
-            answers = StudentAnswer.objects.filter(student_test=stest, question_id__in=question_ids)
-        else:
-            answers = StudentAnswer.objects.filter(student_test=stest)
-        total = answers.count()
-        correct = answers.filter(is_correct=True).count()
-        # Original foiz (savollarning to'g'ri javobidan kelib chiqqan holda)
-        original_percent = (correct/total)*100 if total else 0
-        # Yakuniy foiz (override bo'lsa final_score / test.total_score)
-        if hasattr(stest, 'final_score'):
-            try:
-                final_percent = (stest.final_score / stest.test.total_score) * 100 if stest.test.total_score else original_percent
-            except Exception:
-                final_percent = original_percent
-        else:
-            final_percent = original_percent
-        original_percent_str = f"{original_percent:.1f}".replace('.', ',') + "%"
-        final_percent_str = f"{final_percent:.1f}".replace('.', ',') + "%"
-        if is_super:
-            status_text = "Override" if (getattr(stest, 'overridden_score', None) is not None or getattr(stest, 'pass_override', False)) else "Normal"
-            final_ball_str = f"{getattr(stest,'final_score', stest.total_score):.1f}".replace('.', ',')
-            final_passed = getattr(stest, 'final_passed', False)
-            passed_label = "Ha" if final_passed else "Yo'q"
-            data.append([
-                idx,
-                Paragraph(fio, ParagraphStyle('td', alignment=TA_LEFT, fontSize=10)),
-                container_cell,
-                total,
-                correct,
-                original_percent_str,
-                final_percent_str,
-                final_ball_str,
-                passed_label,
-                status_text
-            ])
-        else:
-            data.append([
-                idx,
-                Paragraph(fio, ParagraphStyle('td', alignment=TA_LEFT, fontSize=10)),
-                container_cell,
-                total,
-                correct,
-                final_percent_str
-            ])
-
-    # Table column widths (ixcham va bir xil)
-    if is_super:
-        table = Table(data, colWidths=[8*mm, 42*mm, 20*mm, 17*mm, 17*mm, 17*mm, 17*mm, 17*mm, 14*mm, 16*mm])
-    else:
-        table = Table(data, colWidths=[12*mm, 52*mm, 26*mm, 26*mm, 34*mm, 20*mm])
-    ts = TableStyle([
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-    ('FONTSIZE', (0,0), (-1,0), 9),
-    ('FONTSIZE', (0,1), (-1,-1), 9),
-        ('ALIGN', (0,0), (0,-1), 'CENTER'),  # №
-        ('ALIGN', (1,0), (1,-1), 'LEFT'),    # F.I.O
-        ('ALIGN', (2,0), (-1,-1), 'CENTER'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('LINEBELOW', (0,0), (-1,0), 1, colors.black),
-        ('LINEABOVE', (0,0), (-1,0), 1, colors.black),
-        ('LINEBEFORE', (0,0), (0,-1), 1, colors.black),
-        ('LINEAFTER', (-1,0), (-1,-1), 1, colors.black),
-        ('LINEBELOW', (0,-1), (-1,-1), 1, colors.black),
-        ('LINEABOVE', (0,1), (-1,1), 0.5, colors.black),
-    ('INNERGRID', (0,0), (-1,-1), 0.4, colors.black),
-    ('LEFTPADDING', (0,0), (-1,-1), 2),
-    ('RIGHTPADDING', (0,0), (-1,-1), 2),
-    ('TOPPADDING', (0,0), (-1,-1), 2),
-    ('BOTTOMPADDING', (0,0), (-1,-1), 2),
-    ])
-    # Override: make container column text left-aligned for data rows, allow wrapping
-    ts.add('ALIGN', (2,1), (2,-1), 'LEFT')
-    table.setStyle(ts)
-    elements.append(table)
-    elements.append(Spacer(1, 12))
-
-    # Imzo blokini jadval tugagan joydan keyin (foydalanuvchi so'rovi bo'yicha)
-    elements.append(Spacer(1, 8))
-    # Imzo satri: O'UBB:  __________(imzoga joy)  I.Madatov
-    sig_mid_style = ParagraphStyle('sigmid', parent=left_style, alignment=TA_CENTER, fontSize=10, spaceAfter=0)
-    sig_left_style = ParagraphStyle('sigleft', parent=left_style, fontSize=10, spaceAfter=0)
-    sig_name_style = ParagraphStyle('signame', parent=left_style, fontSize=10, spaceAfter=0)
-    signature_data = [[
-        Paragraph("O'UBB:", sig_left_style),
-        Paragraph("____________", sig_mid_style),
-        Paragraph("I.Madatov", sig_name_style)
-    ]]
-    signature_table = Table(signature_data, colWidths=[25*mm, 70*mm, 35*mm])
-    signature_table.setStyle(TableStyle([
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('ALIGN', (0,0), (0,0), 'LEFT'),
-        ('ALIGN', (1,0), (1,0), 'CENTER'),
-        ('ALIGN', (2,0), (2,0), 'LEFT'),
-        ('LEFTPADDING', (0,0), (-1,-1), 0),
-        ('RIGHTPADDING', (0,0), (-1,-1), 4),
-        ('TOPPADDING', (0,0), (-1,-1), 2),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 2),
-        # No borders
-        ('BOX', (0,0), (-1,-1), 0, colors.white),
-        ('INNERGRID', (0,0), (-1,-1), 0, colors.white),
-    ]))
-    # QR va imzo blokini yonma-yon joylashtirish uchun signature_table ni hozircha qo'shmaymiz
-
-    # QR kod va imzo footerga (past) joylashtiriladi
-    import hashlib, time
-    record_count = len(tests)
-    payload_raw = f"SUBJECT={subject_name};COUNT={record_count};TS={int(time.time())}"
-    sig_hash = hashlib.sha256(payload_raw.encode()).hexdigest()[:32]
-    verification_obj, created = PdfVerification.objects.get_or_create(
-        hash_code=sig_hash,
-        defaults={
-            'subject_name': subject_name,
-            'record_count': record_count,
-            'payload': payload_raw,
-            'generated_by': request.user if request.user.is_authenticated else None
-        }
-    )
-    qr_text = request.build_absolute_uri(f"/api/test-api/verify-qr/{verification_obj.hash_code}/")
-    # Yangi: yuqori xatolik tuzatish (H) va avtomatik versiya tanlash, biroz katta modul
-    qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECT_H, box_size=4, border=2)
-    qr.add_data(qr_text)
-    qr.make(fit=True)
-    # Rangli modul va fon (yuqori kontrast saqlanadi)
-    module_color = (19, 46, 120)      # chuqur ko'k
-    background_color = (255, 255, 255)
-    img = qr.make_image(fill_color=module_color, back_color=background_color).convert('RGBA')
-
-    # --- Markaziy 'RTTM' overlay (gradient bilan) ---
-    draw = ImageDraw.Draw(img)
-    W, H = img.size
-    overlay_ratio = 0.18  # modul maydonining kichik qismi
-    base_size = int(W * overlay_ratio)
-    try:
-        font = ImageFont.truetype("arial.ttf", base_size)
-    except Exception:
-        font = ImageFont.load_default()
-    text = "RTTM"
-    tb = draw.textbbox((0,0), text, font=font)
-    tw, th = tb[2]-tb[0], tb[3]-tb[1]
-    pad_x = 8
-    pad_y = 6
-    box_x0 = (W - tw)//2 - pad_x
-    box_y0 = (H - th)//2 - pad_y
-    box_x1 = box_x0 + tw + pad_x*2
-    box_y1 = box_y0 + th + pad_y*2
-    # Gradient tayyorlash
-    grad_w = int(box_x1 - box_x0)
-    grad_h = int(box_y1 - box_y0)
-    from math import sqrt
-    gradient = Image.new('RGBA', (grad_w, grad_h))
-    gdraw = ImageDraw.Draw(gradient)
-    # Gradient ranglari (chapdan o'ngga ko'k -> binafsha)
-    start_col = (37, 99, 235)
-    end_col = (147, 51, 234)
-    for x in range(grad_w):
-        t = x / max(1, grad_w-1)
-        r = int(start_col[0] + (end_col[0]-start_col[0])*t)
-        g = int(start_col[1] + (end_col[1]-start_col[1])*t)
-        b = int(start_col[2] + (end_col[2]-start_col[2])*t)
-        gdraw.line([(x,0),(x,grad_h)], fill=(r,g,b,235))
-    # Yumaloq mask
-    mask = Image.new('L', (grad_w, grad_h), 0)
-    mask_draw = ImageDraw.Draw(mask)
-    try:
-        mask_draw.rounded_rectangle([0,0,grad_w,grad_h], radius=10, fill=255)
-    except Exception:
-        mask_draw.rectangle([0,0,grad_w,grad_h], fill=255)
-    # Soyali effekt (shadow) orqa fon uchun
-    shadow = Image.new('RGBA', (grad_w+6, grad_h+6), (0,0,0,0))
-    sdraw = ImageDraw.Draw(shadow)
-    sdraw.ellipse([3,3,grad_w+3,grad_h+3], fill=(0,0,0,60))
-    img.alpha_composite(shadow, (int(box_x0-3), int(box_y0-3)))
-    img.paste(gradient, (int(box_x0), int(box_y0)), mask)
-    # Matn (oq, ozgina soyali)
-    text_x = (W - tw)//2
-    text_y = (H - th)//2
-    # Soyasi (1px)
-    draw.text((text_x+1, text_y+1), text, font=font, fill=(0,0,0,90))
-    draw.text((text_x, text_y), text, font=font, fill=(255,255,255,240))
-    qr_buffer = io.BytesIO()
-    img.save(qr_buffer, format='PNG')
-
-    # Imzo blokini chiqaramiz (QR esa footerda chiziladi)
-    elements.append(signature_table)
-    elements.append(Spacer(1, 12))
-
-    def footer(c, doc):
-        # QR kodni har bir sahifa pastki marginida joylashtirish
-        from reportlab.lib.pagesizes import A4 as _A4
-        size = 25 * mm
-        x = _A4[0] - doc.rightMargin - size
-        padding = 4 * mm
-        y = max(padding, doc.bottomMargin - size - padding)
-        qr_buffer.seek(0)
-        c.drawImage(ImageReader(qr_buffer), x, y, size, size, preserveAspectRatio=True, mask='auto')
-
-    doc.build(elements, onFirstPage=footer, onLaterPages=footer)
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    return response
 
 
 def verify_qr(request, hash_code):
-    """QR kod orqali kelgan hashni tekshirish.
-    Topilsa: ma'lumot + 'Haqiqiy'. Topilmasa: 'Noto'g'ri' xabari.
+    """QR koddagi imzolangan tokenni (yoki eski hash'ni) tekshirish.
+    To'g'ri bo'lsa: ma'lumot + 'Haqiqiy'. Aks holda: 'Noto'g'ri' xabari.
+    Token tekshiruvi bazaga murojaat qilmaydi, javob o'zgarmas – ommaviy keshlanadi.
     """
-    obj = PdfVerification.objects.filter(hash_code=hash_code).first()
-    if not obj:
+    data = verify(hash_code)
+    if not data:
         return render(request, 'test_api/verify_qr.html', {
             'status': 'invalid',
             'hash': hash_code,
         })
-    return render(request, 'test_api/verify_qr.html', {
-        'status': 'valid',
-        'hash': obj.hash_code,
-        'subject': obj.subject_name,
-        'count': obj.record_count,
-        'created_at': obj.created_at,
-        'payload': obj.payload,
-    })
+    response = render(request, 'test_api/verify_qr.html', dict(data, status='valid', hash=hash_code))
+    patch_cache_control(response, public=True, max_age=settings.PDF_VERIFY_CACHE_SECONDS)
+    return response
 from django.contrib.auth.decorators import login_required
 @login_required
 def testapi_logout(request):
@@ -826,48 +173,8 @@ def export_employees_by_bulim_excel(request, bulim_id):
         bulim = Bulim.objects.get(id=bulim_id)
     except Bulim.DoesNotExist:
         return HttpResponse("Bo'lim topilmadi", status=404)
-    employee_users = User.objects.filter(role='employee', bulim=bulim)
-    employee_tests = StudentTest.objects.filter(completed=True, student__in=employee_users).select_related('student', 'test', 'test__subject', 'test__group').order_by('student__username', '-start_time')
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"{bulim.name} - Xodimlar"
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    headers = ["Xodim F.I.Sh.", "Username", "Test", "Fan", "Test sanasi", "Savollar soni", "To'g'ri javob", "Xato javob", "Ball", "Maksimal ball", "Foiz"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    row = 2
-    for stest in employee_tests:
-        fio = f"{stest.student.first_name} {stest.student.last_name}"
-        username = stest.student.username
-        test_name = stest.test.subject.name if stest.test.subject else "-"
-        subject = stest.test.subject.name if stest.test.subject else "-"
-        test_date = stest.start_time.strftime("%d.%m.%Y %H:%M")
-        question_ids = stest.question_ids if stest.question_ids else []
-        if question_ids:
-            answers = StudentAnswer.objects.filter(student_test=stest, question_id__in=question_ids)
-        else:
-            answers = StudentAnswer.objects.filter(student_test=stest)
-        total = answers.count()
-        correct = answers.filter(is_correct=True).count()
-        incorrect = total - correct
-        score = sum([a.score for a in answers])
-        percent = int((correct / total) * 100) if total else 0
-        data = [fio, username, test_name, subject, test_date, total, correct, incorrect, score, stest.test.total_score, f"{percent}%"]
-        for col, value in enumerate(data, 1):
-            ws.cell(row=row, column=col, value=value)
-        row += 1
-    column_widths = [22, 15, 20, 18, 18, 10, 12, 12, 10, 12, 8]
-    for col, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(col)].width = width
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{bulim.name}_xodimlar_natijalari.xlsx"'
-    wb.save(response)
-    return response
+    return _container_export(ResultFilter(role='employee', bulim=bulim.id), "Xodim F.I.Sh.",
+                             f"{bulim.name}_xodimlar_natijalari", f"{bulim.name} - Xodimlar")
 # Tutorlarnatijalarini kafedra bo‘yicha eksport
 def export_tutors_by_kafedra_excel(request, kafedra_id):
     if not request.user.is_authenticated:
@@ -877,48 +184,8 @@ def export_tutors_by_kafedra_excel(request, kafedra_id):
         kafedra = Kafedra.objects.get(id=kafedra_id)
     except Kafedra.DoesNotExist:
         return HttpResponse("Kafedra topilmadi", status=404)
-    tutor_users = User.objects.filter(role='tutor', kafedra=kafedra)
-    tutor_tests = StudentTest.objects.filter(completed=True, student__in=tutor_users).select_related('student', 'test', 'test__subject', 'test__group').order_by('student__username', '-start_time')
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"{kafedra.name} - Tutorlar"
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    headers = ["Tutor F.I.Sh.", "Username", "Test", "Fan", "Test sanasi", "Savollar soni", "To'g'ri javob", "Xato javob", "Ball", "Maksimal ball", "Foiz"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    row = 2
-    for stest in tutor_tests:
-        fio = f"{stest.student.first_name} {stest.student.last_name}"
-        username = stest.student.username
-        test_name = stest.test.subject.name if stest.test.subject else "-"
-        subject = stest.test.subject.name if stest.test.subject else "-"
-        test_date = stest.start_time.strftime("%d.%m.%Y %H:%M")
-        question_ids = stest.question_ids if stest.question_ids else []
-        if question_ids:
-            answers = StudentAnswer.objects.filter(student_test=stest, question_id__in=question_ids)
-        else:
-            answers = StudentAnswer.objects.filter(student_test=stest)
-        total = answers.count()
-        correct = answers.filter(is_correct=True).count()
-        incorrect = total - correct
-        score = sum([a.score for a in answers])
-        percent = int((correct / total) * 100) if total else 0
-        data = [fio, username, test_name, subject, test_date, total, correct, incorrect, score, stest.test.total_score, f"{percent}%"]
-        for col, value in enumerate(data, 1):
-            ws.cell(row=row, column=col, value=value)
-        row += 1
-    column_widths = [22, 15, 20, 18, 18, 10, 12, 12, 10, 12, 8]
-    for col, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(col)].width = width
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{kafedra.name}_tutorlar_natijalari.xlsx"'
-    wb.save(response)
-    return response
+    return _container_export(ResultFilter(role='tutor', kafedra=kafedra.id), "Tutor F.I.Sh.",
+                             f"{kafedra.name}_tutorlar_natijalari", f"{kafedra.name} - Tutorlar")
 # Talabalar natijalarini guruh bo‘yicha eksport
 def export_students_by_group_excel(request, group_id):
     if not request.user.is_authenticated:
@@ -928,60 +195,35 @@ def export_students_by_group_excel(request, group_id):
         group = Group.objects.get(id=group_id)
     except Group.DoesNotExist:
         return HttpResponse("Guruh topilmadi", status=404)
-    student_users = User.objects.filter(role='student', group=group)
-    student_tests = StudentTest.objects.filter(completed=True, student__in=student_users).select_related('student', 'test', 'test__subject', 'test__group').order_by('student__username', '-start_time')
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"{group.name} - Talabalar"
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    headers = ["Talaba F.I.Sh.", "Username", "Test", "Fan", "Test sanasi", "Savollar soni", "To'g'ri javob", "Xato javob", "Ball", "Maksimal ball", "Foiz"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    row = 2
-    for stest in student_tests:
-        fio = f"{stest.student.first_name} {stest.student.last_name}"
-        username = stest.student.username
-        test_name = stest.test.subject.name if stest.test.subject else "-"
-        subject = stest.test.subject.name if stest.test.subject else "-"
-        test_date = stest.start_time.strftime("%d.%m.%Y %H:%M")
-        question_ids = stest.question_ids if stest.question_ids else []
-        if question_ids:
-            answers = StudentAnswer.objects.filter(student_test=stest, question_id__in=question_ids)
-        else:
-            answers = StudentAnswer.objects.filter(student_test=stest)
-        total = answers.count()
-        correct = answers.filter(is_correct=True).count()
-        incorrect = total - correct
-        score = sum([a.score for a in answers])
-        percent = int((correct / total) * 100) if total else 0
-        data = [fio, username, test_name, subject, test_date, total, correct, incorrect, score, stest.test.total_score, f"{percent}%"]
-        for col, value in enumerate(data, 1):
-            ws.cell(row=row, column=col, value=value)
-        row += 1
-    column_widths = [22, 15, 20, 18, 18, 10, 12, 12, 10, 12, 8]
-    for col, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(col)].width = width
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{group.name}_talabalar_natijalari.xlsx"'
-    wb.save(response)
-    return response
+    return _container_export(ResultFilter(role='student', group=group.id), "Talaba F.I.Sh.",
+                             f"{group.name}_talabalar_natijalari", f"{group.name} - Talabalar")
+
+
+def _container_export(spec, fio_header, basename, title):
+    """Guruh/kafedra/bo'lim eksportlari: bitta urinish – bitta qator (javoblar yuklanmaydi)."""
+    export = ResultExport(result_queryset(spec, order_by=('student__username', '-start_time')),
+                          SUMMARY_COLUMNS, headers={'fio': fio_header})
+    return render_xlsx(export, f"{basename}.xlsx", title)
 from django.urls import reverse
 # Django templates orqali API test qilish uchun viewlar
-from django.shortcuts import render, redirect
-from django.contrib.auth import authenticate, login, logout
+from django.shortcuts import redirect
+from django.contrib.auth import login, logout
 from django.http import JsonResponse, HttpResponse
-from main.models import Test, Question, AnswerOption, StudentTest, StudentAnswer
-from main.models import User
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
+from main.models import Test, Question, StudentTest, StudentAnswer, Submission
+from .results_export import (DETAIL_COLUMNS, FORMATS, SUMMARY_COLUMNS, ResultExport, ResultFilter, render_xlsx,
+                             result_queryset, scope_filter)
+from . import answers_csv, results_export
 from django.utils import timezone
-import io
+from django.db.models import prefetch_related_objects
+from .scoring import save_answers
+from .answer_key import get_answer_key
+from .question_fragments import attach_question_fragments
+from .paper import ensure_paper, shuffled, tf_order
+from .admission import admit, admit_many
+from . import exam_queue, live_counters
+from .variants import assign_variant, variant_layout
+from .submissions import record_submission, resume_if_stalled
+from .exam_queue import release_exam_slot
 
 # Login sahifasi
 def testapi_login(request):
@@ -1035,343 +277,112 @@ def testapi_dashboard(request):
             test_map[key] = test
 
     final_tests = list(test_map.values())
-    # Status aniqlashni soddalashtiramiz: Test ID bo'yicha StudentTest yozuvi bor/yo'qligi
-    from main.models import StudentTest
-    student_test_rows = StudentTest.objects.filter(student=request.user, test_id__in=[t.id for t in final_tests])
-    # test_id -> row (completed & can_retake flaglari bo'yicha)
-    status_map = {}
-    for st in student_test_rows:
-        # Agar test uchun yakunlangan va can_retake False bo'lsa 'done'
-        if st.completed and not st.can_retake:
-            status_map[st.test_id] = 'done'
-        else:
-            # Agar incomplete yoki can_retake True bo'lsa yana 'new' sifatida ko'rinishi mumkin
-            status_map.setdefault(st.test_id, 'new')
-    test_statuses = {t.id: status_map.get(t.id, 'new') for t in final_tests}
+    # Status test sahifasidagi kirish tekshiruvi bilan bir xil: barcha testlar uchun bitta so'rov.
+    # Ro'yxat talaba guruhi bo'yicha filtrlangan, shuning uchun test.groups qayta tekshirilmaydi.
+    admissions = admit_many(request.user, final_tests, in_test_groups=True)
+    test_statuses = {t.id: 'new' if admissions[t.id] else 'done' for t in final_tests}
 
     return render(request, 'test_api/dashboard.html', {'tests': final_tests, 'test_statuses': test_statuses})
 
 
+def _parse_ids(values):
+    ids = []
+    for value in values:
+        value = (value or '').strip()
+        if value.isdigit():
+            ids.append(int(value))
+    return ids
+
+
 # Test savollari va javob berish
+@release_exam_slot
 def testapi_test(request, test_id):
     if not request.user.is_authenticated:
         return redirect('/api/login/')
 
-    from main.models import TestQuestion, StudentAnswer, StudentTest
-    import random
+    from main.models import TestQuestion, StudentTest
     test = Test.objects.get(id=test_id)
-    # Video ko'rsatish sharti: har bir yangi kirish (yangi urinish boshlanishi) da ko'rsatilsin.
-    # Avvalgi yechim session flag bilan faqat 1 marta ko'rsatar edi.
-    # Endi: student hali bu test bo'yicha javob berishni boshlamagan bo'lsa (hech qanday StudentAnswer yaratilmagan) pre-video chiqadi.
-    from main.models import StudentAnswer as _SA, TestQuestion as _TQ
-    # Old chain question__testquestion__test noto'g'ri (Question->TestQuestion or reversed). To'g'ri usul: testga tegishli savollar ID larini olib, ular bo'yicha StudentAnswer bor-yo'qligini tekshirish.
-    tq_qs = _TQ.objects.filter(test=test).values_list('question_id', flat=True)
-    # Talabaning ushbu TEST bo'yicha davom etayotgan (yakunlanmagan) javoblari bormi?
-    # Agar avvalgi urinish to'liq yakunlangan bo'lsa (StudentTest.completed=True) va retake ruxsat etilgan bo'lsa, video yana ko'rsatiladi.
-    active_answer_exists = _SA.objects.filter(
-        student_test__student=request.user,
-        student_test__test=test,
-        student_test__completed=False,
-        question_id__in=tq_qs
-    ).exists()
-    has_started = active_answer_exists
     # Foydalanuvchi doimo avval videoni ko'rsin: har safar test sahifasiga kirganda (start=1 bilan chetlab o'tmasa)
     if (getattr(test, 'video_url', None) or getattr(test, 'video_file', None)) and request.GET.get('start') != '1':
         if request.method == 'POST' and request.POST.get('ack_video') == '1':
             # Redirect with start=1 so second request testni o'zini ko'rsatadi
             return redirect(f"{reverse('testapi_test', args=[test.id])}?start=1")
         return render(request, 'test_api/pretest_video.html', {'test': test})
-    test_questions = list(TestQuestion.objects.filter(test=test))
-    # Talaba shu testda qatnashganmi?
-    # Talaba shu testda qatnashganmi? (fan, guruh, semestr bo'yicha faqat 1 marta)
-    group = test.group
+    test_questions = list(TestQuestion.objects.filter(test=test).select_related('question'))
     subject = test.subject
     semester = getattr(test, 'semester', None)
-    # Effective group (xuddi yaratishda ishlatganimizdek)
-    effective_group = group
-    if effective_group is None:
-        student_group = getattr(request.user, 'group', None)
-        try:
-            if student_group and test.groups.filter(id=student_group.id).exists():
-                effective_group = student_group
-        except Exception:
-            pass
-    # Re-entrance oldini olish: avval test_id bo'yicha to'g'ridan tekshiramiz
-    participated = StudentTest.objects.filter(student=request.user, test=test, completed=True, can_retake=False).exists()
-    if participated:
-        return render(request, 'test_api/already_participated.html', {'test': test})
-    # Legacy unique constraint fallback (student, group, subject, semester) ham mos kelsa bloklaymiz
-    legacy_exists = StudentTest.objects.filter(
-        student=request.user,
-        group=effective_group,
-        subject=subject,
-        semester=semester,
-        completed=True,
-        can_retake=False
-    ).exists()
-    if legacy_exists:
+    # Kirish tekshiruvi: test yoki (guruh, fan, semestr) bo'yicha yakunlangan urinish bormi va qaysi
+    # yakunlanmagan urinish davom ettiriladi – bitta so'rovda (main/admission.py)
+    admission = admit(request.user, test)
+    if not admission:
         return render(request, 'test_api/already_participated.html', {'test': test})
-    # Har bir talaba uchun random savollar tanlash (test.question_count ta)
-    # TEST yangilanganda (savol soni o'zgarsa yoki TestQuestion ro'yxati o'zgarsa), eski sessiya tanlovini yangilaymiz.
-    try:
-        from django.utils import timezone as _tz
-        last_updated = getattr(test, 'updated_at', None)
-        updated_marker = str(int(last_updated.timestamp())) if last_updated else '0'
-    except Exception:
-        updated_marker = '0'
-    current_signature = f"{updated_marker}:{test.question_count}:{len(test_questions)}"
-    sig_key = f'test_{test.id}_sig'
-    ids_key = f'test_{test.id}_question_ids'
-    session_signature = request.session.get(sig_key)
-    question_ids = request.session.get(ids_key)
-    if (not question_ids) or (session_signature != current_signature):
-        selected_tqs = random.sample(test_questions, min(test.question_count, len(test_questions)))
-        question_ids = [tq.question.id for tq in selected_tqs]
-        request.session[ids_key] = question_ids
-        request.session[sig_key] = current_signature
-    else:
-        selected_tqs = [tq for tq in test_questions if tq.question.id in question_ids]
+    effective_group_id = admission.group_id
+    # Ommaviy boshlanishda yangi urinishlar byudjet bo'yicha cheklanadi; ortiqchasi navbatda kutadi
+    if request.method == 'GET' and not admission.attempt and not exam_queue.try_enter(request, test.id):
+        ticket = request.session.get(f'examq_ticket_{test.id}')
+        return render(request, 'test_api/waiting.html', {
+            'test': test,
+            'ahead': exam_queue.queue_position(test.id, ticket),
+            'poll_interval': exam_queue.POLL_INTERVAL,
+        })
+    # Talaba varaqasi: yakunlanmagan urinish (StudentTest) davom ettiriladi yoki yaratiladi (live monitor uchun ham kerak).
+    # Savollar tanlovi va variantlar tartibi StudentTest.shuffle_seed dan deterministik hisoblanadi –
+    # sessiyada hech narsa saqlanmaydi, istalgan worker aynan shu varaqani qayta quradi.
+    st_incomplete = admission.attempt
+    if not st_incomplete:
+        st_incomplete = StudentTest.objects.create(
+            student=request.user,
+            test=test,
+            group_id=effective_group_id,
+            subject=subject,
+            semester=semester,
+        )
+        # Test biriktirilganda tayyorlangan variantlardan biri beriladi (bo'lmasa seed bo'yicha varaqa)
+        assign_variant(st_incomplete, test, len(test_questions))
+    tq_by_qid = {tq.question_id: tq for tq in test_questions}
+    question_ids = ensure_paper(st_incomplete, tq_by_qid.keys(), test.question_count)
+    seed = st_incomplete.shuffle_seed
+    selected_tqs = [tq_by_qid[qid] for qid in question_ids]
     questions = [tq.question for tq in selected_tqs]
+    # Variantlar har bir savol uchun alohida emas, bitta so'rov bilan yuklanadi
+    prefetch_related_objects(questions, 'answer_options')
     answered_questions = []
     # Matching uchun: har bir matching savol uchun aralashtirilgan right variantlar
     matching_rights_dict = {}
-    # Single/Multiple choice uchun: variantlarni aralashtirish (sessiyada barqaror saqlaymiz)
+    # Single/Multiple choice uchun: variantlarni aralashtirish (seed bo'yicha barqaror)
     choice_options_dict = {}
-    opt_order_key = f"test_{test.id}_opt_order"
-    try:
-        opt_order_map = request.session.get(opt_order_key, {})
-    except Exception:
-        opt_order_map = {}
-    # True/False uchun: ko'rinish tartibini aralashtirish (sessiyada barqaror)
+    # True/False uchun: ko'rinish tartibini aralashtirish (seed bo'yicha barqaror)
     tf_order_dict = {}
-    tf_order_key = f"test_{test.id}_tf_order"
-    try:
-        tf_order_map = request.session.get(tf_order_key, {})
-    except Exception:
-        tf_order_map = {}
-    for q in questions:
-        if q.question_type == 'matching':
-            rights = [opt for opt in q.answer_options.all() if opt.right or opt.image]
-            random.shuffle(rights)
-            matching_rights_dict[q.id] = rights
-        elif q.question_type in ('single_choice', 'multiple_choice'):
-            key = str(q.id)
-            order_ids = opt_order_map.get(key)
-            if not order_ids:
-                order_ids = [opt.id for opt in q.answer_options.all()]
-                random.shuffle(order_ids)
-                opt_order_map[key] = order_ids
-                try:
-                    request.session[opt_order_key] = opt_order_map
-                    request.session.modified = True
-                except Exception:
-                    pass
-            # ID tartibiga ko'ra obyektlarni qayta tartiblash
-            opts_by_id = {opt.id: opt for opt in q.answer_options.all()}
-            ordered_opts = [opts_by_id[oid] for oid in order_ids if oid in opts_by_id]
-            # Ba'zan yangi qo'shilgan variantlar bo'lsa, ularni oxiriga qo'shamiz
-            remaining = [opt for opt in q.answer_options.all() if opt.id not in set(order_ids)]
-            if remaining:
-                ordered_opts.extend(remaining)
-            choice_options_dict[q.id] = ordered_opts
-        elif q.question_type == 'true_false':
-            key = str(q.id)
-            order = tf_order_map.get(key)
-            if not order:
-                order = ['true', 'false']
-                random.shuffle(order)
-                tf_order_map[key] = order
-                try:
-                    request.session[tf_order_key] = tf_order_map
-                    request.session.modified = True
-                except Exception:
-                    pass
-            tf_order_dict[q.id] = order
-
-    # Ensure a StudentTest row exists for live monitoring (before submit)
-    try:
-        st_incomplete = StudentTest.objects.filter(student=request.user, test=test, completed=False).first()
-    except Exception:
-        st_incomplete = None
-    if not st_incomplete:
-        # Effective group: agar test.group yo'q bo'lsa va talabaning guruhi test.groups ichida bo'lsa shu qo'yamiz
-        effective_group_for_create = group
-        if effective_group_for_create is None:
-            student_group = getattr(request.user, 'group', None)
-            try:
-                if student_group and test.groups.filter(id=student_group.id).exists():
-                    effective_group_for_create = student_group
-            except Exception:
-                pass
-        try:
-            StudentTest.objects.create(
-                student=request.user,
-                test=test,
-                group=effective_group_for_create,
-                subject=subject,
-                semester=semester,
-                question_ids=request.session.get(f'test_{test.id}_question_ids', []) or [tq.question.id for tq in selected_tqs]
-            )
-        except Exception:
-            # Ignore duplicate races or any errors; not critical for flow
-            pass
-
-    if request.method == 'POST':
-        question_ids = request.session.get(f'test_{test.id}_question_ids', [])
-        selected_tqs = [tq for tq in test_questions if tq.question.id in question_ids]
-        # Effective group: agar test.group yo'q bo'lsa va talabaning guruhi test.groups ichida bo'lsa shu qo'yamiz
-        effective_group = group
-        if effective_group is None:
-            student_group = getattr(request.user, 'group', None)
-            try:
-                if student_group and test.groups.filter(id=student_group.id).exists():
-                    effective_group = student_group
-            except Exception:
-                pass
-        # Yaratish/ishlatish: mavjud yakunlanmagan StudentTest bo'lsa, uni qayta ishlatamiz, aks holda yangisini yaratamiz.
-        with transaction.atomic():
-            stest, created_st = StudentTest.objects.get_or_create(
-                student=request.user,
-                test=test,
-                completed=False,
-                defaults={
-                    'group': effective_group,
-                    'subject': subject,
-                    'semester': semester,
-                    'question_ids': question_ids
-                }
-            )
-            # Agar mavjud bo'lsa, savollarni va group/subject/semester ni sinxronlab qo'yamiz
-            if not created_st:
-                changed = False
-                if stest.group_id != getattr(effective_group, 'id', None):
-                    stest.group = effective_group
-                    changed = True
-                if stest.subject_id != getattr(subject, 'id', None):
-                    stest.subject = subject
-                    changed = True
-                if stest.semester_id != getattr(semester, 'id', None):
-                    stest.semester = semester
-                    changed = True
-                if stest.question_ids != question_ids:
-                    stest.question_ids = question_ids
-                    changed = True
-                if changed:
-                    stest.save(update_fields=['group', 'subject', 'semester', 'question_ids'])
-                # Oldingi javoblar bo'lsa, dublikat bo'lmasligi uchun tozalaymiz
-                StudentAnswer.objects.filter(student_test=stest).delete()
-
+    saved_answers = {}
+    # Saqlangan variant joriy bo'lsa tartiblar va HTML bo'laklar undan olinadi
+    variant = st_incomplete.variant
+    layout = None
+    if variant and variant.source_version == test.answer_key_version and variant.question_ids == question_ids:
+        layout = variant_layout(variant, questions)
+    if layout:
+        choice_options_dict, matching_rights_dict, tf_order_dict = layout
+    else:
         for q in questions:
-            is_correct = False
-            score = 0
-            tq = next((tq for tq in selected_tqs if tq.question.id == q.id), None)
-            if q.question_type == 'single_choice':
-                ans_id = request.POST.get(f'question_{q.id}')
-                option = AnswerOption.objects.filter(id=ans_id).first()
-                sa = StudentAnswer.objects.create(student_test=stest, question=q)
-                if option:
-                    sa.answer_option.add(option)
-                    if option.is_correct:
-                        is_correct = True
-                        score = tq.score if tq else 0
-                sa.is_correct = is_correct
-                sa.score = score
-                sa.save()
-                answered_questions.append(q.id)
+            options = sorted(q.answer_options.all(), key=lambda opt: opt.id)
+            if q.question_type == 'matching':
+                rights = [opt for opt in options if opt.right or opt.image]
+                matching_rights_dict[q.id] = shuffled(seed, q.id, rights, salt='matching')
+            elif q.question_type in ('single_choice', 'multiple_choice'):
+                choice_options_dict[q.id] = shuffled(seed, q.id, options)
             elif q.question_type == 'true_false':
-                ans_val = request.POST.get(f'question_{q.id}')
-                correct_option = q.answer_options.filter(is_correct=True).first()
-                sa = StudentAnswer.objects.create(student_test=stest, question=q, text_answer=ans_val)
-                if correct_option and (
-                    (ans_val == 'true' and correct_option.text.strip().lower() in ['to‘g‘ri', 'to‘gri', 'true']) or
-                    (ans_val == 'false' and correct_option.text.strip().lower() in ['noto‘g‘ri', 'noto‘gri', 'false'])
-                ):
-                    is_correct = True
-                    score = tq.score if tq else 0
-                sa.is_correct = is_correct
-                sa.score = score
-                sa.save()
-                answered_questions.append(q.id)
-            elif q.question_type == 'multiple_choice':
-                selected = [opt for opt in q.answer_options.all() if request.POST.get(f'question_{q.id}_{opt.id}')]
-                correct_options = list(q.answer_options.filter(is_correct=True))
-                sa = StudentAnswer.objects.create(student_test=stest, question=q)
-                for opt in selected:
-                    sa.answer_option.add(opt)
-                if set(selected) == set(correct_options):
-                    is_correct = True
-                    score = tq.score if tq else 0
-                sa.is_correct = is_correct
-                sa.score = score
-                sa.save()
-                answered_questions.append(q.id)
-            elif q.question_type == 'fill_in_blank':
-                txt = request.POST.get(f'question_{q.id}', '').strip().lower()
-                correct_option = q.answer_options.filter(is_correct=True).first()
-                if correct_option and txt == correct_option.text.strip().lower():
-                    is_correct = True
-                    score = tq.score if tq else 0
-                StudentAnswer.objects.create(
-                    student_test=stest,
-                    question=q,
-                    text_answer=txt,
-                    is_correct=is_correct,
-                    score=score
-                )
-                answered_questions.append(q.id)
-            elif q.question_type == 'matching':
-                correct = True
-                left_options = [opt for opt in q.answer_options.all() if opt.left]
-                for idx, left_opt in enumerate(left_options, 1):
-                    selected_right_id = request.POST.get(f'matching_{q.id}_{idx}')
-                    if not selected_right_id:
-                        correct = False
-                    else:
-                        right_opt = AnswerOption.objects.filter(id=selected_right_id).first()
-                        if not right_opt:
-                            correct = False
-                        else:
-                            # Matnli yoki rasmli javobni tekshirish
-                            if left_opt.right and right_opt.right:
-                                if left_opt.right != right_opt.right:
-                                    correct = False
-                            elif left_opt.image and right_opt.image:
-                                if left_opt.image.name != right_opt.image.name:
-                                    correct = False
-                            else:
-                                correct = False
-                if correct:
-                    is_correct = True
-                    score = tq.score if tq else 0
-                StudentAnswer.objects.create(
-                    student_test=stest,
-                    question=q,
-                    is_correct=is_correct,
-                    score=score
-                )
-                answered_questions.append(q.id)
-            elif q.question_type == 'sentence_ordering':
-                txt = request.POST.get(f'question_{q.id}', '').strip()
-                correct_options = q.answer_options.filter(is_correct=True).order_by('id')
-                student_words = [w.strip().lower() for w in txt.split()]
-                correct_words = [opt.text.strip().lower() for opt in correct_options]
-                if student_words == correct_words:
-                    is_correct = True
-                    score = tq.score if tq else 0
-                StudentAnswer.objects.create(
-                    student_test=stest,
-                    question=q,
-                    text_answer=txt,
-                    is_correct=is_correct,
-                    score=score
-                )
-                answered_questions.append(q.id)
-        
-        # Testni tugallangan deb belgilashdan oldin 'legacy unique' kombinatsiyasini tekshiramiz
+                tf_order_dict[q.id] = tf_order(seed, q.id)
+
+    if request.method == 'POST':
+        autosave_mode = request.POST.get('autosave_mode') == '1'
+        # Kirishda topilgan/yaratilgan yakunlanmagan urinish ishlatiladi
+        stest = st_incomplete
+        # Topshiriq avval jurnalga (Submission) yoziladi va darhol tasdiqlanadi; javoblarni baholash va
+        # StudentAnswer yozish commitdan keyin fon oqimida bajariladi (main/submissions.py)
         with transaction.atomic():
+            # Testni tugallangan deb belgilashdan oldin 'legacy unique' kombinatsiyasini tekshiramiz
             if StudentTest.objects.filter(
                 student=request.user,
-                group=effective_group,
+                group_id=effective_group_id,
                 subject=subject,
                 semester=semester,
                 completed=True,
@@ -1380,29 +391,34 @@ def testapi_test(request, test_id):
                 # Allaqachon shu kombinatsiyada tugallangan natija bor – dublikatga yo'l qo'ymaymiz
                 return render(request, 'test_api/already_participated.html', {'test': test})
 
+            stest.group_id = effective_group_id
+            stest.subject = subject
+            stest.semester = semester
             stest.completed = True
-            stest.total_score = sum([a.score for a in StudentAnswer.objects.filter(student_test=stest)])
             try:
-                stest.save()
+                with transaction.atomic():
+                    stest.save(update_fields=['group', 'subject', 'semester', 'completed', 'last_activity'])
             except IntegrityError:
                 # Poyga (race) holatida unikallik cheklovi urildi – xotirjam sahifaga yo'naltiramiz
                 return render(request, 'test_api/already_participated.html', {'test': test})
-        # Retake yoki keyingi kirishda yangidan aralashsin: sessiyadagi shuffle orderlarini tozalaymiz
-        try:
-            del request.session[f"test_{test.id}_opt_order"]
-        except Exception:
-            pass
-        try:
-            del request.session[f"test_{test.id}_tf_order"]
-        except Exception:
-            pass
+            record_submission(stest, request.POST, question_ids, autosave_mode)
+        # Eski versiyada sessiyada saqlangan varaqa kalitlarini tozalaymiz (endi varaqa StudentTest da)
+        for legacy_key in ('question_ids', 'sig', 'opt_order', 'tf_order'):
+            request.session.pop(f"test_{test.id}_{legacy_key}", None)
         
         return redirect('testapi_result', stest.id)
 
     else:
-        stest = StudentTest.objects.filter(student=request.user, test=test).order_by('-start_time').first()
-        if stest:
-            answered_questions = list(stest.answers.values_list('question_id', flat=True))
+        # Autosave orqali saqlangan javoblar sahifa qayta yuklanganda formaga tiklanadi
+        for sa in st_incomplete.answers.prefetch_related('answer_option'):
+            answered_questions.append(sa.question_id)
+            saved_answers[sa.question_id] = {
+                'options': [opt.id for opt in sa.answer_option.all()],
+                'text': sa.text_answer or '',
+            }
+    # Savol matni/variantlar HTML i keshlangan bo'laklardan olinadi (LaTeX filtrlari har safar ishlamaydi)
+    if not layout:
+        attach_question_fragments(questions)
     return render(request, 'test_api/test.html', {
         'test': test,
         'questions': questions,
@@ -1410,22 +426,61 @@ def testapi_test(request, test_id):
         'matching_rights_dict': matching_rights_dict,
     'choice_options_dict': choice_options_dict,
     'tf_order_dict': tf_order_dict,
+        'saved_answers': saved_answers,
         'test_minutes': test.minutes
     })
 
 
 
+# Imtihon davomida javoblarni bittalab/kichik to'plamlarda saqlash (autosave)
+@require_POST
+def testapi_autosave(request, test_id):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Avtorizatsiya talab qilinadi'}, status=401)
+    stest = (
+        StudentTest.objects.filter(student=request.user, test_id=test_id, completed=False)
+        .select_related('test')
+        .first()
+    )
+    if not stest:
+        return JsonResponse({'error': 'Faol urinish topilmadi'}, status=409)
+    paper_ids = set(stest.question_ids or [])
+    question_ids = [qid for qid in _parse_ids(request.POST.getlist('question_ids')) if qid in paper_ids]
+    if not question_ids:
+        return JsonResponse({'saved': []})
+    answer_key = get_answer_key(stest.test)
+    saved = save_answers(stest, answer_key.questions, request.POST, question_ids)
+    live_counters.answers_saved(stest)
+    return JsonResponse({'saved': [sa.question_id for sa in saved]})
+
+
+# Navbat holati (kutish sahifasi so'rab turadi) – navbat jadvalidagi bir nechta indeksli so'rov.
+# Har so'rov raqam heartbeat ini yangilaydi; muddati o'tgan raqam bilan test sahifasi yangi raqam beradi.
+def testapi_queue_status(request, test_id):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Avtorizatsiya talab qilinadi'}, status=401)
+    ticket = request.session.get(f'examq_ticket_{test_id}')
+    if ticket is None or not exam_queue.heartbeat(ticket):
+        return JsonResponse({'ready': True, 'ahead': 0})
+    return JsonResponse({
+        'ready': exam_queue.is_ready(test_id, ticket),
+        'ahead': exam_queue.queue_position(test_id, ticket),
+    })
+
+
 # Natija sahifasi
 def testapi_result(request, stest_id):
     if not request.user.is_authenticated:
         return redirect('/api/login/')
     stest = StudentTest.objects.get(id=stest_id)
+    # Topshiriq hali fon oqimida baholanmoqda – sahifa o'zini yangilab turadi
+    submission = Submission.objects.filter(student_test=stest).only('status', 'claimed_at', 'created_at').first()
+    if submission and submission.status != 'graded':
+        resume_if_stalled(submission)
+        return render(request, 'test_api/grading.html', {'stest': stest, 'submission': submission})
     
     # StudentTest modelidagi question_ids dan foydalanish
     question_ids = stest.question_ids if stest.question_ids else []
-    if not question_ids:
-        # Fallback: sessiondan olish
-        question_ids = request.session.get(f'test_{stest.test.id}_question_ids', [])
     
     if question_ids:
         answers = StudentAnswer.objects.filter(student_test=stest, question_id__in=question_ids)
@@ -1438,7 +493,8 @@ def testapi_result(request, stest_id):
     score = sum([a.score for a in answers])
     percent = int((correct / total) * 100) if total else 0
     
-    # Har bir javob uchun to'liq ma'lumot tayyorlash
+    # Har bir javob uchun to'liq ma'lumot tayyorlash (to'g'ri javoblar keshlangan kalitdan)
+    answer_key = get_answer_key(stest.test)
     detailed_answers = []
     for answer in answers:
         question = answer.question
@@ -1448,21 +504,16 @@ def testapi_result(request, stest_id):
         if question.question_type == 'single_choice':
             if answer.answer_option.exists():
                 user_answer = answer.answer_option.first().text
-            correct_option = question.answer_options.filter(is_correct=True).first()
-            correct_answer = correct_option.text if correct_option else ""
             
         elif question.question_type == 'multiple_choice':
             user_answer = ", ".join([opt.text for opt in answer.answer_option.all()])
-            correct_answer = ", ".join([opt.text for opt in question.answer_options.filter(is_correct=True)])
             
         elif question.question_type in ['fill_in_blank', 'true_false', 'sentence_ordering']:
             user_answer = answer.text_answer or ""
-            correct_option = question.answer_options.filter(is_correct=True).first()
-            correct_answer = correct_option.text if correct_option else ""
             
         elif question.question_type == 'matching':
             user_answer = "Moslashtirish javobi"
-            correct_answer = "To'g'ri moslashtirish"
+        correct_answer = answer_key.correct_answer(question)
         
         detailed_answers.append({
             'question': question,
@@ -1495,203 +546,9 @@ def testapi_stats(request):
     }
     return render(request, 'test_api/stats.html', {'stats': stats})
 
-# Barcha test natijalarini ko'rish sahifasi (Admin/Controller uchun)
-def testapi_all_results(request):
-    if not request.user.is_authenticated:
-        return redirect('/api/login/')
-    # Faqat admin, controller ko'radi; override detallarini faqat superuser
-    if request.user.role not in ['admin', 'controller']:
-        return redirect('testapi_dashboard')
-    show_override = request.user.is_superuser
-    
-    # Barcha tugatilgan testlarni fan va guruh bo'yicha gruppalash
-    student_tests = (
-        StudentTest.objects.filter(completed=True)
-        .select_related('student', 'test', 'test__subject', 'test__group', 'test__kafedra', 'test__bulim')
-        .prefetch_related('test__kafedralar', 'test__bulimlar')
-        .order_by('test__subject__name', 'test__group__name', 'student__username', '-start_time')
-    )
-    
-    # Ma'lumotlarni ierarxik tuzish: Fan -> Guruh -> Talaba -> Testlar
-    organized_data = {}
-    
-    for stest in student_tests:
-        subject_name = stest.test.subject.name if stest.test.subject else "NOMA'LUM FAN"
-        # Guruh nomini aniqlash tartibi:
-        # 1) Legacy test.group
-        # 2) StudentTest.group (agar mavjud bo'lsa va test.group yo'q bo'lsa)
-        # 3) Studentning o'z guruhi (agar test M2M orqali shu guruhga biriktirilgan bo'lsa)
-        # 4) Test.groups birinchi elementining nomi (oxirgi fallback)
-        group_obj = None
-        if stest.test.group:
-            group_obj = stest.test.group
-        elif getattr(stest, 'group', None):
-            group_obj = stest.group
-        else:
-            # Student group mos keladimi test.groups ga?
-            student_group = getattr(stest.student, 'group', None)
-            try:
-                if student_group and stest.test.groups.filter(id=student_group.id).exists():
-                    group_obj = student_group
-            except Exception:
-                pass
-            if group_obj is None:
-                first_group = stest.test.groups.first()
-                if first_group:
-                    group_obj = first_group
-
-        # Konteyner turini aniqlash (guruh/kafedra/bo'lim)
-        container_type = 'group'
-        if group_obj is None:
-            # Kafedra/Bulim konteynerlariga tekshiramiz
-            test_obj = stest.test
-            container_name = None
-            try:
-                if getattr(test_obj, 'kafedra', None):
-                    container_name = f"Kafedra: {test_obj.kafedra.name}"
-                    container_type = 'kafedra'
-                elif hasattr(test_obj, 'kafedralar') and test_obj.kafedralar.exists():
-                    kc = test_obj.kafedralar.count()
-                    if kc == 1:
-                        container_name = f"Kafedra: {test_obj.kafedralar.first().name}"
-                    else:
-                        container_name = f"Kafedralar ({kc})"
-                    container_type = 'kafedra'
-                elif getattr(test_obj, 'bulim', None):
-                    container_name = f"Bo'lim: {test_obj.bulim.name}"
-                    container_type = 'bulim'
-                elif hasattr(test_obj, 'bulimlar') and test_obj.bulimlar.exists():
-                    bc = test_obj.bulimlar.count()
-                    if bc == 1:
-                        container_name = f"Bo'lim: {test_obj.bulimlar.first().name}"
-                    else:
-                        container_name = f"Bo'limlar ({bc})"
-                    container_type = 'bulim'
-            except Exception:
-                container_name = None
-            if container_name:
-                group_name = container_name
-                group_id = 0
-            else:
-                group_name = "NOMA'LUM GURUH"
-                group_id = 0
-        else:
-            group_name = group_obj.name
-            group_id = group_obj.id
-        student_username = stest.student.username
-
-        # Fan bo'yicha guruhlashtirish
-        if subject_name not in organized_data:
-            organized_data[subject_name] = {}
-
-        # Guruh bo'yicha guruhlashtirish
-        if group_name not in organized_data[subject_name]:
-            organized_data[subject_name][group_name] = {
-                'group_id': group_id,
-                'students': {},
-                'container_type': container_type
-            }
-
-        # Talaba bo'yicha guruhlashtirish
-        if student_username not in organized_data[subject_name][group_name]['students']:
-            organized_data[subject_name][group_name]['students'][student_username] = {
-                'student': stest.student,
-                'tests': []
-            }
-        
-        # Test natijalarini hisoblash
-        question_ids = stest.question_ids if stest.question_ids else []
-        if question_ids:
-            answers = StudentAnswer.objects.filter(student_test=stest, question_id__in=question_ids)
-        else:
-            answers = StudentAnswer.objects.filter(student_test=stest)
-        
-        total = answers.count()
-        correct = answers.filter(is_correct=True).count()
-        incorrect = total - correct
-        score = sum([a.score for a in answers])
-        percent = int((correct / total) * 100) if total else 0
-        
-        # Har bir javob uchun batafsil ma'lumot
-        answer_details = []
-        for answer in answers:
-            question = answer.question
-            user_answer = ""
-            correct_answer = ""
-            
-            if question.question_type == 'single_choice':
-                if answer.answer_option.exists():
-                    user_answer = answer.answer_option.first().text
-                correct_option = question.answer_options.filter(is_correct=True).first()
-                correct_answer = correct_option.text if correct_option else ""
-                
-            elif question.question_type == 'multiple_choice':
-                user_answer = ", ".join([opt.text for opt in answer.answer_option.all()])
-                correct_answer = ", ".join([opt.text for opt in question.answer_options.filter(is_correct=True)])
-                
-            elif question.question_type in ['fill_in_blank', 'true_false', 'sentence_ordering']:
-                user_answer = answer.text_answer or ""
-                correct_option = question.answer_options.filter(is_correct=True).first()
-                correct_answer = correct_option.text if correct_option else ""
-                
-            elif question.question_type == 'matching':
-                user_answer = "Moslashtirish javobi"
-                correct_answer = "To'g'ri moslashtirish"
-            
-            answer_details.append({
-                'id': answer.id,
-                'question': question,
-                'user_answer': user_answer,
-                'correct_answer': correct_answer,
-                'is_correct': answer.is_correct,
-                'score': answer.score
-            })
-        
-        # Test ma'lumotlarini qo'shish
-        test_entry = {
-            'student_test': stest,
-            'total': total,
-            'correct': correct,
-            'incorrect': incorrect,
-            'score': score,
-            'percent': percent,
-            'answer_details': answer_details,
-        }
-        if show_override:
-            # Qo'shimcha override ma'lumotlari
-            try:
-                final_percent_calc = (stest.final_score / stest.test.total_score) * 100 if stest.test.total_score else percent
-            except Exception:
-                final_percent_calc = percent
-            test_entry.update({
-                'final_score': stest.final_score if hasattr(stest, 'final_score') else score,
-                'is_overridden': stest.is_overridden if hasattr(stest, 'is_overridden') else False,
-                'overridden_score': stest.overridden_score,
-                'pass_override': stest.pass_override,
-                'override_reason': stest.override_reason,
-                'overridden_by': stest.overridden_by,
-                'overridden_at': stest.overridden_at,
-                'final_percent': int(final_percent_calc),
-                'final_passed': stest.final_passed if hasattr(stest, 'final_passed') else None,
-            })
-        organized_data[subject_name][group_name]['students'][student_username]['tests'].append(test_entry)
-    
-
-    # Faqat completed testga ega guruhlar
-    group_ids_with_results = StudentTest.objects.filter(completed=True).values_list('test__group_id', flat=True).distinct()
-    groups_list = Group.objects.filter(id__in=group_ids_with_results).order_by('name')
-    kafedralar_list = Kafedra.objects.all().order_by('name')
-    bulimlar_list = Bulim.objects.all().order_by('name')
-    return render(request, 'test_api/all_results.html', {
-        'organized_data': organized_data,
-        'groups_list': groups_list,
-        'kafedralar_list': kafedralar_list,
-        'bulimlar_list': bulimlar_list,
-        'show_override': show_override
-    })
+# Barcha test natijalari sahifasi: views_results_explorer.results_explorer (lazy explorer)
 
 # AJAX: Berilgan fan bo'yicha (subject_name) natijalarda qatnashgan guruhlar ro'yxati
-from django.http import JsonResponse
 def subject_groups_for_results(request, subject_name):
     if not request.user.is_authenticated:
         return JsonResponse({'error':'unauthenticated'}, status=401)
@@ -1713,135 +570,14 @@ def subject_groups_for_results(request, subject_name):
 def export_all_results_excel(request):
     if not request.user.is_authenticated:
         return redirect('/api/login/')
-
-    user = request.user
-    role = getattr(user, 'role', None)
-
-    # Foydalanuvchi roli bo‘yicha filtr
-    if role == 'admin' or role == 'controller':
-        student_tests = StudentTest.objects.filter(completed=True).select_related('student', 'test', 'test__subject', 'test__group').order_by('test__subject__name', 'test__group__name', 'student__username', '-start_time')
-    elif role == 'employee':
-        # Xodim o‘z guruhidagi natijalarni ko‘radi
-        if hasattr(user, 'group') and user.group:
-            student_tests = StudentTest.objects.filter(completed=True, test__group=user.group).select_related('student', 'test', 'test__subject', 'test__group').order_by('test__subject__name', 'test__group__name', 'student__username', '-start_time')
-        else:
-            student_tests = StudentTest.objects.none()
-    elif role == 'tutor':
-        # Tutor o‘z fanidagi natijalarni ko‘radi
-        if hasattr(user, 'subject') and user.subject:
-            student_tests = StudentTest.objects.filter(completed=True, test__subject=user.subject).select_related('student', 'test', 'test__subject', 'test__group').order_by('test__subject__name', 'test__group__name', 'student__username', '-start_time')
-        else:
-            student_tests = StudentTest.objects.none()
-    else:
+    if getattr(request.user, 'role', None) not in ('admin', 'controller', 'employee', 'tutor'):
         return redirect('testapi_dashboard')
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Barcha Natijalar'
-
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-
-    headers = [
-        "Fan", "Guruh", "Talaba F.I.Sh.", "Username", "Test sanasi",
-        "Savollar soni", "To'g'ri javob", "Xato javob", "Ball", "Maksimal ball", "Foiz"
-    ]
-    if request.user.is_superuser:
-        headers.extend(["Yakuniy ball", "Final o'tdi?"])
-    headers.extend(["Savol", "Talaba javobi", "To'g'ri javob", "Holat", "Ball (savol)"])
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-
-    row = 2
-    for stest in student_tests:
-        subject = stest.test.subject.name if stest.test.subject else "NOMA'LUM FAN"
-        group_name = stest.test.group.name if stest.test.group else "NOMA'LUM GURUH"
-        student_fio = f"{stest.student.first_name} {stest.student.last_name}"
-        username = stest.student.username
-        test_date = stest.start_time.strftime("%d.%m.%Y %H:%M")
-
-        question_ids = stest.question_ids if stest.question_ids else []
-        if question_ids:
-            answers = StudentAnswer.objects.filter(student_test=stest, question_id__in=question_ids)
-        else:
-            answers = StudentAnswer.objects.filter(student_test=stest)
-
-        total = answers.count()
-        correct = answers.filter(is_correct=True).count()
-        incorrect = total - correct
-        score = sum([a.score for a in answers])
-        percent = int((correct / total) * 100) if total else 0
-        final_score = getattr(stest, 'final_score', score)
-        final_passed = getattr(stest, 'final_passed', None)
-
-        if answers.exists():
-            for answer in answers:
-                # Build row per answer
-                user_answer = ""
-                correct_answer = ""
-                q = answer.question
-                if q.question_type == 'single_choice':
-                    if answer.answer_option.exists():
-                        user_answer = answer.answer_option.first().text
-                    correct_option = q.answer_options.filter(is_correct=True).first()
-                    correct_answer = correct_option.text if correct_option else ""
-                elif q.question_type == 'multiple_choice':
-                    user_answer = ", ".join([opt.text for opt in answer.answer_option.all()])
-                    correct_answer = ", ".join([opt.text for opt in q.answer_options.filter(is_correct=True)])
-                elif q.question_type in ['fill_in_blank', 'true_false', 'sentence_ordering']:
-                    user_answer = answer.text_answer or ""
-                    correct_option = q.answer_options.filter(is_correct=True).first()
-                    correct_answer = correct_option.text if correct_option else ""
-                elif q.question_type == 'matching':
-                    user_answer = "Moslashtirish javobi"
-                    correct_answer = "To'g'ri moslashtirish"
-
-                data = [
-                    subject, group_name, student_fio, username, test_date,
-                    total, correct, incorrect, score, getattr(stest.test, 'total_score', 0), percent
-                ]
-                if request.user.is_superuser:
-                    data.extend([final_score, "Ha" if final_passed else "Yo'q"])
-                data.extend([
-                    getattr(q, 'text', '')[:200],
-                    user_answer,
-                    correct_answer,
-                    "To'g'ri" if answer.is_correct else "Noto'g'ri",
-                    answer.score
-                ])
-                for col, value in enumerate(data, 1):
-                    ws.cell(row=row, column=col, value=value)
-                row += 1
-        else:
-            # No answers – write a single summary row
-            data = [
-                subject, group_name, student_fio, username, test_date,
-                0, 0, 0, 0, getattr(stest.test, 'total_score', 0), 0
-            ]
-            if request.user.is_superuser:
-                data.extend([final_score, "Ha" if final_passed else "Yo'q"])
-            data.extend(["Javob berilmagan", "", "", "", 0])
-            for col, value in enumerate(data, 1):
-                ws.cell(row=row, column=col, value=value)
-            row += 1
-
-    column_widths = [20, 18, 22, 15, 18, 10, 12, 12, 10, 12, 8]
-    if request.user.is_superuser:
-        column_widths.extend([12, 10])
-    column_widths.extend([40, 30, 30, 10, 8])
-    for col, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(col)].width = width
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="barcha_natijalar.xlsx"'
-    wb.save(response)
-    return response
+    # Xodim o‘z guruhidagi, tutor o‘z fanidagi natijalarni ko‘radi; biriktirilmagan bo‘lsa bo‘sh fayl
+    spec = scope_filter(ResultFilter(), request.user)
+    student_tests = result_queryset(spec) if spec else StudentTest.objects.none()
+    columns = DETAIL_COLUMNS + (['final_score', 'final_passed'] if request.user.is_superuser else [])
+    export = ResultExport(student_tests, columns, detail=True)
+    return render_xlsx(export, "barcha_natijalar.xlsx", 'Barcha Natijalar')
 
 # Excel export funksiyasi
 def export_group_results_excel(request, group_id):
@@ -1857,151 +593,65 @@ def export_group_results_excel(request, group_id):
     except Group.DoesNotExist:
         return HttpResponse("Guruh topilmadi", status=404)
 
+    spec = ResultFilter(test_group=group.id)
     # Admin va controller istalgan guruhni ko‘ra oladi
     if role in ['admin', 'controller']:
-        student_tests = StudentTest.objects.filter(
-            completed=True, test__group=group
-        ).select_related('student', 'test', 'test__subject').order_by('test__subject__name', 'student__username', '-start_time')
+        pass
     # Xodim faqat o‘z guruhini ko‘ra oladi
     elif role == 'employee':
-        if hasattr(user, 'group') and user.group and user.group.id == group.id:
-            student_tests = StudentTest.objects.filter(
-                completed=True, test__group=group
-            ).select_related('student', 'test', 'test__subject').order_by('test__subject__name', 'student__username', '-start_time')
-        else:
+        if not (user.group_id and user.group_id == group.id):
             return HttpResponse("Siz faqat o‘z guruhingizni eksport qila olasiz", status=403)
     # Tutor faqat o‘z faniga tegishli guruhlarni ko‘ra oladi
     elif role == 'tutor':
-        if hasattr(user, 'subject') and user.subject:
-            # Guruhda shu tutor fani bormi?
-            has_subject = StudentTest.objects.filter(completed=True, test__group=group, test__subject=user.subject).exists()
-            if has_subject:
-                student_tests = StudentTest.objects.filter(
-                    completed=True, test__group=group, test__subject=user.subject
-                ).select_related('student', 'test', 'test__subject').order_by('test__subject__name', 'student__username', '-start_time')
-            else:
-                return HttpResponse("Bu guruhda sizga tegishli fan natijalari yo‘q", status=403)
-        else:
+        subject_id = getattr(user, 'subject_id', None)
+        if not subject_id:
             return HttpResponse("Sizga fan biriktirilmagan", status=403)
+        spec = ResultFilter(test_group=group.id, subject=subject_id)
+        if not result_queryset(spec).exists():
+            return HttpResponse("Bu guruhda sizga tegishli fan natijalari yo‘q", status=403)
     else:
         return redirect('testapi_dashboard')
-    
-    # Excel fayl yaratish
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"{group.name} - Test Natijalari"
-    
-    # Sarlavha stilini yaratish
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Sarlavhalar
-    headers = [
-        "Talaba Ismi", "Username", "Fan", "Test Sanasi", 
-        "Jami Savollar", "To'g'ri Javoblar", "Xato Javoblar", 
-        "Olingan Ball", "Maksimal Ball", "Foiz", "Savol", 
-        "Talaba Javobi", "To'g'ri Javob", "Javob Holati", "Ball"
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # Ma'lumotlarni yozish
-    row = 2
-    for stest in student_tests:
-        # Test natijalarini hisoblash
-        question_ids = stest.question_ids if stest.question_ids else []
-        if question_ids:
-            answers = StudentAnswer.objects.filter(student_test=stest, question_id__in=question_ids)
-        else:
-            answers = StudentAnswer.objects.filter(student_test=stest)
-        
-        total = answers.count()
-        correct = answers.filter(is_correct=True).count()
-        incorrect = total - correct
-        score = sum([a.score for a in answers])
-        percent = int((correct / total) * 100) if total else 0
-        
-        # Har bir javob uchun alohida qator
-        if answers.exists():
-            for answer in answers:
-                question = answer.question
-                user_answer = ""
-                correct_answer = ""
-                
-                if question.question_type == 'single_choice':
-                    if answer.answer_option.exists():
-                        user_answer = answer.answer_option.first().text
-                    correct_option = question.answer_options.filter(is_correct=True).first()
-                    correct_answer = correct_option.text if correct_option else ""
-                    
-                elif question.question_type == 'multiple_choice':
-                    user_answer = ", ".join([opt.text for opt in answer.answer_option.all()])
-                    correct_answer = ", ".join([opt.text for opt in question.answer_options.filter(is_correct=True)])
-                    
-                elif question.question_type in ['fill_in_blank', 'true_false', 'sentence_ordering']:
-                    user_answer = answer.text_answer or ""
-                    correct_option = question.answer_options.filter(is_correct=True).first()
-                    correct_answer = correct_option.text if correct_option else ""
-                    
-                elif question.question_type == 'matching':
-                    user_answer = "Moslashtirish javobi"
-                    correct_answer = "To'g'ri moslashtirish"
-                
-                # Qatorga ma'lumot yozish
-                data = [
-                    f"{stest.student.first_name} {stest.student.last_name}",
-                    stest.student.username,
-                    stest.test.subject.name,
-                    stest.start_time.strftime("%d.%m.%Y %H:%M"),
-                    total,
-                    correct,
-                    incorrect,
-                    score,
-                    stest.test.total_score,
-                    f"{percent}%",
-                    question.text,
-                    user_answer,
-                    correct_answer,
-                    "To'g'ri" if answer.is_correct else "Xato",
-                    answer.score
-                ]
-                
-                for col, value in enumerate(data, 1):
-                    ws.cell(row=row, column=col, value=value)
-                
-                row += 1
-        else:
-            # Agar javob yo'q bo'lsa
-            data = [
-                f"{stest.student.first_name} {stest.student.last_name}",
-                stest.student.username,
-                stest.test.subject.name,
-                stest.start_time.strftime("%d.%m.%Y %H:%M"),
-                0, 0, 0, 0, stest.test.total_score, "0%",
-                "Javob berilmagan", "", "", "", 0
-            ]
-            
-            for col, value in enumerate(data, 1):
-                ws.cell(row=row, column=col, value=value)
-            
-            row += 1
-    
-    # Ustunlar kengligini sozlash
-    column_widths = [20, 15, 25, 18, 12, 12, 12, 12, 12, 8, 40, 30, 30, 12, 8]
-    for col, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    # HTTP response yaratish
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{group.name}_test_natijalari.xlsx"'
-    
-    # Excel faylni response ga yozish
-    wb.save(response)
-    return response
+
+    # Har bir javob uchun alohida qator
+    student_tests = result_queryset(spec, order_by=('test__subject__name', 'student__username', '-start_time'))
+    columns = ['fio', 'username', 'subject', 'date', 'answered', 'correct', 'incorrect', 'score', 'max_score', 'percent']
+    export = ResultExport(student_tests, columns, detail=True, headers={'fio': "Talaba Ismi"})
+    return render_xlsx(export, f"{group.name}_test_natijalari.xlsx", f"{group.name} - Test Natijalari")
+
+
+# Javob darajasidagi xom CSV (tahlil uchun): ?test=&subject=&semester=&date_from=&date_to=
+def export_answers_csv(request):
+    if not request.user.is_authenticated:
+        return redirect('/api/login/')
+    if not (request.user.is_superuser or getattr(request.user, 'role', None) in ('admin', 'controller')):
+        return HttpResponse("Ruxsat yo'q", status=403)
+    try:
+        filters = answers_csv.parse_filters(request.GET)
+    except ValueError as exc:
+        return HttpResponse(str(exc), status=400)
+    return results_export.csv_response(answers_csv.export_filename(filters), answers_csv.ANSWER_CSV_HEADERS,
+                                       answers_csv.answer_rows(filters))
+
+
+# Yagona natijalar eksporti: ?format=xlsx|csv|pdf, filtrlar (group, test_group, kafedra, bulim, subject,
+# semester, role) va detail=1 (har javob alohida qator)
+def export_results(request):
+    if not request.user.is_authenticated:
+        return redirect('/api/login/')
+    fmt = request.GET.get('format', 'xlsx')
+    if fmt not in FORMATS:
+        return HttpResponse("Noma'lum format", status=400)
+    try:
+        spec = ResultFilter.from_query(request.GET)
+    except ValueError as exc:
+        return HttpResponse(str(exc), status=400)
+    spec = scope_filter(spec, request.user)
+    if spec is None:
+        return HttpResponse("Bu natijalarni eksport qilishga ruxsat yo‘q", status=403)
+    detail = request.GET.get('detail') == '1'
+    columns = DETAIL_COLUMNS if detail else ['fio', 'username', 'subject', 'group', 'date', 'answered', 'correct',
+                                             'incorrect', 'score', 'max_score', 'percent']
+    if request.user.is_superuser:
+        columns = columns + ['final_score', 'final_passed']
+    export = ResultExport(result_queryset(spec), columns, detail=detail)
+    return results_export.render(export, fmt, 'natijalar', 'Natijalar')
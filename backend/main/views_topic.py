@@ -4,9 +4,8 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.db import transaction
 from django.utils import timezone
-from .models import Topic, TopicIntroVideo, TopicQuestion, TopicAnswerOption, TopicTest, TopicStudentTest, TopicStudentAnswer, Subject, Group, User
-from django.db.models import Sum
-import csv, io
+from .models import Topic, TopicIntroVideo, TopicQuestion, TopicAnswerOption, TopicTest, TopicStudentTest, Subject, Group, User
+import csv, io, json
 try:
     import openpyxl
 except ImportError:
@@ -15,6 +14,8 @@ from datetime import timedelta
 import random
 from django.contrib.auth import authenticate, login
 import logging
+from .topic_bundle import get_bundle, question_options
+from .topic_scoring import save_answers as save_topic_answers
 
 # ---------- Student Simple Login (username only) ----------
 def topic_student_login(request):
@@ -311,15 +312,8 @@ def mark_topic_video_seen(request, test_id):
     request.session[f'topic_video_seen_{test.id}'] = True
     return JsonResponse({'ok': True})
 
-# ---------- Submit Answer ----------
-@login_required
-@require_http_methods(["POST"])
-@transaction.atomic
-def submit_answer(request, student_test_id):
-    st = get_object_or_404(TopicStudentTest, id=student_test_id, student=request.user)
-    qid = int(request.POST.get('question_id'))
-    q = get_object_or_404(TopicQuestion, id=qid)
-    # Enforce time expiry before accepting answers
+def _expire_if_over(st):
+    """Vaqt tugagan bo'lsa urinishni yakunlangan deb belgilaydi va True qaytaradi."""
     test = st.test
     if test.duration and st.started_at:
         elapsed = (timezone.now() - st.started_at).total_seconds()
@@ -328,28 +322,47 @@ def submit_answer(request, student_test_id):
                 st.completed = True
                 st.finished_at = timezone.now()
                 st.save(update_fields=['completed', 'finished_at'])
-            return JsonResponse({'error': 'Vaqt tugagan'}, status=403)
-    selected = request.POST.getlist('options')  # list of option IDs
-    ans, _ = TopicStudentAnswer.objects.get_or_create(student_test=st, question=q)
-    ans.selected_options.clear()
-    chosen_options = TopicAnswerOption.objects.filter(id__in=selected, question=q)
-    ans.selected_options.add(*chosen_options)
-    # Scoring
-    correct_ids = set(q.options.filter(is_correct=True).values_list('id', flat=True))
-    chosen_ids = set(chosen_options.values_list('id', flat=True))
-    if q.question_type == 'single':
-        ans.is_correct = (len(chosen_ids) == 1 and chosen_ids == correct_ids)
-    else:  # multi
-        ans.is_correct = (chosen_ids == correct_ids)
-    # Per-question score = total_score / question_count
-    per_q = st.test.total_score / st.test.question_count if st.test.question_count else 0
-    ans.score = per_q if ans.is_correct else 0
-    ans.save()
-    # update total
-    agg = st.answers.aggregate(s=Sum('score'))
-    st.total_score = agg['s'] or 0
-    st.save()
-    return JsonResponse({'correct': ans.is_correct, 'score': ans.score, 'total': st.total_score})
+            return True
+    return False
+
+# ---------- Submit Answer ----------
+@login_required
+@require_http_methods(["POST"])
+@transaction.atomic
+def submit_answer(request, student_test_id):
+    st = get_object_or_404(TopicStudentTest.objects.select_related('test__topic'), id=student_test_id, student=request.user)
+    qid = int(request.POST.get('question_id'))
+    q = get_object_or_404(TopicQuestion, id=qid)
+    # Enforce time expiry before accepting answers
+    if _expire_if_over(st):
+        return JsonResponse({'error': 'Vaqt tugagan'}, status=403)
+    # Baholash va umumiy ball (delta bilan) – main/topic_scoring.py
+    results = save_topic_answers(st, {q.id: request.POST.getlist('options')})
+    if q.id not in results:
+        return JsonResponse({'error': 'Savol bu testda emas'}, status=400)
+    is_correct, score = results[q.id]
+    return JsonResponse({'correct': is_correct, 'score': score, 'total': st.total_score})
+
+# ---------- Submit Answers (batch) ----------
+@login_required
+@require_http_methods(["POST"])
+def submit_answers_batch(request, student_test_id):
+    """Bir nechta javob bitta so'rovda: answers = JSON {savol_id: [variant_id, ...]}.
+
+    Klient javoblarni navbatda yig'ib, vaqti-vaqti bilan va yakunlashdan oldin yuboradi.
+    """
+    st = get_object_or_404(TopicStudentTest.objects.select_related('test__topic'), id=student_test_id, student=request.user)
+    if _expire_if_over(st):
+        return JsonResponse({'error': 'Vaqt tugagan'}, status=403)
+    if st.completed:
+        return JsonResponse({'error': 'Test yakunlangan'}, status=409)
+    try:
+        raw = json.loads(request.POST.get('answers') or '{}')
+        answers = {int(qid): list(selected) for qid, selected in raw.items()}
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': "answers noto'g'ri"}, status=400)
+    results = save_topic_answers(st, answers)
+    return JsonResponse({'saved': sorted(results), 'total': st.total_score})
 
 # ---------- Finish Test ----------
 @login_required
@@ -391,42 +404,30 @@ def finish_topic_test(request, student_test_id):
 def topic_question_detail(request, question_id):
     q = get_object_or_404(TopicQuestion, id=question_id)
     # permission: ensure student belongs to group when student; teachers can view own topics
+    opt_list = list(q.options.all())
+    active_run = None  # ensure defined for both roles to avoid UnboundLocalError
     if getattr(request.user, 'role', '') == 'student':
         gid = request.user.group_id
-        allowed = False
-        # Fetch all runs for this student & group (avoid JSON contains filters unsupported on SQLite)
-        candidate_runs = TopicStudentTest.objects.filter(student=request.user, test__groups__id=gid).select_related('test')
+        # Bitta o'tish: savol kirgan eng so'nggi urinish ham ruxsat, ham variantlar tartibi uchun
+        # (SQLite da JSON __contains yo'q – a'zolik Python'da tekshiriladi)
+        candidate_runs = (TopicStudentTest.objects.filter(student=request.user, test__groups__id=gid)
+                          .select_related('test').order_by('-started_at'))
         run_ids = []
         for run in candidate_runs:
             run_ids.append(run.id)
-            # Accept if question id appears in either stored randomized list or original test question_ids
-            rand_list = run.randomized_question_ids or []
-            if q.id in rand_list or q.id in (run.test.question_ids or []):
-                allowed = True
-                logging.getLogger('api').info('QUESTION_ACCESS_OK user=%s q=%s test=%s rand_len=%s', request.user.id, q.id, run.test_id, len(rand_list))
+            if q.id in (run.randomized_question_ids or []) or q.id in (run.test.question_ids or []):
+                active_run = run
                 break
-        if not allowed:
+        if active_run is None:
             logging.getLogger('api').warning('QUESTION_ACCESS_DENY user=%s q=%s candidate_runs=%s', request.user.id, q.id, run_ids)
             return HttpResponseForbidden("Ruxsat yo'q (savol test ro'yxatida emas yoki guruh mos emas)")
+        # To'plam (topic_test_bundle) bilan bir xil tartib
+        opt_list = question_options(active_run, q, opt_list)
     elif getattr(request.user, 'role', '') == 'teacher':
         if q.topic.created_by_id != request.user.id:
             logging.getLogger('api').warning('QUESTION_ACCESS_DENY_TEACHER user=%s q=%s owner=%s', request.user.id, q.id, q.topic.created_by_id)
             return HttpResponseForbidden('Ruxsat yo\'q')
-    # Option shuffling if the owning test has shuffle_options enabled.
-    # We detect current active student test for this question (if any) to decide.
-    opt_list = list(q.options.all())
-    active_run = None  # ensure defined for both roles to avoid UnboundLocalError
-    if getattr(request.user, 'role', '') == 'student':
-        # Determine active run via Python membership tests (avoid JSON __contains)
-        runs = TopicStudentTest.objects.filter(student=request.user).select_related('test').order_by('-started_at')
-        for run in runs:
-            rand_list = run.randomized_question_ids or []
-            if q.id in rand_list or q.id in (run.test.question_ids or []):
-                active_run = run
-                break
-        if active_run and active_run.test.shuffle_options:
-            random.shuffle(opt_list)
-    logging.getLogger('api').info('QUESTION_DELIVER user=%s q=%s opts=%s active_run=%s shuffle=%s', request.user.id, q.id, [o.id for o in opt_list], active_run.id if active_run else None, bool(active_run and active_run.test.shuffle_options))
+    logging.getLogger('api').info('QUESTION_DELIVER user=%s q=%s opts=%s active_run=%s', request.user.id, q.id, len(opt_list), active_run.id if active_run else None)
     data = {
         'id': q.id,
         'text': q.text,
@@ -447,6 +448,13 @@ def topic_question_detail(request, question_id):
     }
     return JsonResponse(data)
 
+# ---------- Question bundle (student, bitta so'rov) ----------
+@login_required
+def topic_test_bundle(request, student_test_id):
+    """Urinishning barcha savollari va variantlari randomized_question_ids tartibida (main/topic_bundle.py)."""
+    st = get_object_or_404(TopicStudentTest.objects.select_related('test__topic'), id=student_test_id, student=request.user)
+    return JsonResponse({'student_test': st.id, 'questions': get_bundle(st)})
+
 # ---------- Simple favicon (inline PNG) ----------
 def favicon_view(request):
     # 16x16 transparent PNG (1x1 actually) base64